@@ -1 +1,25 @@
-__all__ = ["config", "tree", "palette"]
\ No newline at end of file
+# Headless API: TreeConfig, генерация геометрии, bbox и экспорт — без turtle/tkinter.
+# Имена ниже подгружают свой модуль при первом обращении, так что `import fractal`
+# не тянет даже numpy; GUI-части (tree.FractalTreeRenderer, canvas_renderer, ui) грузят Tk сами.
+_API = {
+    "TreeConfig": "fractal.config",
+    "generate_geometry": "fractal.geometry",
+    "iter_segments": "fractal.geometry",
+    "estimate_tree_bbox": "fractal.tree",
+    "render_png": "fractal.raster",
+    "render_rgba": "fractal.raster",
+    "export_vector": "fractal.vector",
+    "render_poster": "fractal.tiles",
+}
+
+
+def __getattr__(name):
+    module = _API.get(name)
+    if module is None:
+        raise AttributeError(f"module 'fractal' has no attribute {name!r}")
+    import importlib
+
+    return getattr(importlib.import_module(module), name)
+
+
+__all__ = ["config", "tree", "palette", "geometry", "view", "canvas_renderer", "raster", "batch", "vector", "lod", "bench", "rng", "parallel", "store", "render_cache", "server", "spatial", "animation", "tiles", "bounds"]
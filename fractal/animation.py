@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from fractal.geometry import TRUNK_COLOR_INDEX, TreeGeometry
+from fractal.palette import Palette
+from fractal.profiling import DrawProfile
+from fractal.view import Viewport, fit_viewport
+
+
+# Когда появляется сегмент: "depth" — уровни по очереди, "length" — по пройденному от
+# основания ствола пути, как будто ветки растут с одной скоростью
+REVEAL_DEPTH = "depth"
+REVEAL_LENGTH = "length"
+REVEAL_MODES = (REVEAL_DEPTH, REVEAL_LENGTH)
+
+DEFAULT_FPS = 30.0
+DEFAULT_DURATION = 3.0
+
+
+@dataclass
+class GrowthPlan:
+    # Сегменты в порядке появления и время появления каждого (секунды от начала, по неубыванию)
+    geometry: TreeGeometry
+    times: np.ndarray
+    duration: float
+
+    def __len__(self) -> int:
+        return len(self.geometry)
+
+    def frame_count(self, fps: float) -> int:
+        return max(1, math.ceil(self.duration * fps))
+
+    def frame_ends(self, fps: float) -> np.ndarray:
+        # ends[k] — сколько сегментов видно на кадре k (кадр k показывает момент (k + 1) / fps);
+        # последний кадр — всё дерево
+        n_frames = self.frame_count(fps)
+        ends = np.searchsorted(self.times, (np.arange(n_frames) + 1) / fps, side="left")
+        ends[-1] = len(self)
+        return ends
+
+    def segments(self, lo: int, hi: int) -> TreeGeometry:
+        # срез [lo, hi) — представления массивов, без копий
+        g = self.geometry
+        return TreeGeometry(
+            x0=g.x0[lo:hi],
+            y0=g.y0[lo:hi],
+            x1=g.x1[lo:hi],
+            y1=g.y1[lo:hi],
+            thickness=g.thickness[lo:hi],
+            color=g.color[lo:hi],
+            depth=g.depth[lo:hi],
+            bbox=g.bbox,
+            draw_mode=g.draw_mode,
+        )
+
+
+def _parents(geom: TreeGeometry) -> np.ndarray:
+    # родитель каждого сегмента (-1 у ствола): уровни подряд, у ветки цвета ствола двое детей
+    n = len(geom)
+    parent = np.full(n, -1, dtype=np.int64)
+    internal = geom.color == TRUNK_COLOR_INDEX
+    levels = np.searchsorted(geom.depth, np.arange(geom.max_depth + 2))
+    for level in range(geom.max_depth):
+        a, b, c, d = levels[level], levels[level + 1], levels[level + 1], levels[level + 2]
+        parents = np.flatnonzero(internal[a:b]) + a
+        if parents.size * 2 != d - c:
+            raise ValueError("geometry is not in level order")
+        parent[c:d] = np.repeat(parents, 2)
+    return parent
+
+
+def reveal_fractions(geom: TreeGeometry, reveal: str = REVEAL_DEPTH) -> np.ndarray:
+    # доля анимации (0..1), в которую сегмент начинает рисоваться
+    n = len(geom)
+    if n == 0:
+        return np.zeros(0)
+    if reveal == REVEAL_DEPTH:
+        return geom.depth.astype(np.float64) / (geom.max_depth + 1)
+    if reveal != REVEAL_LENGTH:
+        raise ValueError(f"Unknown reveal mode: {reveal!r}")
+
+    length = np.hypot((geom.x1 - geom.x0).astype(np.float64), (geom.y1 - geom.y0).astype(np.float64))
+    parent = _parents(geom)
+    start = np.zeros(n)
+    # уровни идут подряд, так что родитель посчитан раньше ребёнка
+    levels = np.searchsorted(geom.depth, np.arange(geom.max_depth + 2))
+    for level in range(1, geom.max_depth + 1):
+        c, d = levels[level], levels[level + 1]
+        p = parent[c:d]
+        start[c:d] = start[p] + length[p]
+    total = float((start + length).max())
+    return start / total if total > 0 else start
+
+
+def plan_growth(
+    geom: TreeGeometry,
+    duration: float = DEFAULT_DURATION,
+    reveal: str = REVEAL_DEPTH,
+) -> GrowthPlan:
+    times = reveal_fractions(geom, reveal) * duration
+    order = np.argsort(times, kind="stable")
+    if np.array_equal(order, np.arange(order.size)):
+        return GrowthPlan(geom, times, duration)
+
+    g = geom
+    ordered = TreeGeometry(
+        x0=g.x0[order],
+        y0=g.y0[order],
+        x1=g.x1[order],
+        y1=g.y1[order],
+        thickness=g.thickness[order],
+        color=g.color[order],
+        depth=g.depth[order],
+        bbox=g.bbox,
+        draw_mode=g.draw_mode,
+    )
+    return GrowthPlan(ordered, times[order], duration)
+
+
+@dataclass
+class FrameStats:
+    # Время рисования каждого показанного кадра и сколько кадров пропущено из-за опоздания
+    fps: float
+    frame_ms: List[float] = field(default_factory=list)
+    dropped: int = 0
+    segments: int = 0
+    wall_s: float = 0.0
+
+    def add(self, ms: float, segments: int) -> None:
+        self.frame_ms.append(ms)
+        self.segments += segments
+
+    @property
+    def frames(self) -> int:
+        return len(self.frame_ms)
+
+    def to_profile(self) -> DrawProfile:
+        # в тот же вид, что профиль Draw: оверлей "Show timings" и --profile-log
+        ms = sorted(self.frame_ms) or [0.0]
+        profile = DrawProfile()
+        profile.phases["frames"] = float(sum(ms))
+        profile.counts.update(frames=self.frames, dropped=self.dropped, segments=self.segments)
+        profile.info.update(
+            target_fps=self.fps,
+            fps=round(self.frames / self.wall_s, 2) if self.wall_s > 0 else 0.0,
+            frame_ms_p50=round(ms[len(ms) // 2], 3),
+            frame_ms_p95=round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+            frame_ms_max=round(ms[-1], 3),
+        )
+        return profile
+
+    def summary(self) -> str:
+        info = self.to_profile().info
+        return (
+            f"{self.frames} frames, {self.dropped} dropped, {info['fps']} fps (target {self.fps:g}), "
+            f"frame p50 {info['frame_ms_p50']} ms, p95 {info['frame_ms_p95']} ms, max {info['frame_ms_max']} ms"
+        )
+
+
+# ---------------- кадры в файлы (без Tk) ----------------
+
+def export_frames(
+    plan: GrowthPlan,
+    palette: Palette,
+    out_dir: str,
+    fps: float = DEFAULT_FPS,
+    width: int = 1024,
+    height: int = 1024,
+    margin: float = 30.0,
+    stroke_scale: float = 1.0,
+    progress: Callable[[str], None] = print,
+) -> FrameStats:
+    # Кадры frame_00000.png ... на одном холсте: каждый кадр дорисовывает только свои сегменты.
+    # Вид подобран под всё дерево, поэтому кадры не "прыгают". Файлы пишутся все, без пропусков.
+    from fractal.raster import _background, _paint, _palette_colors, _to_rgba, write_png
+
+    os.makedirs(out_dir, exist_ok=True)
+    view: Viewport = fit_viewport(plan.geometry.bbox, width, height, margin=margin)
+    colors = _palette_colors(palette)
+    out = _background(palette, width, height)
+
+    stats = FrameStats(fps)
+    ends = plan.frame_ends(fps)
+    started = time.perf_counter()
+    drawn = 0
+    for k, hi in enumerate(ends.tolist()):
+        t0 = time.perf_counter()
+        if hi > drawn:
+            _paint(out, plan.segments(drawn, hi), colors, view, stroke_scale)
+        write_png(os.path.join(out_dir, f"frame_{k:05d}.png"), _to_rgba(out))
+        stats.add((time.perf_counter() - t0) * 1000.0, hi - drawn)
+        drawn = hi
+        if (k + 1) % 25 == 0 or k + 1 == ends.size:
+            progress(f"[{k + 1}/{ends.size}] frames")
+    stats.wall_s = time.perf_counter() - started
+    return stats
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("fields", nargs="*", metavar="FIELD=VALUE", help="TreeConfig fields, e.g. depth=12 seed=3")
+    parser.add_argument("-o", "--out", default="frames", help="output directory for frame_NNNNN.png")
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS)
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds")
+    parser.add_argument("--reveal", default=REVEAL_DEPTH, choices=REVEAL_MODES)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+
+
+def main(args: argparse.Namespace) -> int:
+    from fractal.batch import config_from_fields
+    from fractal.geometry import generate_geometry
+    from fractal.palette import get_palette
+
+    try:
+        cfg = config_from_fields(args.fields)
+    except (ValueError, TypeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    plan = plan_growth(generate_geometry(cfg), args.duration, args.reveal)
+    stats = export_frames(plan, get_palette(cfg.palette_name), args.out, args.fps, args.width, args.height)
+    print(stats.summary())
+    return 0
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fractal.config import RNG_SEQUENTIAL, TreeConfig, config_error
+
+
+_FIELD_TYPES = {f.name: type(f.default) for f in fields(TreeConfig)}
+
+FORMATS = ("png", "svg", "eps")
+
+# Пакетный рендер не интерактивный: глубже, чем GUI и сервер (MAX_DEPTH), — большие
+# SVG/EPS пишутся потоком, но глубина 40 не досчитается никогда
+MAX_BATCH_DEPTH = 24
+
+
+# ---------------- конфиги ----------------
+
+def _convert(key: str, value: Any) -> Any:
+    # Значение поля из JSON (число/строка) или CSV (всегда строка). Целые поля принимают
+    # 12, 12.0 и "12.0", но не 12.5: молча обрезать глубину или seed хуже, чем отказать.
+    kind = _FIELD_TYPES[key]
+    if kind is str:
+        return str(value)
+    if isinstance(value, bool):
+        raise ValueError(f"{key}: expected a number, got {value!r}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key}: expected a number, got {value!r}") from None
+    if kind is int:
+        if isinstance(value, int):
+            return value
+        if not number.is_integer():
+            raise ValueError(f"{key}: expected an integer, got {value!r}")
+        return int(number)
+    if not math.isfinite(number):
+        raise ValueError(f"{key}: expected a finite number, got {value!r}")
+    return number
+
+
+def config_from_record(record: Dict[str, Any]) -> TreeConfig:
+    kwargs: Dict[str, Any] = {}
+    for key, value in record.items():
+        if key == "name" or value is None or value == "":
+            continue
+        if key not in _FIELD_TYPES:
+            raise ValueError(f"Unknown TreeConfig field: {key!r}")
+        kwargs[key] = _convert(key, value)
+    return TreeConfig(**kwargs)
+
+
+def config_from_fields(items: Sequence[str]) -> TreeConfig:
+    # аргументы командной строки вида depth=12 palette_name=Neon
+    record: Dict[str, Any] = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected FIELD=VALUE, got {item!r}")
+        record[key] = value
+    return config_from_record(record)
+
+
+def config_key(cfg: TreeConfig) -> str:
+    data = asdict(cfg)
+    # поле добавлено позже: у конфигов с rng по умолчанию ключ (имя файла) прежний
+    if data["rng"] == RNG_SEQUENTIAL:
+        del data["rng"]
+    blob = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def load_jobs(path: str, errors: Optional[List[str]] = None) -> List[Tuple[str, TreeConfig]]:
+    # JSON Lines или CSV (по расширению); имя файла — поле "name" или хеш конфига.
+    # Без errors первая битая запись — ValueError; с errors она пропускается, а в errors
+    # попадает "путь:строка: причина".
+    records: List[Tuple[int, Any]] = []
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            records = [(reader.line_num, row) for row in reader]
+        else:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    records.append((lineno, json.loads(line)))
+                except json.JSONDecodeError as e:
+                    records.append((lineno, e))
+
+    jobs = []
+    for lineno, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise ValueError(str(record))
+            if not isinstance(record, dict):
+                raise ValueError(f"expected an object, got {type(record).__name__}")
+            cfg = config_from_record(record)
+            # пределы полей — как у GUI и сервера: битая запись видна здесь, с номером строки,
+            # а не падением (или часами работы) в процессе пула
+            error = config_error(cfg, MAX_BATCH_DEPTH)
+            if error is not None:
+                raise ValueError(error)
+        except (ValueError, TypeError) as e:
+            message = f"{path}:{lineno}: {e}"
+            if errors is None:
+                raise ValueError(message) from e
+            errors.append(message)
+            continue
+        jobs.append((str(record.get("name") or config_key(cfg)), cfg))
+    return jobs
+
+
+# ---------------- рендер ----------------
+
+def render_job(cfg: TreeConfig, path: str, fmt: str, width: int, height: int) -> str:
+    # пишем во временный файл и переименовываем: прерванный рендер не оставит "готовый" файл
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        if fmt == "png":
+            from fractal.raster import render_png
+
+            render_png(cfg, tmp, width=width, height=height)
+        elif fmt in ("svg", "eps"):
+            from fractal.vector import export_vector
+
+            export_vector(cfg, tmp, width=width, height=height, fmt=fmt)
+        else:
+            raise ValueError(f"Unsupported format: {fmt!r}")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def render_job_cached(
+    cache_dir: str, max_bytes: int, cfg: TreeConfig, path: str, fmt: str, width: int, height: int
+) -> Tuple[str, bool]:
+    from fractal.render_cache import RenderCache
+
+    hit = RenderCache(cache_dir, max_bytes).export(cfg, path, fmt, width, height)
+    return path, hit
+
+
+@dataclass
+class BatchResult:
+    rendered: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+
+def run_batch(
+    jobs: Sequence[Tuple[str, TreeConfig]],
+    out_dir: str,
+    fmt: str = "png",
+    width: int = 1024,
+    height: int = 1024,
+    workers: Optional[int] = None,
+    progress: Callable[[str], None] = print,
+    cache_dir: Optional[str] = None,
+    cache_bytes: Optional[int] = None,
+) -> BatchResult:
+    # Ошибка одного задания не останавливает остальные: она печатается с путём файла,
+    # а число упавших возвращается в BatchResult.failed.
+    os.makedirs(out_dir, exist_ok=True)
+
+    pending = []
+    for name, cfg in jobs:
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        if not os.path.exists(path):
+            pending.append((cfg, path))
+
+    result = BatchResult(skipped=len(jobs) - len(pending))
+    if result.skipped:
+        progress(f"skip {result.skipped} existing")
+    if not pending:
+        return result
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    started = time.perf_counter()
+    done = 0
+    hits = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if cache_dir is None:
+            futures = {pool.submit(render_job, cfg, path, fmt, width, height): path for cfg, path in pending}
+        else:
+            from fractal.render_cache import DEFAULT_MAX_BYTES
+
+            max_bytes = cache_bytes or DEFAULT_MAX_BYTES
+            futures = {
+                pool.submit(render_job_cached, cache_dir, max_bytes, cfg, path, fmt, width, height): path
+                for cfg, path in pending
+            }
+        for fut in as_completed(futures):
+            path = futures[fut]
+            done += 1
+            try:
+                if cache_dir is None:
+                    fut.result()
+                else:
+                    hits += fut.result()[1]
+            except Exception as e:  # упавший рендер или процесс — остальные продолжают
+                result.failed += 1
+                progress(f"[{done}/{len(pending)}] FAILED {os.path.basename(path)}: {type(e).__name__}: {e}")
+                continue
+            elapsed = time.perf_counter() - started
+            progress(f"[{done}/{len(pending)}] {os.path.basename(path)}  {done / elapsed:.1f} img/s")
+
+    elapsed = time.perf_counter() - started
+    result.rendered = done - result.failed
+    progress(
+        f"rendered {result.rendered} in {elapsed:.1f}s ({result.rendered / elapsed * 3600:.0f} img/h, {workers} workers)"
+    )
+    if result.failed:
+        progress(f"failed {result.failed}")
+    if cache_dir is not None:
+        progress(f"render cache: {hits} hits, {result.rendered - hits} misses")
+    return result
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("configs", help="TreeConfig records: .jsonl or .csv")
+    parser.add_argument("-o", "--out", default="renders", help="output directory")
+    parser.add_argument("-f", "--format", default="png", choices=FORMATS)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="default: number of cores")
+    parser.add_argument("--cache", metavar="DIR", help="reuse renders from a shared render cache directory")
+    parser.add_argument("--cache-mb", type=int, default=None, help="render cache size limit, MB (default 512)")
+
+
+def main(args: argparse.Namespace) -> int:
+    # 0 — всё отрендерено, 1 — были битые записи или упавшие задания, 2 — файл не прочитать
+    errors: List[str] = []
+    try:
+        jobs = load_jobs(args.configs, errors)
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    for message in errors:
+        print(f"error: {message}", file=sys.stderr)
+
+    cache_bytes = args.cache_mb * 2**20 if args.cache_mb else None
+    result = run_batch(
+        jobs, args.out, args.format, args.width, args.height, args.workers, cache_dir=args.cache, cache_bytes=cache_bytes
+    )
+    failed = len(errors) + result.failed
+    if failed:
+        print(f"{failed} failed ({len(errors)} invalid records, {result.failed} render errors)", file=sys.stderr)
+        return 1
+    return 0
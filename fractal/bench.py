@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+import argparse
+import io
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fractal.config import TreeConfig
+from fractal.geometry import _leaf_choices, _subtree_shape, generate_geometry
+from fractal.palette import get_palette
+
+
+BACKENDS = ("bbox", "geometry", "raster", "svg", "eps", "canvas", "turtle")
+
+# Дерево, у которого все уровни до depth=18 полные (ветки не короче 2 px), —
+# иначе при росте depth число сегментов перестаёт расти и сравнивать нечего
+_BASE = dict(trunk_length=200.0, shrink=0.8)
+
+# turtle рисует по одному сегменту; глубже — минуты на один замер
+TURTLE_MAX_DEPTH = 12
+
+RENDER_SIZE = 1024
+
+
+@dataclass
+class BenchResult:
+    case: str
+    backend: str
+    depth: int
+    draw_mode: str
+    randomness: float
+    segments: int
+    seconds: float
+    segments_per_sec: float
+    peak_mb: float
+
+
+# ---------------- замеры ----------------
+
+# готовит замер: возвращает (функцию, которую меряем, число сегментов) или None — пропустить
+Prepare = Callable[[TreeConfig], Optional[Tuple[Callable[[], Any], int]]]
+
+
+def _clear_caches() -> None:
+    # кэши детерминированного дерева: формы поддеревьев и цвета листьев по seed
+    _subtree_shape.cache_clear()
+    _leaf_choices.cache_clear()
+
+
+def _cold(fn: Callable[[], Any]) -> Callable[[], Any]:
+    # без кэшей генерации: иначе со второго прогона меряем кэш
+    def run() -> Any:
+        _clear_caches()
+        return fn()
+
+    return run
+
+
+def _cold_count(cfg: TreeConfig) -> int:
+    # число сегментов; кэши после подсчёта очищаются, чтобы замер начинался холодным
+    count = len(generate_geometry(cfg))
+    _clear_caches()
+    return count
+
+
+def _prepare_bbox(cfg: TreeConfig):
+    from fractal.tree import estimate_tree_bbox
+
+    return _cold(lambda: estimate_tree_bbox(cfg)), _cold_count(cfg)
+
+
+def _prepare_geometry(cfg: TreeConfig):
+    return _cold(lambda: generate_geometry(cfg)), _cold_count(cfg)
+
+
+def _prepare_raster(cfg: TreeConfig):
+    from fractal.raster import render_rgba
+
+    geom = generate_geometry(cfg)
+    palette = get_palette(cfg.palette_name)
+    return (lambda: render_rgba(geom, palette, RENDER_SIZE, RENDER_SIZE)), len(geom)
+
+
+def _prepare_vector(writer_name: str) -> Prepare:
+    def prepare(cfg: TreeConfig):
+        from fractal import vector
+
+        writer = getattr(vector, writer_name)
+        geom = generate_geometry(cfg)
+        palette = get_palette(cfg.palette_name)
+        return (lambda: writer(geom, palette, io.StringIO(), RENDER_SIZE, RENDER_SIZE)), len(geom)
+
+    return prepare
+
+
+class _Display:
+    # Одно скрытое окно Tk на все замеры canvas/turtle; None — дисплея нет
+    _root = None
+    _tried = False
+
+    @classmethod
+    def root(cls):
+        if not cls._tried:
+            cls._tried = True
+            try:
+                import tkinter as tk
+
+                cls._root = tk.Tk()
+                cls._root.withdraw()
+            except Exception:
+                cls._root = None
+        return cls._root
+
+
+def _prepare_canvas(cfg: TreeConfig):
+    root = _Display.root()
+    if root is None:
+        return None
+
+    import tkinter as tk
+    from fractal.canvas_renderer import CanvasTreeRenderer
+    from fractal.view import fit_viewport
+
+    canvas = tk.Canvas(root, width=RENDER_SIZE, height=RENDER_SIZE)
+    renderer = CanvasTreeRenderer(canvas)
+    geom = generate_geometry(cfg)
+    palette = get_palette(cfg.palette_name)
+    view = fit_viewport(geom.bbox, RENDER_SIZE, RENDER_SIZE)
+
+    def run() -> None:
+        renderer.clear()
+        renderer.draw(geom, palette, view)
+        canvas.update_idletasks()
+
+    return run, len(geom)
+
+
+def _prepare_turtle(cfg: TreeConfig):
+    root = _Display.root()
+    if root is None or cfg.depth > TURTLE_MAX_DEPTH:
+        return None
+
+    import tkinter as tk
+    import turtle
+    from fractal.tree import FractalTreeRenderer
+
+    canvas = tk.Canvas(root, width=RENDER_SIZE, height=RENDER_SIZE)
+    screen = turtle.TurtleScreen(canvas)
+    screen.tracer(0, 0)
+    t = turtle.RawTurtle(screen)
+    renderer = FractalTreeRenderer(t)
+
+    def run() -> None:
+        t.clear()
+        renderer.draw(cfg)
+        screen.update()
+
+    return run, len(generate_geometry(cfg))
+
+
+_PREPARE: Dict[str, Prepare] = {
+    "bbox": _prepare_bbox,
+    "geometry": _prepare_geometry,
+    "raster": _prepare_raster,
+    "svg": _prepare_vector("write_svg"),
+    "eps": _prepare_vector("write_eps"),
+    "canvas": _prepare_canvas,
+    "turtle": _prepare_turtle,
+}
+
+
+def _measure(fn: Callable[[], Any], repeat: int) -> Tuple[float, float]:
+    # время — лучший из repeat прогонов; память — отдельный прогон под tracemalloc,
+    # чтобы его накладные расходы не попали во время
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2**20
+
+
+def bench_config(depth: int, draw_mode: str, randomness: float) -> TreeConfig:
+    return TreeConfig(depth=depth, draw_mode=draw_mode, randomness=randomness, seed=1, **_BASE)
+
+
+def run_bench(
+    depths: Sequence[int],
+    draw_modes: Sequence[str],
+    randomness: Sequence[float],
+    backends: Sequence[str] = BACKENDS,
+    repeat: int = 5,
+    progress: Callable[[str], None] = print,
+) -> List[BenchResult]:
+    results = []
+    for backend, depth, mode, rnd in itertools.product(backends, depths, draw_modes, randomness):
+        case = f"{backend}/d{depth}/{mode}/r{rnd:g}"
+        cfg = bench_config(depth, mode, rnd)
+        prepared = _PREPARE[backend](cfg)
+        if prepared is None:
+            progress(f"{case:32s} skipped")
+            continue
+
+        fn, segments = prepared
+        seconds, peak_mb = _measure(fn, repeat)
+        res = BenchResult(
+            case=case,
+            backend=backend,
+            depth=depth,
+            draw_mode=mode,
+            randomness=rnd,
+            segments=segments,
+            seconds=seconds,
+            segments_per_sec=segments / max(seconds, 1e-9),
+            peak_mb=peak_mb,
+        )
+        results.append(res)
+        progress(f"{case:32s} {seconds * 1000:9.1f} ms {res.segments_per_sec:12.0f} seg/s {peak_mb:8.1f} MB")
+    return results
+
+
+# ---------------- время импорта ----------------
+
+# Бюджет холодного импорта, мс (новый процесс, лучший из нескольких): столько платят воркеры
+# batch/serve/poster и headless-скрипты до начала работы. Почти всё — numpy (~70 мс на
+# типичной машине); запас — на медленные диски контейнеров. Ни один из этих модулей не
+# должен тянуть GUI_MODULES.
+IMPORT_BUDGET_MS: Dict[str, float] = {
+    "fractal": 10.0,
+    "fractal.config": 60.0,
+    "fractal.batch": 80.0,
+    "fractal.geometry": 300.0,
+    "fractal.tree": 300.0,
+    "fractal.raster": 300.0,
+    "fractal.vector": 300.0,
+    "fractal.store": 300.0,
+    "fractal.server": 400.0,
+    "fractal.tiles": 400.0,
+}
+
+GUI_MODULES = ("tkinter", "_tkinter", "turtle")
+
+_IMPORT_PROBE = (
+    "import json, sys, time\n"
+    "t = time.perf_counter()\n"
+    "import {module}\n"
+    "ms = (time.perf_counter() - t) * 1000.0\n"
+    "print(json.dumps([ms, [m for m in {gui!r} if m in sys.modules]]))\n"
+)
+
+
+@dataclass
+class ImportResult:
+    module: str
+    ms: float
+    budget_ms: float
+    gui_modules: List[str]
+
+    @property
+    def ok(self) -> bool:
+        return self.ms <= self.budget_ms and not self.gui_modules
+
+
+def measure_import(module: str, repeat: int = 3) -> Tuple[float, List[str]]:
+    best = float("inf")
+    gui: List[str] = []
+    for _ in range(max(1, repeat)):
+        out = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module, gui=GUI_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        ms, gui = json.loads(out.stdout)
+        best = min(best, ms)
+    return best, gui
+
+
+def check_imports(
+    budget: Optional[Dict[str, float]] = None,
+    repeat: int = 3,
+    progress: Callable[[str], None] = print,
+) -> List[ImportResult]:
+    results = []
+    for module, limit in (budget or IMPORT_BUDGET_MS).items():
+        ms, gui = measure_import(module, repeat)
+        res = ImportResult(module, ms, limit, gui)
+        results.append(res)
+        flag = "ok" if res.ok else "OVER BUDGET" if not gui else f"loads {', '.join(gui)}"
+        progress(f"{module:20s} {ms:8.1f} ms  (budget {limit:g})  {flag}")
+    return results
+
+
+# ---------------- файл результатов и сравнение ----------------
+
+def save_results(path: str, results: Sequence[BenchResult]) -> None:
+    data = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "results": [asdict(r) for r in results],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def load_results(path: str) -> List[BenchResult]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [BenchResult(**r) for r in data["results"]]
+
+
+def compare_results(
+    baseline: Sequence[BenchResult],
+    current: Sequence[BenchResult],
+    threshold: float = 0.15,
+    min_delta_ms: float = 1.0,
+) -> List[str]:
+    # Регрессия: время или пиковая память выросли больше чем на threshold (доля).
+    # Совсем короткие замеры шумят, поэтому по времени нужен ещё и прирост в min_delta_ms.
+    base = {r.case: r for r in baseline}
+    regressions = []
+    for r in current:
+        old = base.get(r.case)
+        if old is None:
+            continue
+        slower = r.seconds - old.seconds
+        if r.seconds > old.seconds * (1.0 + threshold) and slower * 1000 > min_delta_ms:
+            regressions.append(
+                f"{r.case}: time {old.seconds * 1000:.1f} -> {r.seconds * 1000:.1f} ms "
+                f"(+{(r.seconds / old.seconds - 1) * 100:.0f}%)"
+            )
+        if r.peak_mb > old.peak_mb * (1.0 + threshold) and r.peak_mb - old.peak_mb > 1.0:
+            regressions.append(f"{r.case}: peak memory {old.peak_mb:.1f} -> {r.peak_mb:.1f} MB")
+    return regressions
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("-o", "--out", default="bench.json", help="where to write results")
+    parser.add_argument("--depths", type=int, nargs="+", default=[10, 14, 16])
+    parser.add_argument("--modes", nargs="+", default=["line", "square"], choices=["line", "square"])
+    parser.add_argument("--randomness", type=float, nargs="+", default=[0.0, 0.5])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case, best is kept")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a saved results file")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown, fraction (0.15 = 15%%)")
+    parser.add_argument("--imports", action="store_true", help="only check import times against IMPORT_BUDGET_MS")
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.imports:
+        failed = [r for r in check_imports() if not r.ok]
+        return 1 if failed else 0
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = load_results(args.compare)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+
+    results = run_bench(args.depths, args.modes, args.randomness, args.backends, args.repeat)
+    save_results(args.out, results)
+    print(f"saved {len(results)} results to {args.out}")
+
+    if baseline is None:
+        return 0
+    regressions = compare_results(baseline, results, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        return 1
+    print(f"no regressions against {args.compare}")
+    return 0
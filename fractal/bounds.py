@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import math
+from typing import Optional
+
+import numpy as np
+
+from fractal.config import TreeConfig
+from fractal.geometry import BBox, _clamp, _level_params, _uniform_height, stamp_half_size
+
+
+# Рамка дерева без генерации сегментов. Всё считается через опорную функцию поддерева:
+# h(θ) — насколько далеко поддерево (корень в (0, 0), курс 0°) заходит в направлении θ.
+# Стороны рамки — h по четырём осям у ствола (курс 90°). Поддерево уровня L — ветка плюс
+# два поддерева уровня L + 1, повёрнутые на ±angle и сдвинутые на длину ветки, поэтому
+#   h_L(θ) = max(ветка(θ), длина * cos θ + max(h_{L+1}(θ - angle), h_{L+1}(θ + angle))).
+
+# Шаг сетки направлений для оценки случайных деревьев, градусы (360 / шаг делится на 4:
+# оси — узлы сетки)
+_BOUND_STEP_DEG = 0.25
+
+
+def _ext(thickness: float, cos: np.ndarray, sin: np.ndarray, draw_mode: str) -> np.ndarray:
+    # насколько нарисованный сегмент выходит за свой конец в направлении (cos, sin) от курса,
+    # как в geometry._segments_bbox: круглый конец пера или повёрнутый квадрат stamp()
+    if draw_mode == "square":
+        half = float(stamp_half_size(np.array([thickness]))[0])
+        return half * (np.abs(cos) + np.abs(sin))
+    return np.full(cos.shape, max(1.0, thickness) / 2.0)
+
+
+def _leaf_thickness(thickness: float, draw_mode: str) -> float:
+    return max(1.0, thickness * 0.7) if draw_mode == "square" else thickness
+
+
+def exact_bbox(cfg: TreeConfig) -> Optional[BBox]:
+    # Точная рамка при randomness == 0 (та же, что generate_geometry(cfg).bbox), None — иначе.
+    # Все поддеревья уровня одинаковы, а направления, в которых их надо знать, — оси, повёрнутые
+    # на k * angle, |k| <= L: по уровню на numpy-проход, снизу вверх.
+    if cfg.randomness != 0:
+        return None
+    height = _uniform_height(cfg)
+    if height is None:
+        return None
+
+    a = math.radians(cfg.angle_deg)
+    # направления рамки (+x, +y, -x, -y) относительно курса ствола
+    theta0 = np.radians([-90.0, 0.0, 90.0, 180.0])[:, None]
+    h: Optional[np.ndarray] = None
+    for level in range(height, -1, -1):
+        length, thickness = _level_params(cfg, level)
+        length = max(1.0, length)
+        if level == height:
+            thickness = _leaf_thickness(thickness, cfg.draw_mode)
+        theta = theta0 + np.arange(-level, level + 1)[None, :] * a
+        cos, sin = np.cos(theta), np.sin(theta)
+        branch = np.maximum(0.0, length * cos) + _ext(thickness, cos, sin, cfg.draw_mode)
+        if h is None:
+            h = branch
+        else:
+            # левый ребёнок (поворот +angle) — индекс k - 1, правый — k + 1
+            h = np.maximum(branch, length * cos + np.maximum(h[:, :-2], h[:, 2:]))
+
+    maxx, maxy, neg_minx, neg_miny = (float(v) for v in h[:, 0])
+    return BBox(-neg_minx, -neg_miny, maxx, maxy)
+
+
+def bbox_bound(cfg: TreeConfig) -> BBox:
+    # Рамка, которая заведомо содержит дерево при любом seed (и любом rng): длины веток —
+    # в пределах разброса ±15% * randomness, повороты — ±10° * randomness. Опорная функция
+    # считается на сетке направлений; максимум по интервалу поворотов берётся по узлам
+    # сетки плюс запас R * шаг / 2 (R — радиус поддерева, h не меняется быстрее).
+    exact = exact_bbox(cfg)
+    if exact is not None:
+        return exact
+
+    jitter_len = abs(cfg.randomness) * 0.15
+    jitter_angle = abs(cfg.randomness) * 10.0
+
+    # интервалы длин по уровням (как в geometry._uniform_height) — до уровня, где листья все
+    lengths = []
+    lo = hi = float(cfg.trunk_length)
+    thickness = float(cfg.thickness)
+    for level in range(max(0, cfg.depth) + 1):
+        a_lo = max(1.0, lo * (1.0 - jitter_len))
+        a_hi = max(1.0, hi * (1.0 + jitter_len))
+        # лист в режиме square рисуется толщиной max(1, 0.7 * t): берём большую из двух
+        th = max(thickness, _leaf_thickness(thickness, cfg.draw_mode))
+        lengths.append((a_lo, a_hi, th))
+        if hi < 2:
+            break
+        lo, hi = a_lo * cfg.shrink, a_hi * cfg.shrink
+        thickness = _clamp(thickness * cfg.thickness_decay, 0.5, 50)
+
+    step = math.radians(_BOUND_STEP_DEG)
+    n = int(round(360.0 / _BOUND_STEP_DEG))
+    theta = np.arange(n) * step
+    cos, sin = np.cos(theta), np.sin(theta)
+
+    # сдвиги по сетке, покрывающие интервалы поворота ребёнка ±(angle ± jitter) с запасом
+    # в полшага: ближайший узел к любой точке интервала попадает в окно
+    offsets = set()
+    for turn in (cfg.angle_deg, -cfg.angle_deg):
+        first = math.ceil((turn - jitter_angle) / _BOUND_STEP_DEG - 0.5)
+        last = math.floor((turn + jitter_angle) / _BOUND_STEP_DEG + 0.5)
+        offsets.update(range(first, last + 1))
+
+    h: Optional[np.ndarray] = None
+    radius = 0.0
+    for a_lo, a_hi, th in reversed(lengths):
+        ext = _ext(th, cos, sin, cfg.draw_mode)
+        ext_max = float(ext.max())
+        branch = np.maximum(0.0, a_hi * cos) + ext
+        if h is None:
+            h = branch
+            radius = a_hi + ext_max
+            continue
+        # h ребёнка в направлении θ - поворот: узел i - off
+        child = np.full(n, -np.inf)
+        for off in offsets:
+            np.maximum(child, np.roll(h, off), out=child)
+        child += radius * step / 2.0
+        reach = np.where(cos > 0, a_hi, a_lo) * cos
+        h = np.maximum(branch, reach + child)
+        radius = a_hi + max(ext_max, radius)
+
+    # оси мира при курсе ствола 90°: +x -> -90°, +y -> 0°, -x -> 90°, -y -> 180°
+    quarter = n // 4
+    maxx, maxy, neg_minx, neg_miny = (float(h[i % n]) for i in (-quarter, 0, quarter, 2 * quarter))
+    return BBox(-neg_minx, -neg_miny, maxx, maxy)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fractal.geometry import STAMP_FILL, TreeGeometry, color_table, stamp_centers, stamp_half_size
+from fractal.palette import Palette
+from fractal.view import Viewport
+
+if TYPE_CHECKING:
+    import tkinter as tk
+
+
+# Рисование одной командой Tcl на группу (цвет, толщина): цикл по координатам
+# идёт внутри интерпретатора, без вызова tkinter на каждый сегмент.
+_TCL_PROCS = """
+proc fractal_tree_lines {c opts coords} {
+    foreach {a b d e} $coords { $c create line $a $b $d $e {*}$opts }
+}
+proc fractal_tree_polygons {c opts coords} {
+    foreach {a b d e f g h i} $coords { $c create polygon $a $b $d $e $f $g $h $i {*}$opts }
+}
+"""
+
+
+def _coords_str(coords: np.ndarray) -> str:
+    return " ".join(map("{:.2f}".format, coords.ravel().tolist()))
+
+
+def _stamp_rows(starts: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    # номера всех квадратов сегментов idx (квадраты сегмента i — starts[i]..starts[i+1])
+    counts = starts[idx + 1] - starts[idx]
+    offsets = np.repeat(starts[idx] - (np.cumsum(counts) - counts), counts)
+    return offsets + np.arange(int(counts.sum()))
+
+
+class CanvasTreeRenderer:
+    TAG = "tree"
+
+    def __init__(self, canvas: tk.Canvas) -> None:
+        self.canvas = canvas
+        self.canvas.tk.eval(_TCL_PROCS)
+        # draw_mode того, что сейчас на canvas (None — ничего), для restyle()
+        self._mode: Optional[str] = None
+
+    def clear(self) -> None:
+        self.canvas.delete(self.TAG)
+        self._mode = None
+
+    # Кроме общего TAG у каждого элемента теги индекса цвета и уровня: restyle() меняет
+    # цвет и толщину одним itemconfigure на тег, не пересоздавая элементы
+    def color_tag(self, color: int) -> str:
+        return f"{self.TAG}-c{color}"
+
+    def depth_tag(self, depth: int) -> str:
+        return f"{self.TAG}-d{depth}"
+
+    def restyle(self, palette: Palette, widths: Optional[Sequence[float]] = None) -> None:
+        # Уже нарисованное дерево — в цвета palette; widths[d] — новая толщина линий уровня d
+        # (у квадратов толщина задаёт их размер, такое только перерисовкой).
+        self.canvas.configure(background=palette.background)
+        if self._mode is None:
+            return
+        option = "outline" if self._mode == "square" else "fill"
+        for i, color in enumerate(color_table(palette)):
+            self.canvas.itemconfigure(self.color_tag(i), **{option: color})
+        if widths is not None and self._mode != "square":
+            for depth, th in enumerate(widths):
+                self.canvas.itemconfigure(self.depth_tag(depth), width=max(1.0, float(th)))
+
+    def draw(self, geom: TreeGeometry, palette: Palette, view: Viewport) -> int:
+        return sum(self.draw_iter(geom, palette, view))
+
+    def draw_iter(
+        self,
+        geom: TreeGeometry,
+        palette: Palette,
+        view: Viewport,
+        chunk: int = 0,
+    ) -> Iterator[int]:
+        # Рисует порциями не больше chunk сегментов (0 — без ограничения) и после каждой
+        # отдаёт число созданных элементов: вызывающий может вернуть управление циклу Tk
+        # или бросить генератор. Уровни идут по порядку, так что сначала появляется
+        # грубый скелет дерева, потом всё более мелкие ветки.
+        self.canvas.configure(background=palette.background)
+        colors = color_table(palette)
+        self._mode = geom.draw_mode
+
+        # мировые координаты -> координаты canvas (учитываем прокрутку, которую ставит turtle)
+        ox = self.canvas.canvasx(0)
+        oy = self.canvas.canvasy(0)
+        px0, py0 = view.to_pixels(geom.x0.astype(np.float64), geom.y0.astype(np.float64))
+        px1, py1 = view.to_pixels(geom.x1.astype(np.float64), geom.y1.astype(np.float64))
+        px0 += ox
+        px1 += ox
+        py0 += oy
+        py1 += oy
+
+        if geom.draw_mode == "square":
+            corners, starts = self._square_corners(geom, view, ox, oy)
+
+        # уровни по порядку (как turtle: ветка раньше своих потомков), внутри уровня — по цвету
+        order = np.lexsort((geom.color, geom.depth))
+        key = geom.depth[order].astype(np.int64) * 256 + geom.color[order]
+        bounds = np.flatnonzero(np.diff(key)) + 1
+        groups = np.split(order, bounds)
+
+        if chunk > 0:
+            groups = [g[i:i + chunk] for g in groups for i in range(0, g.size, chunk)]
+
+        items = 0
+        pending = 0
+        for idx in groups:
+            color_index = int(geom.color[idx[0]])
+            color = colors[color_index]
+            tags = (self.TAG, self.color_tag(color_index), self.depth_tag(int(geom.depth[idx[0]])))
+            if geom.draw_mode == "square":
+                # все квадраты группы — одним вызовом, как линии
+                coords = corners[_stamp_rows(starts, idx)]
+                opts = ("-fill", STAMP_FILL, "-outline", color, "-width", 1, "-tags", tags)
+                self.canvas.tk.call("fractal_tree_polygons", str(self.canvas), opts, _coords_str(coords))
+                items += len(coords)
+            else:
+                th = float(geom.thickness[idx[0]])
+                coords = np.column_stack((px0[idx], py0[idx], px1[idx], py1[idx]))
+                opts = ("-fill", color, "-width", max(1.0, th), "-capstyle", "round", "-tags", tags)
+                self.canvas.tk.call("fractal_tree_lines", str(self.canvas), opts, _coords_str(coords))
+                items += len(idx)
+
+            pending += len(idx)
+            if chunk > 0 and pending >= chunk:
+                yield items
+                items = 0
+                pending = 0
+        if items:
+            yield items
+
+    @staticmethod
+    def _square_corners(
+        geom: TreeGeometry,
+        view: Viewport,
+        ox: float,
+        oy: float,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # Углы всех квадратов сразу: центры — те же stamp_centers, что у bbox и raster,
+        # размер квадрата — в пикселях (turtle не масштабирует форму под мировые координаты).
+        seg, sx, sy = stamp_centers(geom)
+        cx, cy = view.to_pixels(sx, sy)
+        cx += ox
+        cy += oy
+
+        # курс ветки в пикселях (ось y вниз)
+        dx = (geom.x1 - geom.x0).astype(np.float64)
+        dy = (geom.y0 - geom.y1).astype(np.float64)
+        dist = np.hypot(dx, dy)
+        flat = dist == 0
+        ux = np.where(flat, 1.0, dx / np.where(flat, 1.0, dist))
+        uy = np.where(flat, 0.0, dy / np.where(flat, 1.0, dist))
+
+        # повёрнутый квадрат: половины диагоналей вдоль (u + n) и (u - n)
+        half = stamp_half_size(geom.thickness)
+        ax, ay = half * (ux - uy), half * (uy + ux)
+        bx, by = half * (ux + uy), half * (uy - ux)
+        ax, ay, bx, by = ax[seg], ay[seg], bx[seg], by[seg]
+
+        corners = np.column_stack((
+            cx + ax, cy + ay, cx - bx, cy - by, cx - ax, cy - ay, cx + bx, cy + by,
+        ))
+        # квадраты сегмента i — строки starts[i]..starts[i + 1]
+        starts = np.searchsorted(seg, np.arange(len(geom) + 1))
+        return corners, starts
@@ -1,4 +1,15 @@
+import math
 from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+# Режимы TreeConfig.rng (здесь, а не в fractal.rng: разбор конфигов обходится без numpy)
+RNG_SEQUENTIAL = "sequential"  # один random.Random(seed) на всё дерево, как в turtle-рендере
+RNG_HASHED = "hashed"          # у каждого узла свои числа: хеш (seed, путь узла)
+RNG_MODES = (RNG_SEQUENTIAL, RNG_HASHED)
+
+# Режимы TreeConfig.draw_mode
+DRAW_MODES = ("line", "square")
+
 
 @dataclass(frozen=True)
 class TreeConfig:
@@ -21,5 +32,43 @@ class TreeConfig:
     palette_name: str = "Classic"
     background: str = "#0b1020"
 
-    # режим рисования: "line" или "square"
+    # режим рисования: "line" или "square" (DRAW_MODES)
     draw_mode: str = "line"
+
+    # случайность ветки: "sequential" — один random.Random(seed) на всё дерево, как всегда;
+    # "hashed" — числа ветки из хеша (seed, путь от ствола), поддеревья считаются независимо
+    rng: str = RNG_SEQUENTIAL
+
+
+# Допустимые значения TreeConfig — общие для GUI, пакетного рендера и HTTP-сервера.
+# Глубже MAX_DEPTH дерево на экране и в ответе сервера считается слишком долго.
+MAX_DEPTH = 18
+
+# Числовые поля: (минимум, максимум) включительно, значения — конечные числа
+FIELD_LIMITS: Dict[str, Tuple[float, float]] = {
+    "angle_deg": (0.0, 180.0),
+    "trunk_length": (1.0, 2000.0),
+    "shrink": (0.3, 0.95),
+    "thickness": (0.0, 50.0),
+    "thickness_decay": (0.0, 1.0),
+    "randomness": (0.0, 1.0),
+}
+
+
+def config_error(cfg: TreeConfig, max_depth: int = MAX_DEPTH) -> Optional[str]:
+    # Что не так с конфигом (первое найденное) или None. shrink близко к 1 при большой глубине
+    # или огромные длины и толщины дают деревья, которые считаются минутами.
+    from fractal.palette import list_palette_names
+
+    choices = {"draw_mode": DRAW_MODES, "rng": RNG_MODES, "palette_name": tuple(list_palette_names())}
+    for name, allowed in choices.items():
+        value = getattr(cfg, name)
+        if value not in allowed:
+            return f"{name} must be one of {', '.join(allowed)}, got {value!r}"
+    if not (0 <= cfg.depth <= max_depth):
+        return f"depth must be in 0..{max_depth}, got {cfg.depth!r}"
+    for name, (lo, hi) in FIELD_LIMITS.items():
+        value = getattr(cfg, name)
+        if not (math.isfinite(value) and lo <= value <= hi):
+            return f"{name} must be in {lo:g}..{hi:g}, got {value!r}"
+    return None
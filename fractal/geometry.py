@@ -0,0 +1,956 @@
+from __future__ import annotations
+
+import math
+import random
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from fractal.config import TreeConfig
+from fractal.palette import Palette, get_palette
+from fractal.rng import (
+    DRAW_LEFT,
+    DRAW_LENGTH,
+    DRAW_RIGHT,
+    RNG_HASHED,
+    hashed_choice_array,
+    hashed_uniform_array,
+)
+
+
+# Индекс цвета сегмента: 0 — ствол, i >= 1 — palette.leaf_colors[i - 1]
+TRUNK_COLOR_INDEX = 0
+
+# turtle по умолчанию заливает stamp() чёрным (fillcolor), а pencolor идёт в контур
+STAMP_FILL = "black"
+
+# Один узел дерева съедает три rnd.uniform(), каждый — два 32-битных слова MT19937
+_WORDS_PER_NODE = 6
+
+
+def _clamp(x: float, lo: float, hi: float) -> float:
+    return max(lo, min(hi, x))
+
+
+def color_table(palette: Palette) -> List[str]:
+    return [palette.trunk_color] + list(palette.leaf_colors)
+
+
+@dataclass
+class BBox:
+    minx: float
+    miny: float
+    maxx: float
+    maxy: float
+
+    def expand(self, x: float, y: float) -> None:
+        self.minx = min(self.minx, x)
+        self.miny = min(self.miny, y)
+        self.maxx = max(self.maxx, x)
+        self.maxy = max(self.maxy, y)
+
+    def pad(self, p: float) -> "BBox":
+        return BBox(self.minx - p, self.miny - p, self.maxx + p, self.maxy + p)
+
+    @property
+    def w(self) -> float:
+        return max(1e-9, self.maxx - self.minx)
+
+    @property
+    def h(self) -> float:
+        return max(1e-9, self.maxy - self.miny)
+
+
+@dataclass
+class TreeGeometry:
+    # Сегменты идут по уровням (ствол первым), внутри уровня — слева направо.
+    x0: np.ndarray
+    y0: np.ndarray
+    x1: np.ndarray
+    y1: np.ndarray
+    thickness: np.ndarray  # толщина, которую renderer передал бы в pensize/_square_size
+    color: np.ndarray      # uint8, см. TRUNK_COLOR_INDEX
+    depth: np.ndarray      # uint8, уровень от ствола (0 — ствол)
+    bbox: BBox
+    draw_mode: str = "line"
+
+    def __len__(self) -> int:
+        return int(self.x0.shape[0])
+
+    @property
+    def max_depth(self) -> int:
+        return int(self.depth[-1]) if len(self) else 0
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+# Проверка отмены: вызывается между уровнями / порциями узлов, True — прекратить
+StopCheck = Callable[[], bool]
+
+
+def _never() -> bool:
+    return False
+
+
+def generate_geometry(cfg: TreeConfig, should_stop: StopCheck = _never) -> TreeGeometry:
+    n_colors = len(get_palette(cfg.palette_name).leaf_colors)
+
+    height = _uniform_height(cfg)
+    if cfg.rng == RNG_HASHED:
+        cols, _, _ = _hashed_nodes(cfg, n_colors, _hashed_root(cfg), should_stop=should_stop)
+    elif height is None:
+        cols = _walk_nodes(cfg, n_colors, should_stop)
+    elif cfg.randomness == 0:
+        cols = _instanced_nodes(cfg, height, n_colors, should_stop)
+    else:
+        cols = _level_nodes(cfg, height, n_colors, should_stop)
+    _check(should_stop)
+    return _build_geometry(cols, cfg.draw_mode)
+
+
+def _check(should_stop: StopCheck) -> None:
+    if should_stop():
+        raise GenerationCancelled()
+
+
+def _build_geometry(cols: "_Columns", draw_mode: str) -> TreeGeometry:
+    x0, y0, x1, y1, th, color, depth = cols
+    return TreeGeometry(
+        x0=x0.astype(np.float32),
+        y0=y0.astype(np.float32),
+        x1=x1.astype(np.float32),
+        y1=y1.astype(np.float32),
+        thickness=th.astype(np.float32),
+        color=color.astype(np.uint8),
+        depth=depth.astype(np.uint8),
+        bbox=_segments_bbox(x0, y0, x1, y1, th, draw_mode),
+        draw_mode=draw_mode,
+    )
+
+
+def _segments_bbox(
+    x0: np.ndarray,
+    y0: np.ndarray,
+    x1: np.ndarray,
+    y1: np.ndarray,
+    thickness: np.ndarray,
+    draw_mode: str,
+) -> BBox:
+    if draw_mode == "square":
+        # Центры квадратов — stamp_centers(): от начала ветки до её конца, так что крайние
+        # из них — на концах. Квадрат turtle 20x20 (масштаб по толщине) повёрнут по курсу ветки.
+        half = stamp_half_size(thickness)
+        dx = x1 - x0
+        dy = y1 - y0
+        seg_len = np.maximum(np.hypot(dx, dy), 1e-12)
+        ext = half * (np.abs(dx) + np.abs(dy)) / seg_len
+    else:
+        # круглые концы линии шириной pensize
+        ext = np.maximum(1.0, thickness) / 2.0
+
+    return BBox(
+        float((np.minimum(x0, x1) - ext).min()),
+        float((np.minimum(y0, y1) - ext).min()),
+        float((np.maximum(x0, x1) + ext).max()),
+        float((np.maximum(y0, y1) + ext).max()),
+    )
+
+
+def stamp_centers(geom: TreeGeometry) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Точки stamp() из FractalTreeRenderer._forward_with_squares для всех веток сразу:
+    # 0, step, 2*step, ..., длина ветки (мировые единицы). Возвращает номер сегмента и x, y.
+    x0 = geom.x0.astype(np.float64)
+    y0 = geom.y0.astype(np.float64)
+    dx = geom.x1 - x0
+    dy = geom.y1 - y0
+    dist = np.hypot(dx, dy)
+    step = np.maximum(4.0, geom.thickness.astype(np.float64) * 0.9)
+
+    count = 1 + np.ceil(dist / step).astype(np.int64)
+    seg = np.repeat(np.arange(dist.size), count)
+    k = np.arange(seg.size) - np.repeat(np.cumsum(count) - count, count)
+    frac = np.minimum(k * step[seg], dist[seg]) / np.maximum(dist[seg], 1e-12)
+    return seg, x0[seg] + dx[seg] * frac, y0[seg] + dy[seg] * frac
+
+
+def stamp_half_size(thickness: np.ndarray) -> np.ndarray:
+    # turtle "square" 20x20, shapesize = max(0.15, thickness / 10)
+    return 10.0 * np.maximum(0.15, thickness.astype(np.float64) / 10.0)
+
+
+# ---------------- стиль без генерации ----------------
+
+# Поля TreeConfig, от которых сегменты не зависят: цвета подставляются при отрисовке
+STYLE_FIELDS = ("palette_name", "background")
+
+# ...а у линий и толщина: концы веток от неё не зависят (у квадратов от толщины зависят
+# размер и шаг stamp(), то есть сами сегменты-квадраты)
+LINE_STYLE_FIELDS = STYLE_FIELDS + ("thickness", "thickness_decay")
+
+
+def level_thickness(cfg: TreeConfig, max_depth: int) -> np.ndarray:
+    # толщина веток уровней 0..max_depth, как её получает pensize (у линий — и у листьев)
+    out = np.empty(max_depth + 1)
+    thickness = float(cfg.thickness)
+    for level in range(max_depth + 1):
+        out[level] = thickness
+        thickness = _clamp(thickness * cfg.thickness_decay, 0.5, 50)
+    return out
+
+
+def restyle_geometry(geom: TreeGeometry, old: TreeConfig, new: TreeConfig) -> Optional[TreeGeometry]:
+    # geom, построенная для old, — как геометрия для new, если конфиги отличаются только стилем:
+    # те же сегменты, при другой толщине линий — новые thickness и bbox. None — нужна генерация.
+    if old.draw_mode != new.draw_mode:
+        return None
+    fields = LINE_STYLE_FIELDS if new.draw_mode == "line" else STYLE_FIELDS
+    if replace(old, **{name: getattr(new, name) for name in fields}) != new:
+        return None
+    # другое число цветов листьев — другие rnd.choice, а за ними и все случайные числа
+    if len(get_palette(old.palette_name).leaf_colors) != len(get_palette(new.palette_name).leaf_colors):
+        return None
+    if (old.thickness, old.thickness_decay) == (new.thickness, new.thickness_decay):
+        return geom
+
+    th = level_thickness(new, geom.max_depth)[geom.depth]
+    return TreeGeometry(
+        x0=geom.x0,
+        y0=geom.y0,
+        x1=geom.x1,
+        y1=geom.y1,
+        thickness=th.astype(np.float32),
+        color=geom.color,
+        depth=geom.depth,
+        bbox=_segments_bbox(geom.x0, geom.y0, geom.x1, geom.y1, th, geom.draw_mode),
+        draw_mode=geom.draw_mode,
+    )
+
+
+# ---------------- структура дерева ----------------
+
+def _uniform_height(cfg: TreeConfig) -> Optional[int]:
+    # Уровень, на котором листьями становятся сразу все узлы.
+    # None — если условие "length < 2" зависит от случайности (дерево неполное).
+    depth = max(0, cfg.depth)
+    jitter_len = cfg.randomness * 0.15
+
+    if jitter_len == 0.0:
+        length = float(cfg.trunk_length)
+        for level in range(depth):
+            if length < 2:
+                return level
+            length = max(1.0, length) * cfg.shrink
+        return depth
+
+    # интервал возможных длин на уровне, с небольшим запасом на округление
+    lo = hi = float(cfg.trunk_length)
+    for level in range(depth):
+        if hi < 2:
+            return level
+        if lo < 2:
+            return None
+        lo = max(1.0, lo * (1.0 - jitter_len)) * cfg.shrink * (1.0 - 1e-12)
+        hi = max(1.0, hi * (1.0 + jitter_len)) * cfg.shrink * (1.0 + 1e-12)
+    return depth
+
+
+# ---------------- поток случайных чисел ----------------
+
+class _WordStream:
+    # Тот же поток 32-битных слов, что читает random.Random(seed) при uniform()/choice(),
+    # но выгруженный блоком в numpy — чтобы считать jitter целым уровнем сразу.
+
+    def __init__(self, rnd: random.Random, size: int) -> None:
+        self.rnd = rnd
+        self.words = np.empty(0, dtype=np.uint32)
+        self.ensure(size)
+
+    def ensure(self, size: int) -> None:
+        if size <= self.words.size:
+            return
+        n = max(size - self.words.size, self.words.size // 2, 1024)
+        raw = self.rnd.getrandbits(32 * n).to_bytes(4 * n, "little")
+        self.words = np.concatenate([self.words, np.frombuffer(raw, dtype="<u4")])
+
+    def advance(self, n: int) -> None:
+        # первые n слов прочитаны: окно сдвигается, смещения дальше — от нового начала
+        self.ensure(n)
+        self.words = self.words[n:]
+
+    def random(self, offsets: np.ndarray) -> np.ndarray:
+        # random_random() из _randommodule.c: (a * 2**26 + b) / 2**53
+        a = (self.words[offsets] >> 5).astype(np.float64)
+        b = (self.words[offsets + 1] >> 6).astype(np.float64)
+        return (a * 67108864.0 + b) * (1.0 / 9007199254740992.0)
+
+    def uniform(self, offsets: np.ndarray, lo: float, hi: float) -> np.ndarray:
+        return lo + (hi - lo) * self.random(offsets)
+
+    def choices(self, bases: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        # rnd.choice() для каждого листа по порядку: getrandbits(k) с отбрасыванием r >= n.
+        # Возвращает выбранные индексы и префиксные суммы слов, съеденных выборами.
+        shift = 32 - n.bit_length()
+        count = bases.size
+        # memoryview отдаёт python int без копирования всего массива в список
+        base_list = memoryview(np.ascontiguousarray(bases, dtype=np.int64))
+
+        while True:
+            tops = self.words >> shift
+            # для каждого слова — ближайшее принятое (r < n) слово не левее него
+            sentinel = tops.size
+            idx = np.where(tops < n, np.arange(tops.size, dtype=np.int64), sentinel)
+            next_ok = memoryview(np.ascontiguousarray(np.minimum.accumulate(idx[::-1])[::-1]))
+
+            positions = []
+            append = positions.append
+            extra = 0
+            try:
+                for base in base_list:
+                    pos = next_ok[base + extra]
+                    if pos == sentinel:
+                        raise IndexError
+                    append(pos)
+                    extra = pos + 1 - base
+            except IndexError:
+                self.ensure(self.words.size + 2 * count + 1024)
+                continue
+            break
+
+        pos_arr = np.asarray(positions, dtype=np.int64)
+        consumed = np.zeros(count + 1, dtype=np.int64)
+        consumed[1:] = pos_arr + 1 - bases
+        return tops[pos_arr].astype(np.int64), consumed
+
+
+# ---------------- генерация ----------------
+
+_Columns = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def _preorder_levels(height: int) -> List[np.ndarray]:
+    # номера узлов полного дерева в прямом обходе, по уровням
+    pres = [np.zeros(1, dtype=np.int64)]
+    for level in range(1, height + 1):
+        parent = pres[-1]
+        left_size = (1 << (height - level + 1)) - 1
+        child = np.empty(2 * parent.size, dtype=np.int64)
+        child[0::2] = parent + 1
+        child[1::2] = parent + 1 + left_size
+        pres.append(child)
+    return pres
+
+
+@lru_cache(maxsize=8)
+def _leaf_choices(seed: int, height: int, n_colors: int) -> np.ndarray:
+    # Цвета листьев полного дерева (rnd.choice в порядке обхода). Они зависят только от seed,
+    # высоты и размера палитры, поэтому кэшируются: смена угла, длины или толщины (слайдеры
+    # превью) их не пересчитывает. Первый расчёт для seed — линейная петля по листьям.
+    stream = _WordStream(random.Random(seed), 0)
+    leaf_choice, _ = _stream_leaf_choices(stream, _preorder_levels(height), n_colors)
+    leaf_choice.setflags(write=False)
+    return leaf_choice
+
+
+def _stream_leaf_choices(
+    stream: _WordStream,
+    pres: List[np.ndarray],
+    n_colors: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    n_nodes = sum(p.size for p in pres)
+    n_leaves = pres[-1].size
+    stream.ensure(_WORDS_PER_NODE * n_nodes + 2 * n_leaves + 64)
+    return stream.choices(_WORDS_PER_NODE * pres[-1] + _WORDS_PER_NODE, n_colors)
+
+
+# Корень (под)дерева: уровень, x, y, курс, длина до jitter, толщина
+_Root = Tuple[int, float, float, float, float, float]
+
+
+def _tree_root(cfg: TreeConfig) -> _Root:
+    return 0, 0.0, 0.0, 90.0, float(cfg.trunk_length), float(cfg.thickness)
+
+
+def _level_nodes(cfg: TreeConfig, height: int, n_colors: int, should_stop: StopCheck = _never) -> _Columns:
+    stream = _WordStream(random.Random(cfg.seed), 0)
+    cols, _, _ = _complete_nodes(cfg, stream, height, _tree_root(cfg), n_colors, should_stop)
+    return cols
+
+
+def _complete_nodes(
+    cfg: TreeConfig,
+    stream: _WordStream,
+    height: int,
+    root: _Root,
+    n_colors: int,
+    should_stop: StopCheck = _never,
+) -> Tuple[_Columns, np.ndarray, int]:
+    # Полное бинарное (под)дерево высоты height, его слова в потоке начинаются с 0:
+    # считаем уровень целиком. Порядок RNG тот же, что у рекурсивного обхода
+    # FractalTreeRenderer._branch: смещение узла в потоке = 6 * (номер в прямом обходе)
+    # + слова, съеденные choice() листьев левее него.
+    # Возвращает колонки по уровням, номер каждого сегмента в прямом обходе и число съеденных слов.
+    jitter_angle = cfg.randomness * 10.0
+    jitter_len = cfg.randomness * 0.15
+    level0, x0, y0, heading0, length0, thickness = root
+
+    pres = _preorder_levels(height)
+    leaf_choice, consumed = _stream_leaf_choices(stream, pres, n_colors)
+    _check(should_stop)
+
+    out: List[List[np.ndarray]] = [[] for _ in range(7)]
+
+    x = np.full(1, x0)
+    y = np.full(1, y0)
+    heading = np.full(1, heading0)
+    length = np.full(1, length0)
+
+    for level in range(height + 1):
+        _check(should_stop)
+        pre = pres[level]
+        n = pre.size
+        leaves_before = np.arange(n, dtype=np.int64) << (height - level)
+        off = _WORDS_PER_NODE * pre + consumed[leaves_before]
+
+        actual_len = np.maximum(1.0, length * (1.0 + stream.uniform(off, -jitter_len, jitter_len)))
+
+        rad = np.radians(heading)
+        nx = x + np.cos(rad) * actual_len
+        ny = y + np.sin(rad) * actual_len
+
+        if level == height:
+            th = max(1.0, thickness * 0.7) if cfg.draw_mode == "square" else thickness
+            color = leaf_choice + 1
+        else:
+            th = thickness
+            color = np.full(n, TRUNK_COLOR_INDEX)
+
+        for col, arr in zip(out, (x, y, nx, ny, np.full(n, th), color, np.full(n, level0 + level))):
+            col.append(arr)
+
+        if level == height:
+            break
+
+        left = cfg.angle_deg + stream.uniform(off + 2, -jitter_angle, jitter_angle)
+        right = cfg.angle_deg + stream.uniform(off + 4, -jitter_angle, jitter_angle)
+
+        child_heading = np.empty(2 * n)
+        child_heading[0::2] = heading + left
+        child_heading[1::2] = heading - right
+
+        x = np.repeat(nx, 2)
+        y = np.repeat(ny, 2)
+        heading = child_heading
+        length = np.repeat(actual_len * cfg.shrink, 2)
+        thickness = _clamp(thickness * cfg.thickness_decay, 0.5, 50)
+
+    cols = tuple(np.concatenate(col) for col in out)
+    used = _WORDS_PER_NODE * sum(p.size for p in pres) + int(consumed[-1])
+    return cols, np.concatenate(pres), used  # type: ignore[return-value]
+
+
+# ---------------- детерминированные деревья: переиспользование поддеревьев ----------------
+
+# Форма поддерева в локальных координатах: корень в (0, 0), курс 0°, сегменты в прямом обходе.
+# (x0, y0, x1, y1, heading, thickness, depth)
+_Shape = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+@lru_cache(maxsize=32)
+def _subtree_shape(
+    height: int,
+    length: float,
+    thickness: float,
+    angle_deg: float,
+    shrink: float,
+    thickness_decay: float,
+    draw_mode: str,
+    leaves: bool = True,
+) -> _Shape:
+    # При randomness == 0 все поддеревья одного уровня совпадают с точностью до поворота
+    # и сдвига: поддерево = ветка + два повёрнутых поддерева следующего уровня из кэша.
+    # leaves=False — нижний уровень не листья (верх дерева над экземплярами).
+    actual_len = max(1.0, length)
+    if height == 0:
+        th = max(1.0, thickness * 0.7) if leaves and draw_mode == "square" else thickness
+        one = np.ones(1)
+        return (0 * one, 0 * one, actual_len * one, 0 * one, 0 * one, th * one, np.zeros(1, dtype=np.int64))
+
+    child = _subtree_shape(
+        height - 1,
+        actual_len * shrink,
+        _clamp(thickness * thickness_decay, 0.5, 50),
+        angle_deg,
+        shrink,
+        thickness_decay,
+        draw_mode,
+        leaves,
+    )
+    parts = [_root_shape(actual_len, thickness)]
+    for turn in (angle_deg, -angle_deg):
+        parts.append(_transform_shape(child, actual_len, 0.0, turn, depth_shift=1))
+    return tuple(np.concatenate(cols) for cols in zip(*parts))  # type: ignore[return-value]
+
+
+def _root_shape(length: float, thickness: float) -> _Shape:
+    one = np.ones(1)
+    return (0 * one, 0 * one, length * one, 0 * one, 0 * one, thickness * one, np.zeros(1, dtype=np.int64))
+
+
+def _transform_shape(shape: _Shape, tx: float, ty: float, turn: float, depth_shift: int = 0) -> _Shape:
+    x0, y0, x1, y1, heading, th, depth = shape
+    rad = math.radians(turn)
+    c, s = math.cos(rad), math.sin(rad)
+    return (
+        tx + x0 * c - y0 * s,
+        ty + x0 * s + y0 * c,
+        tx + x1 * c - y1 * s,
+        ty + x1 * s + y1 * c,
+        heading + turn,
+        th,
+        depth + depth_shift,
+    )
+
+
+def _level_params(cfg: TreeConfig, level: int) -> Tuple[float, float]:
+    # длина и толщина ветки на уровне level при randomness == 0
+    length = float(cfg.trunk_length)
+    thickness = float(cfg.thickness)
+    for _ in range(level):
+        length = max(1.0, length) * cfg.shrink
+        thickness = _clamp(thickness * cfg.thickness_decay, 0.5, 50)
+    return length, thickness
+
+
+def _shape_for(cfg: TreeConfig, level: int, height: int, leaves: bool = True) -> _Shape:
+    length, thickness = _level_params(cfg, level)
+    return _subtree_shape(
+        height, length, thickness, cfg.angle_deg, cfg.shrink, cfg.thickness_decay, cfg.draw_mode, leaves
+    )
+
+
+def _instanced_nodes(cfg: TreeConfig, height: int, n_colors: int, should_stop: StopCheck = _never) -> _Columns:
+    # Форма — из кэша поддеревьев (не зависит от seed и палитры), цвета листьев — из RNG.
+    x0, y0, x1, y1, _, th, depth = _transform_shape(_shape_for(cfg, 0, height), 0.0, 0.0, 90.0)
+    _check(should_stop)
+    leaf_choice = _leaf_choices(cfg.seed, height, n_colors)
+
+    order = np.argsort(depth, kind="stable")
+    depth = depth[order]
+    color = np.zeros(order.size, dtype=np.int64)
+    color[depth == height] = leaf_choice + 1
+    return x0[order], y0[order], x1[order], y1[order], th[order], color, depth
+
+
+@dataclass
+class TreeInstances:
+    # Детерминированное дерево как "верх" + экземпляры одного канонического поддерева.
+    top: Optional[TreeGeometry]   # уровни выше корней экземпляров (None, если их нет)
+    base: TreeGeometry            # поддерево: корень в (0, 0), курс 0°, листья с color = 0
+    x: np.ndarray                 # корни экземпляров (мировые координаты), слева направо
+    y: np.ndarray
+    heading: np.ndarray           # курс корня, градусы
+    leaf_colors: np.ndarray       # (экземпляр, лист base) -> индекс цвета
+    bbox: BBox
+
+    def __len__(self) -> int:
+        return (len(self.top) if self.top is not None else 0) + self.x.size * len(self.base)
+
+    def expand(self) -> TreeGeometry:
+        rad = np.radians(self.heading)[:, None]
+        c, s = np.cos(rad), np.sin(rad)
+        tx, ty = self.x[:, None], self.y[:, None]
+        b = self.base
+
+        def place(px: np.ndarray, py: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            px = px.astype(np.float64)[None, :]
+            py = py.astype(np.float64)[None, :]
+            return (tx + px * c - py * s).ravel(), (ty + px * s + py * c).ravel()
+
+        x0, y0 = place(b.x0, b.y0)
+        x1, y1 = place(b.x1, b.y1)
+        n = self.x.size
+        color = np.tile(b.color, (n, 1))
+        color[:, b.color.size - self.leaf_colors.shape[1]:] = self.leaf_colors
+        depth = np.tile(b.depth.astype(np.int64), n) + (self.top.max_depth + 1 if self.top is not None else 0)
+
+        cols = [x0, y0, x1, y1, np.tile(b.thickness, n), color.ravel(), depth]
+        # экземпляр за экземпляром -> по уровням, как в generate_geometry
+        order = np.argsort(depth, kind="stable")
+        cols = [col[order] for col in cols]
+        if self.top is not None:
+            t = self.top
+            top_cols = [t.x0, t.y0, t.x1, t.y1, t.thickness, t.color, t.depth]
+            cols = [np.concatenate([a, b]) for a, b in zip(top_cols, cols)]
+        return _build_geometry(tuple(cols), b.draw_mode)  # type: ignore[arg-type]
+
+
+def instance_tree(cfg: TreeConfig, subtree_height: int = 3) -> Optional[TreeInstances]:
+    # Только для randomness == 0; иначе поддеревья различаются и экземпляров нет.
+    if cfg.randomness != 0:
+        return None
+    height = _uniform_height(cfg)
+    if height is None:
+        return None
+
+    k = min(subtree_height, height)
+    split = height - k
+
+    # канонический экземпляр: поддерево высоты k, отсортированное по уровням (листья в конце)
+    bx0, by0, bx1, by1, _, bth, bdepth = _shape_for(cfg, split, k)
+    border = np.argsort(bdepth, kind="stable")
+    base = _build_geometry(
+        (bx0[border], by0[border], bx1[border], by1[border], bth[border],
+         np.zeros(border.size, dtype=np.int64), bdepth[border]),
+        cfg.draw_mode,
+    )
+
+    if split == 0:
+        top = None
+        x = np.zeros(1)
+        y = np.zeros(1)
+        heading = np.full(1, 90.0)
+    else:
+        tx0, ty0, tx1, ty1, th_, tth, tdepth = _transform_shape(
+            _shape_for(cfg, 0, split - 1, leaves=False), 0.0, 0.0, 90.0
+        )
+        torder = np.argsort(tdepth, kind="stable")
+        tdepth = tdepth[torder]
+        top = _build_geometry(
+            (tx0[torder], ty0[torder], tx1[torder], ty1[torder], tth[torder],
+             np.zeros(torder.size, dtype=np.int64), tdepth),
+            cfg.draw_mode,
+        )
+        # корни экземпляров — концы нижних веток верха, повёрнутые на ±angle
+        bottom = torder[tdepth == split - 1]
+        x = np.repeat(tx1[bottom], 2)
+        y = np.repeat(ty1[bottom], 2)
+        heading = np.empty(2 * bottom.size)
+        heading[0::2] = th_[bottom] + cfg.angle_deg
+        heading[1::2] = th_[bottom] - cfg.angle_deg
+
+    n_colors = len(get_palette(cfg.palette_name).leaf_colors)
+    if cfg.rng == RNG_HASHED:
+        # листья полного дерева слева направо — узлы 2**height .. 2**(height+1) - 1
+        leaf_choice = hashed_choice_array(cfg.seed, np.arange(1 << height, 2 << height, dtype=np.int64), n_colors)
+    else:
+        leaf_choice = _leaf_choices(cfg.seed, height, n_colors)
+    leaf_colors = (leaf_choice + 1).reshape(x.size, -1).astype(np.uint8)
+
+    # bbox — тот же, что у generate_geometry(cfg).bbox (толщина и квадраты по уровням), чтобы
+    # вид экземплярного SVG совпадал с обычным SVG, PNG и canvas
+    from fractal.bounds import exact_bbox
+
+    bbox = exact_bbox(cfg)
+    assert bbox is not None
+
+    return TreeInstances(top, base, x, y, heading, leaf_colors, bbox)
+
+
+def _walk_nodes(cfg: TreeConfig, n_colors: int, should_stop: StopCheck = _never) -> _Columns:
+    # Неполное дерево (лист по "length < 2" зависит от jitter): обход с явным стеком
+    # в порядке FractalTreeRenderer._branch, затем сортировка по уровням.
+    cols = _concat_columns(list(_walk_stream(cfg, n_colors, 1 << 16, should_stop)))
+    order = np.argsort(cols[6], kind="stable")
+    return tuple(c[order] for c in cols)  # type: ignore[return-value]
+
+
+def _walk_stream(cfg: TreeConfig, n_colors: int, chunk: int, should_stop: StopCheck = _never) -> Iterator[_Columns]:
+    # Прямой обход узел за узлом, порциями по chunk сегментов; стек — O(depth).
+    rnd = random.Random(cfg.seed)
+    jitter_angle = cfg.randomness * 10.0
+    jitter_len = cfg.randomness * 0.15
+    leaf_ids = range(1, n_colors + 1)
+
+    xs0: List[float] = []
+    ys0: List[float] = []
+    xs1: List[float] = []
+    ys1: List[float] = []
+    ths: List[float] = []
+    colors: List[int] = []
+    levels: List[int] = []
+
+    stack = [(0, float(cfg.trunk_length), float(cfg.thickness), 0.0, 0.0, 90.0)]
+    while stack:
+        if len(xs0) >= chunk:
+            yield _columns(xs0, ys0, xs1, ys1, ths, colors, levels)
+            xs0, ys0, xs1, ys1, ths, colors, levels = [], [], [], [], [], [], []
+        if len(xs0) & 0x3FFF == 0:
+            _check(should_stop)
+        level, length, thickness, x, y, heading = stack.pop()
+
+        actual_len = max(1.0, length * (1.0 + rnd.uniform(-jitter_len, jitter_len)))
+        left = cfg.angle_deg + rnd.uniform(-jitter_angle, jitter_angle)
+        right = cfg.angle_deg + rnd.uniform(-jitter_angle, jitter_angle)
+
+        rad = math.radians(heading)
+        nx = x + math.cos(rad) * actual_len
+        ny = y + math.sin(rad) * actual_len
+
+        xs0.append(x)
+        ys0.append(y)
+        xs1.append(nx)
+        ys1.append(ny)
+        levels.append(level)
+
+        if level >= cfg.depth or length < 2:
+            colors.append(rnd.choice(leaf_ids))
+            ths.append(max(1.0, thickness * 0.7) if cfg.draw_mode == "square" else thickness)
+            continue
+
+        colors.append(TRUNK_COLOR_INDEX)
+        ths.append(thickness)
+
+        next_len = actual_len * cfg.shrink
+        next_th = _clamp(thickness * cfg.thickness_decay, 0.5, 50)
+        # правую кладём первой, чтобы левая обошлась раньше
+        stack.append((level + 1, next_len, next_th, nx, ny, heading - right))
+        stack.append((level + 1, next_len, next_th, nx, ny, heading + left))
+
+    if xs0:
+        yield _columns(xs0, ys0, xs1, ys1, ths, colors, levels)
+
+
+def _columns(*cols: list) -> _Columns:
+    return tuple(np.asarray(c, dtype=np.float64 if i < 5 else np.int64) for i, c in enumerate(cols))  # type: ignore[return-value]
+
+
+def _concat_columns(parts: List[_Columns]) -> _Columns:
+    return tuple(np.concatenate([p[i] for p in parts]) for i in range(7))  # type: ignore[return-value]
+
+
+# ---------------- потоковая генерация ----------------
+
+# Размер порции iter_segments() по умолчанию (сегментов)
+STREAM_CHUNK = 1 << 16
+
+
+def iter_segments(
+    cfg: TreeConfig,
+    chunk: int = STREAM_CHUNK,
+    should_stop: StopCheck = _never,
+) -> Iterator[TreeGeometry]:
+    # Сегменты в том же порядке, что рисует FractalTreeRenderer._branch (прямой обход, тот же
+    # поток RNG), порциями от chunk до 2 * chunk сегментов. Без рекурсии, в памяти — одна
+    # порция и стек глубины дерева, так что глубина 20–24 упирается только во время.
+    # bbox каждой порции — только её сегменты (общий — stream_bbox()).
+    n_colors = len(get_palette(cfg.palette_name).leaf_colors)
+    chunk = max(1, int(chunk))
+
+    height = _uniform_height(cfg)
+    if cfg.rng == RNG_HASHED:
+        parts = _hashed_stream(cfg, n_colors, chunk, should_stop)
+    elif height is None:
+        parts = _walk_stream(cfg, n_colors, chunk, should_stop)
+    else:
+        parts = _split_stream(cfg, height, n_colors, chunk, should_stop)
+
+    pending: List[_Columns] = []
+    size = 0
+    for cols in parts:
+        pending.append(cols)
+        size += cols[0].size
+        if size >= chunk:
+            yield _build_geometry(_concat_columns(pending), cfg.draw_mode)
+            pending = []
+            size = 0
+    if pending:
+        yield _build_geometry(_concat_columns(pending), cfg.draw_mode)
+
+
+def stream_bbox(cfg: TreeConfig, chunk: int = STREAM_CHUNK) -> BBox:
+    # bbox дерева без сборки всей геометрии: при randomness == 0 — по формуле (O(глубины)),
+    # иначе отдельный проход iter_segments()
+    from fractal.bounds import exact_bbox
+
+    box = exact_bbox(cfg)
+    if box is not None:
+        return box
+    for part in iter_segments(cfg, chunk):
+        b = part.bbox
+        if box is None:
+            box = BBox(b.minx, b.miny, b.maxx, b.maxy)
+        else:
+            box.expand(b.minx, b.miny)
+            box.expand(b.maxx, b.maxy)
+    return box if box is not None else BBox(0.0, 0.0, 0.0, 0.0)
+
+
+def max_segments(cfg: TreeConfig) -> int:
+    # Сегментов в дереве не больше этого (для полного дерева — ровно столько)
+    height = _uniform_height(cfg)
+    return (1 << ((max(0, cfg.depth) if height is None else height) + 1)) - 1
+
+
+def _split_stream(
+    cfg: TreeConfig,
+    height: int,
+    n_colors: int,
+    chunk: int,
+    should_stop: StopCheck = _never,
+) -> Iterator[_Columns]:
+    # Полное дерево: верхние уровни — обход с явным стеком по узлу, с уровня split — целые
+    # поддеревья не больше chunk узлов через _complete_nodes. Слова RNG читаются одним
+    # скользящим окном: поддерево съедает ровно свои слова, и окно сдвигается дальше.
+    sub_height = min(height, max(0, (chunk + 1).bit_length() - 2))
+    split = height - sub_height
+
+    jitter_angle = cfg.randomness * 10.0
+    jitter_len = cfg.randomness * 0.15
+    stream = _WordStream(random.Random(cfg.seed), 0)
+    first = np.zeros(1, dtype=np.int64)
+
+    stack: List[_Root] = [_tree_root(cfg)]
+    while stack:
+        _check(should_stop)
+        root = stack.pop()
+        level, x, y, heading, length, thickness = root
+
+        if level == split:
+            cols, pre, used = _complete_nodes(cfg, stream, sub_height, root, n_colors, should_stop)
+            stream.advance(used)
+            order = np.argsort(pre)
+            yield tuple(c[order] for c in cols)  # type: ignore[misc]
+            continue
+
+        # узел выше split — всегда ветка (дерево полное): 6 слов на три uniform()
+        stream.ensure(_WORDS_PER_NODE)
+        actual_len = max(1.0, length * (1.0 + float(stream.uniform(first, -jitter_len, jitter_len)[0])))
+        left = cfg.angle_deg + float(stream.uniform(first + 2, -jitter_angle, jitter_angle)[0])
+        right = cfg.angle_deg + float(stream.uniform(first + 4, -jitter_angle, jitter_angle)[0])
+        stream.advance(_WORDS_PER_NODE)
+
+        rad = math.radians(heading)
+        nx = x + math.cos(rad) * actual_len
+        ny = y + math.sin(rad) * actual_len
+        yield _columns([x], [y], [nx], [ny], [thickness], [TRUNK_COLOR_INDEX], [level])
+
+        next_len = actual_len * cfg.shrink
+        next_th = _clamp(thickness * cfg.thickness_decay, 0.5, 50)
+        # правую кладём первой, чтобы левая обошлась раньше
+        stack.append((level + 1, nx, ny, heading - right, next_len, next_th))
+        stack.append((level + 1, nx, ny, heading + left, next_len, next_th))
+
+
+# ---------------- счётный RNG (cfg.rng == "hashed") ----------------
+
+# Фронт обхода: все узлы одного уровня слева направо.
+# (уровень, номер узла, x, y, курс, длина до jitter, толщина)
+_Frontier = Tuple[int, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, float]
+
+
+def _hashed_root(cfg: TreeConfig) -> _Frontier:
+    one = np.ones(1)
+    return (
+        0, np.ones(1, dtype=np.int64), 0.0 * one, 0.0 * one, 90.0 * one,
+        float(cfg.trunk_length) * one, float(cfg.thickness),
+    )
+
+
+def _hashed_nodes(
+    cfg: TreeConfig,
+    n_colors: int,
+    frontier: _Frontier,
+    stop_level: Optional[int] = None,
+    should_stop: StopCheck = _never,
+) -> Tuple[_Columns, np.ndarray, Optional[_Frontier]]:
+    # Числа узла зависят только от (seed, номер узла), поэтому дерево считается уровнями
+    # и когда оно неполное, а любой набор поддеревьев — независимо от остальных.
+    # Возвращает колонки по уровням и номера узлов; с stop_level уровень stop_level
+    # не считается, а возвращается фронтом для продолжения.
+    jitter_angle = cfg.randomness * 10.0
+    jitter_len = cfg.randomness * 0.15
+    level, node, x, y, heading, length, thickness = frontier
+
+    out: List[List[np.ndarray]] = [[] for _ in range(7)]
+    ids: List[np.ndarray] = []
+    rest: Optional[_Frontier] = None
+
+    while node.size:
+        _check(should_stop)
+        if level == stop_level:
+            rest = (level, node, x, y, heading, length, thickness)
+            break
+
+        n = node.size
+        actual_len = np.maximum(
+            1.0, length * (1.0 + hashed_uniform_array(cfg.seed, node, DRAW_LENGTH, -jitter_len, jitter_len))
+        )
+        rad = np.radians(heading)
+        nx = x + np.cos(rad) * actual_len
+        ny = y + np.sin(rad) * actual_len
+
+        leaf = (length < 2) if level < cfg.depth else np.ones(n, dtype=bool)
+        leaf_th = max(1.0, thickness * 0.7) if cfg.draw_mode == "square" else thickness
+        color = np.full(n, TRUNK_COLOR_INDEX, dtype=np.int64)
+        color[leaf] = hashed_choice_array(cfg.seed, node[leaf], n_colors) + 1
+
+        for col, arr in zip(out, (x, y, nx, ny, np.where(leaf, leaf_th, thickness), color, np.full(n, level))):
+            col.append(arr)
+        ids.append(node)
+
+        inner = ~leaf
+        parent = node[inner]
+        left = cfg.angle_deg + hashed_uniform_array(cfg.seed, parent, DRAW_LEFT, -jitter_angle, jitter_angle)
+        right = cfg.angle_deg + hashed_uniform_array(cfg.seed, parent, DRAW_RIGHT, -jitter_angle, jitter_angle)
+
+        m = parent.size
+        node = np.empty(2 * m, dtype=np.int64)
+        node[0::2] = 2 * parent
+        node[1::2] = 2 * parent + 1
+        child_heading = np.empty(2 * m)
+        child_heading[0::2] = heading[inner] + left
+        child_heading[1::2] = heading[inner] - right
+
+        x = np.repeat(nx[inner], 2)
+        y = np.repeat(ny[inner], 2)
+        heading = child_heading
+        length = np.repeat(actual_len[inner] * cfg.shrink, 2)
+        thickness = _clamp(thickness * cfg.thickness_decay, 0.5, 50)
+        level += 1
+
+    if not ids:
+        return _columns([], [], [], [], [], [], []), np.zeros(0, dtype=np.int64), rest
+    return tuple(np.concatenate(col) for col in out), np.concatenate(ids), rest  # type: ignore[return-value]
+
+
+def _hashed_preorder(nodes: np.ndarray, levels: np.ndarray, depth: int) -> np.ndarray:
+    # Порядок прямого обхода по номерам узлов: путь, выровненный по самому глубокому
+    # уровню, а при равенстве предок (меньший уровень) раньше потомка.
+    aligned = nodes << (depth - levels)
+    return np.lexsort((levels, aligned))
+
+
+def _hashed_stream(cfg: TreeConfig, n_colors: int, chunk: int, should_stop: StopCheck = _never) -> Iterator[_Columns]:
+    # Верх дерева до уровня split — одним куском, ниже — поддеревья не больше chunk узлов;
+    # всё в прямом обходе, как рисует turtle.
+    depth = max(0, cfg.depth)
+    split = max(0, depth - max(0, (chunk + 1).bit_length() - 2))
+    top, top_nodes, rest = _hashed_nodes(cfg, n_colors, _hashed_root(cfg), stop_level=split, should_stop=should_stop)
+
+    n_top = top_nodes.size
+    roots = rest[1] if rest is not None else np.zeros(0, dtype=np.int64)
+    nodes = np.concatenate((top_nodes, roots))
+    levels = np.concatenate((top[6], np.full(roots.size, split, dtype=np.int64)))
+    order = _hashed_preorder(nodes, levels, depth)
+
+    # подряд идущие узлы верха — одной порцией, на каждом корне — его поддерево
+    run: List[int] = []
+    for i in order.tolist():
+        if i < n_top:
+            run.append(i)
+            continue
+        if run:
+            yield tuple(c[run] for c in top)  # type: ignore[misc]
+            run = []
+        k = i - n_top
+        assert rest is not None
+        sub_frontier = (split,) + tuple(a[k:k + 1] for a in rest[1:6]) + (rest[6],)
+        sub, sub_nodes, _ = _hashed_nodes(cfg, n_colors, sub_frontier, should_stop=should_stop)  # type: ignore[arg-type]
+        sub_order = _hashed_preorder(sub_nodes, sub[6], depth)
+        yield tuple(c[sub_order] for c in sub)  # type: ignore[misc]
+    if run:
+        yield tuple(c[run] for c in top)  # type: ignore[misc]
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from fractal.geometry import TRUNK_COLOR_INDEX, TreeGeometry
+
+
+# Ветка короче стольких пикселей не делится дальше
+LOD_MIN_PX = 1.0
+
+
+@dataclass
+class LodResult:
+    geometry: TreeGeometry
+    culled: int    # сколько исходных сегментов выброшено
+    replaced: int  # сколько поддеревьев заменено одним сегментом-"листом"
+
+
+def cull_geometry(geom: TreeGeometry, scale: float, min_px: float = LOD_MIN_PX) -> LodResult:
+    # Level of detail по итоговому масштабу (пикселей на мировую единицу).
+    # Если всё, что растёт из конца ветки, на экране помещается в квадрат min_px и перья там
+    # не толще min_px (у turtle минимум 1 px), это поддерево всё равно сливается в пятно:
+    # вместо него рисуется один сегмент от конца ветки к центру кончиков листьев, цветом,
+    # который среди этих листьев встречается чаще всего.
+    #
+    # Структура дерева восстанавливается из порядка сегментов: уровни подряд, внутри уровня
+    # слева направо, у каждой ветки цвета ствола — ровно двое детей на следующем уровне.
+    n = len(geom)
+    if n == 0 or min_px <= 0:
+        return LodResult(geom, 0, 0)
+
+    internal = geom.color == TRUNK_COLOR_INDEX
+    # Прогноз без разбора структуры: рамка любого поддерева не меньше самого короткого листа в нём.
+    # Если даже самый короткий лист на экране не меньше min_px, сворачивать нечего — при
+    # подогнанном виде и пороге 1 px так почти всегда, и проход ниже был бы чистой потерей.
+    if not internal.all():
+        leaf_span = np.maximum(np.abs(geom.x1 - geom.x0), np.abs(geom.y1 - geom.y0))[~internal]
+        if float(leaf_span.min()) * scale >= min_px:
+            return LodResult(geom, 0, 0)
+
+    levels = np.searchsorted(geom.depth, np.arange(geom.max_depth + 2))
+
+    parents_at: List[np.ndarray] = []
+    first_child = np.full(n, -1, dtype=np.int64)
+    for level in range(geom.max_depth):
+        a, b, c, d = levels[level], levels[level + 1], levels[level + 1], levels[level + 2]
+        parents = np.flatnonzero(internal[a:b]) + a
+        if parents.size * 2 != d - c:
+            raise ValueError("geometry is not in level order")
+        first_child[parents] = np.arange(c, d, 2)
+        parents_at.append(parents)
+
+    # снизу вверх: рамка каждого поддерева и рамка того, что растёт из конца ветки
+    lo_x = np.minimum(geom.x0, geom.x1).astype(np.float64)
+    lo_y = np.minimum(geom.y0, geom.y1).astype(np.float64)
+    hi_x = np.maximum(geom.x0, geom.x1).astype(np.float64)
+    hi_y = np.maximum(geom.y0, geom.y1).astype(np.float64)
+    span = np.full(n, np.inf)
+    for level in range(geom.max_depth - 1, -1, -1):
+        parents = parents_at[level]
+        c, d = levels[level + 1], levels[level + 2]
+        cx0 = lo_x[c:d].reshape(-1, 2).min(axis=1)
+        cy0 = lo_y[c:d].reshape(-1, 2).min(axis=1)
+        cx1 = hi_x[c:d].reshape(-1, 2).max(axis=1)
+        cy1 = hi_y[c:d].reshape(-1, 2).max(axis=1)
+        span[parents] = np.maximum(cx1 - cx0, cy1 - cy0)
+        lo_x[parents] = np.minimum(lo_x[parents], cx0)
+        lo_y[parents] = np.minimum(lo_y[parents], cy0)
+        hi_x[parents] = np.maximum(hi_x[parents], cx1)
+        hi_y[parents] = np.maximum(hi_y[parents], cy1)
+
+    small = span * scale < min_px
+    if geom.draw_mode != "square":
+        # у квадратов размер задан в пикселях и от масштаба не зависит — только рамка
+        child_th = geom.thickness[np.maximum(first_child, 0)].astype(np.float64)
+        small &= np.maximum(1.0, child_th) <= max(1.0, min_px)
+
+    # root[i] — ветка, чьё поддерево заменяется и в которое попал сегмент i (-1 — рисуется)
+    root = np.full(n, -1, dtype=np.int64)
+    for level in range(geom.max_depth):
+        c, d = levels[level + 1], levels[level + 2]
+        parent_of = np.repeat(parents_at[level], 2)
+        inherited = root[parent_of]
+        cut = small[parent_of] & (inherited < 0)
+        root[c:d] = np.where(inherited >= 0, inherited, np.where(cut, parent_of, -1))
+
+    dropped = root >= 0
+    culled = int(dropped.sum())
+    if culled == 0:
+        return LodResult(geom, 0, 0)
+
+    # собираем листья каждого заменённого поддерева
+    roots, slot_of = np.unique(root[dropped], return_inverse=True)
+    leaf = ~internal[dropped]
+    ids = slot_of[leaf]
+    count = np.bincount(ids, minlength=roots.size).astype(np.float64)
+    tip_x = np.bincount(ids, weights=geom.x1[dropped][leaf], minlength=roots.size) / count
+    tip_y = np.bincount(ids, weights=geom.y1[dropped][leaf], minlength=roots.size) / count
+
+    n_colors = int(geom.color.max()) + 1
+    votes = np.bincount(ids * n_colors + geom.color[dropped][leaf], minlength=roots.size * n_colors)
+    leaf_color = votes.reshape(roots.size, n_colors).argmax(axis=1)
+
+    # сегмент-замена встаёт на место первого ребёнка: порядок уровней сохраняется
+    kept = np.flatnonzero(~dropped)
+    slots = np.concatenate((kept, first_child[roots]))
+    order = np.argsort(slots, kind="stable")
+
+    def merge(kept_values: np.ndarray, new_values: np.ndarray) -> np.ndarray:
+        return np.concatenate((kept_values, new_values.astype(kept_values.dtype)))[order]
+
+    culled_geom = TreeGeometry(
+        x0=merge(geom.x0[kept], geom.x1[roots]),
+        y0=merge(geom.y0[kept], geom.y1[roots]),
+        x1=merge(geom.x1[kept], tip_x),
+        y1=merge(geom.y1[kept], tip_y),
+        thickness=merge(geom.thickness[kept], geom.thickness[first_child[roots]]),
+        color=merge(geom.color[kept], leaf_color),
+        depth=merge(geom.depth[kept], geom.depth[roots] + 1),
+        bbox=geom.bbox,
+        draw_mode=geom.draw_mode,
+    )
+    return LodResult(culled_geom, culled, int(roots.size))
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from fractal.config import TreeConfig
+from fractal.geometry import (
+    TreeGeometry,
+    _build_geometry,
+    _Columns,
+    _concat_columns,
+    _Frontier,
+    _hashed_nodes,
+    _hashed_root,
+)
+from fractal.palette import get_palette
+from fractal.rng import RNG_HASHED
+
+
+# Кусков фронта на процесс: поддеревья разного размера, так нагрузка ровнее
+_BATCHES_PER_WORKER = 4
+
+
+def _subtrees(cfg: TreeConfig, n_colors: int, frontier: _Frontier) -> _Columns:
+    cols, _, _ = _hashed_nodes(cfg, n_colors, frontier)
+    return cols
+
+
+def generate_geometry_parallel(
+    cfg: TreeConfig,
+    workers: Optional[int] = None,
+    split_depth: Optional[int] = None,
+) -> TreeGeometry:
+    # Дерево режется на уровне split_depth: верх считается здесь, поддеревья фронта —
+    # пачками в процессах. С cfg.rng == "hashed" числа ветки зависят только от её пути,
+    # поэтому результат совпадает с generate_geometry(cfg) бит в бит.
+    if cfg.rng != RNG_HASHED:
+        raise ValueError('parallel generation needs cfg.rng == "hashed"')
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    n_batches = workers * _BATCHES_PER_WORKER
+    if split_depth is None:
+        # на уровне split узлов не меньше, чем пачек
+        split_depth = max(1, (n_batches - 1).bit_length())
+    split_depth = min(max(0, cfg.depth), split_depth)
+
+    n_colors = len(get_palette(cfg.palette_name).leaf_colors)
+    top, _, rest = _hashed_nodes(cfg, n_colors, _hashed_root(cfg), stop_level=split_depth)
+
+    parts = [top]
+    if rest is not None:
+        level, node = rest[0], rest[1]
+        # непрерывные куски фронта: внутри уровня порядок слева направо сохраняется
+        bounds = np.linspace(0, node.size, min(n_batches, node.size) + 1).astype(np.int64)
+        batches = [
+            (level,) + tuple(a[lo:hi] for a in rest[1:6]) + (rest[6],)
+            for lo, hi in zip(bounds[:-1], bounds[1:])
+        ]
+        if workers == 1:
+            parts += [_subtrees(cfg, n_colors, b) for b in batches]  # type: ignore[arg-type]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+                parts += list(pool.map(_subtrees, [cfg] * len(batches), [n_colors] * len(batches), batches))
+
+    # верх, потом пачки по порядку: устойчивая сортировка по уровню даёт тот же порядок,
+    # что у однопроцессного обхода (уровни подряд, внутри — слева направо)
+    cols = _concat_columns(parts)
+    order = np.argsort(cols[6], kind="stable")
+    return _build_geometry(tuple(c[order] for c in cols), cfg.draw_mode)  # type: ignore[arg-type]
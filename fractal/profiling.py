@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator
+
+
+@dataclass
+class DrawProfile:
+    # Время по фазам (мс, в порядке выполнения) и счётчики одной отрисовки
+    phases: Dict[str, float] = field(default_factory=dict)
+    counts: Dict[str, int] = field(default_factory=dict)
+    info: Dict[str, Any] = field(default_factory=dict)  # backend, depth, ... — для лога
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.phases.values())
+
+    def to_json(self) -> str:
+        data = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **self.info,
+            "total_ms": round(self.total_ms, 3),
+            "phases_ms": {k: round(v, 3) for k, v in self.phases.items()},
+            "counts": self.counts,
+        }
+        return json.dumps(data, separators=(",", ":"))
+
+    def summary(self) -> str:
+        lines = [f"{name:<10} {ms:8.1f} ms" for name, ms in self.phases.items()]
+        lines.append(f"{'total':<10} {self.total_ms:8.1f} ms")
+        lines += [f"{name:<10} {n:8d}" for name, n in self.counts.items()]
+        return "\n".join(lines)
+
+
+class Profiler:
+    # Собирает DrawProfile: with profiler.phase("geometry"): ...; profiler.count("segments", n).
+    # Повтор фазы с тем же именем суммируется.
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.profile = DrawProfile()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.profile.phases[name] = self.profile.phases.get(name, 0.0) + seconds * 1000.0
+
+    def count(self, name: str, n: int) -> None:
+        self.profile.counts[name] = self.profile.counts.get(name, 0) + int(n)
+
+
+class _NullPhase:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullProfiler(Profiler):
+    # Профилирование выключено: ни таймеров, ни словарей — только пустые вызовы
+
+    enabled = False
+
+    def __init__(self) -> None:
+        self.profile = DrawProfile()
+
+    def phase(self, name: str) -> _NullPhase:  # type: ignore[override]
+        return _NULL_PHASE
+
+    def add_time(self, name: str, seconds: float) -> None:
+        pass
+
+    def count(self, name: str, n: int) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+ProfileCallback = Callable[[DrawProfile], None]
+
+
+def make_profiler(enabled: bool) -> Profiler:
+    return Profiler() if enabled else NULL_PROFILER
+
+
+def log_profile(path: str) -> ProfileCallback:
+    # колбэк, который дописывает JSON-строку на каждую отрисовку
+    def write(profile: DrawProfile) -> None:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(profile.to_json() + "\n")
+
+    return write
+
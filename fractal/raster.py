@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+import numpy as np
+
+from fractal.config import TreeConfig
+from fractal.geometry import (
+    STAMP_FILL,
+    TreeGeometry,
+    color_table,
+    generate_geometry,
+    stamp_centers,
+    stamp_half_size,
+)
+from fractal.lod import cull_geometry
+from fractal.palette import Palette, get_palette
+from fractal.view import Viewport, fit_viewport
+
+
+# Сколько пикселей (сегмент x окно) считаем за один numpy-проход
+_CHUNK_PIXELS = 1 << 21
+
+# Цвета, которые встречаются не в "#rrggbb" виде (turtle fillcolor по умолчанию)
+_NAMED_COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+}
+
+
+def parse_color(color: str) -> Tuple[int, int, int]:
+    c = color.strip().lower()
+    if c in _NAMED_COLORS:
+        return _NAMED_COLORS[c]
+    if c.startswith("#") and len(c) == 4:
+        return int(c[1] * 2, 16), int(c[2] * 2, 16), int(c[3] * 2, 16)
+    if c.startswith("#") and len(c) == 7:
+        return int(c[1:3], 16), int(c[3:5], 16), int(c[5:7], 16)
+    raise ValueError(f"Unsupported color: {color!r}")
+
+
+# ---------------- растеризация ----------------
+
+def render_rgba(
+    geom: TreeGeometry,
+    palette: Palette,
+    width: int,
+    height: int,
+    margin: float = 30.0,
+    stroke_scale: float = 1.0,
+    view: Optional[Viewport] = None,
+    lod_px: float = 0.0,
+) -> np.ndarray:
+    if view is None:
+        view = fit_viewport(geom.bbox, width, height, margin=margin)
+    if lod_px > 0:
+        # поддеревья мельче lod_px пикселей — одним сегментом (см. fractal.lod)
+        geom = cull_geometry(geom, view.scale, lod_px).geometry
+
+    out = _background(palette, width, height)
+    _paint(out, geom, _palette_colors(palette), view, stroke_scale)
+    return _to_rgba(out)
+
+
+# Холст float32 (height, width, 3): рисование на уже закрашенном холсте дописывает поверх —
+# так кадры анимации добавляют только новые сегменты
+
+def _palette_colors(palette: Palette) -> np.ndarray:
+    return np.asarray([parse_color(c) for c in color_table(palette)], dtype=np.float32)
+
+
+def _background(palette: Palette, width: int, height: int) -> np.ndarray:
+    out = np.empty((height, width, 3), dtype=np.float32)
+    out[:] = np.asarray(parse_color(palette.background), dtype=np.float32)
+    return out
+
+
+def _paint(out: np.ndarray, geom: TreeGeometry, colors: np.ndarray, view: Viewport, stroke_scale: float) -> None:
+    if geom.draw_mode == "square":
+        _draw_squares(out, geom, colors, view, stroke_scale)
+    else:
+        px0, py0 = view.to_pixels(geom.x0.astype(np.float64), geom.y0.astype(np.float64))
+        px1, py1 = view.to_pixels(geom.x1.astype(np.float64), geom.y1.astype(np.float64))
+        _draw_lines(out, geom, colors, px0, py0, px1, py1, stroke_scale)
+
+
+def _to_rgba(out: np.ndarray) -> np.ndarray:
+    height, width = out.shape[:2]
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    rgba[..., :3] = np.clip(out + 0.5, 0, 255).astype(np.uint8)
+    rgba[..., 3] = 255
+    return rgba
+
+
+def _footprints(
+    lo_x: np.ndarray,
+    lo_y: np.ndarray,
+    hi_x: np.ndarray,
+    hi_y: np.ndarray,
+    width: int,
+    height: int,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    # Окна пикселей вокруг фигур, обрезанные по картинке и сгруппированные по размеру
+    # (степени двойки), чтобы обрабатывать пачку фигур одним массивом (n, K, K).
+    lo_x = np.maximum(np.floor(lo_x), 0).astype(np.int64)
+    lo_y = np.maximum(np.floor(lo_y), 0).astype(np.int64)
+    hi_x = np.minimum(np.ceil(hi_x), width - 1).astype(np.int64)
+    hi_y = np.minimum(np.ceil(hi_y), height - 1).astype(np.int64)
+
+    visible = np.flatnonzero((hi_x >= lo_x) & (hi_y >= lo_y))
+    if visible.size == 0:
+        return
+
+    size = np.maximum(hi_x - lo_x, hi_y - lo_y)[visible] + 1
+    bucket = np.ceil(np.log2(size)).astype(np.int64)
+
+    for b in np.unique(bucket).tolist():
+        k = 1 << b
+        ids = visible[bucket == b]
+        grid = np.arange(k, dtype=np.int64)
+        per_chunk = max(1, _CHUNK_PIXELS // (k * k))
+        for start in range(0, ids.size, per_chunk):
+            chunk = ids[start:start + per_chunk]
+            gx = lo_x[chunk, None, None] + grid[None, None, :]
+            gy = lo_y[chunk, None, None] + grid[None, :, None]
+            gx, gy = np.broadcast_arrays(gx, gy)
+            inside = (gx <= hi_x[chunk, None, None]) & (gy <= hi_y[chunk, None, None])
+            yield chunk, np.where(inside, gx, -1), gy
+
+
+def _draw_lines(
+    out: np.ndarray,
+    geom: TreeGeometry,
+    colors: np.ndarray,
+    px0: np.ndarray,
+    py0: np.ndarray,
+    px1: np.ndarray,
+    py1: np.ndarray,
+    stroke_scale: float,
+) -> None:
+    # Отрезки с круглыми концами (как capstyle=round у turtle), сглаживание по расстоянию.
+    height, width = out.shape[:2]
+    radius = np.maximum(1.0, geom.thickness.astype(np.float64)) * stroke_scale / 2.0
+    pad = radius + 1.0
+
+    # по слою покрытия на цвет: ствол снизу, листья сверху
+    for color_idx in np.unique(geom.color).tolist():
+        sel = np.flatnonzero(geom.color == color_idx)
+        cov = np.zeros(height * width, dtype=np.float32)
+
+        ax, ay, bx, by, r = px0[sel], py0[sel], px1[sel], py1[sel], radius[sel]
+        dx = bx - ax
+        dy = by - ay
+        len2 = np.maximum(dx * dx + dy * dy, 1e-12)
+
+        for ids, gx, gy in _footprints(
+            np.minimum(ax, bx) - pad[sel], np.minimum(ay, by) - pad[sel],
+            np.maximum(ax, bx) + pad[sel], np.maximum(ay, by) + pad[sel],
+            width, height,
+        ):
+            cx = gx + 0.5 - ax[ids, None, None]
+            cy = gy + 0.5 - ay[ids, None, None]
+            sdx = dx[ids, None, None]
+            sdy = dy[ids, None, None]
+            t = np.clip((cx * sdx + cy * sdy) / len2[ids, None, None], 0.0, 1.0)
+            dist = np.hypot(cx - t * sdx, cy - t * sdy)
+            c = np.clip(r[ids, None, None] - dist + 0.5, 0.0, 1.0).astype(np.float32)
+
+            mask = (c > 0) & (gx >= 0)
+            np.maximum.at(cov, gy[mask] * width + gx[mask], c[mask])
+
+        a = cov.reshape(height, width, 1)
+        out *= 1.0 - a
+        out += a * colors[color_idx]
+
+
+def _draw_squares(
+    out: np.ndarray,
+    geom: TreeGeometry,
+    colors: np.ndarray,
+    view: Viewport,
+    stroke_scale: float,
+) -> None:
+    # Квадраты turtle: заливка чёрным, контур 1px цветом ветки, каждый следующий поверх.
+    # Для каждого пикселя ищем последний накрывший его квадрат и красим по нему.
+    height, width = out.shape[:2]
+
+    seg, wx, wy = stamp_centers(geom)
+    sx, sy = view.to_pixels(wx, wy)
+
+    # направление ветки в пикселях (y вниз)
+    dx = (geom.x1 - geom.x0).astype(np.float64)
+    dy = (geom.y0 - geom.y1).astype(np.float64)
+    seg_len = np.maximum(np.hypot(dx, dy), 1e-12)
+    cos = (dx / seg_len)[seg]
+    sin = (dy / seg_len)[seg]
+    half = (stamp_half_size(geom.thickness) * stroke_scale)[seg]
+
+    ext = half * (np.abs(cos) + np.abs(sin)) + 1.0
+    top = np.full(height * width, -1, dtype=np.int64)
+
+    def extent(ids: np.ndarray, gx: np.ndarray, gy: np.ndarray) -> np.ndarray:
+        cx = gx + 0.5 - sx[ids]
+        cy = gy + 0.5 - sy[ids]
+        u = cx * cos[ids] + cy * sin[ids]
+        v = cy * cos[ids] - cx * sin[ids]
+        return np.maximum(np.abs(u), np.abs(v))
+
+    for ids, gx, gy in _footprints(sx - ext, sy - ext, sx + ext, sy + ext, width, height):
+        m = extent(ids[:, None, None], gx, gy)
+        mask = (m < half[ids, None, None] + 1.0) & (gx >= 0)
+        np.maximum.at(top, gy[mask] * width + gx[mask], np.broadcast_to(ids[:, None, None], gx.shape)[mask])
+
+    pix = np.flatnonzero(top >= 0)
+    ids = top[pix]
+    m = extent(ids, pix % width, pix // width)
+
+    # внешний край контура на half + 0.5, внутренний — на half - 0.5
+    a = np.clip(half[ids] + 1.0 - m, 0.0, 1.0)[:, None]
+    f = np.clip(half[ids] - m, 0.0, 1.0)[:, None]
+    fill = np.asarray(parse_color(STAMP_FILL), dtype=np.float32)
+    stroke = colors[geom.color[seg[ids]]]
+
+    flat = out.reshape(-1, 3)
+    flat[pix] = flat[pix] * (1.0 - a) + fill * f + stroke * (a - f)
+
+
+# ---------------- PNG ----------------
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def encode_png(rgba: np.ndarray, level: int = 6) -> bytes:
+    height, width = rgba.shape[:2]
+    # фильтр 0 (None) в начале каждой строки
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", header),
+        _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), level)),
+        _png_chunk(b"IEND", b""),
+    ))
+
+
+def write_png(path: str, rgba: np.ndarray, level: int = 6) -> None:
+    with open(path, "wb") as f:
+        f.write(encode_png(rgba, level))
+
+
+class PngStream:
+    # PNG, который пишется полосами строк сверху вниз: целиком картинка в памяти не нужна.
+    # Сжатый поток выходит отдельными IDAT-чанками по мере заполнения буфера zlib.
+
+    def __init__(self, f: BinaryIO, width: int, height: int, level: int = 6) -> None:
+        self.f = f
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self._z = zlib.compressobj(level)
+        header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+        f.write(b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header))
+
+    def write_rows(self, rgba: np.ndarray) -> None:
+        h, w = rgba.shape[:2]
+        if w != self.width or self.rows + h > self.height:
+            raise ValueError("rows do not fit the PNG size")
+        raw = np.zeros((h, w * 4 + 1), dtype=np.uint8)
+        raw[:, 1:] = rgba.reshape(h, w * 4)
+        self._emit(self._z.compress(raw.tobytes()))
+        self.rows += h
+
+    def close(self) -> None:
+        if self.rows != self.height:
+            raise ValueError(f"PNG has {self.rows} of {self.height} rows")
+        self._emit(self._z.flush())
+        self.f.write(_png_chunk(b"IEND", b""))
+
+    def _emit(self, data: bytes) -> None:
+        if data:
+            self.f.write(_png_chunk(b"IDAT", data))
+
+
+def render_png(
+    cfg: TreeConfig,
+    path: str,
+    width: int = 1024,
+    height: int = 1024,
+    margin: float = 30.0,
+    stroke_scale: float = 1.0,
+    lod_px: float = 0.0,
+) -> None:
+    geom = generate_geometry(cfg)
+    rgba = render_rgba(geom, get_palette(cfg.palette_name), width, height, margin, stroke_scale, lod_px=lod_px)
+    write_png(path, rgba)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from fractal.config import RNG_SEQUENTIAL, TreeConfig
+from fractal.store import cache_entries, cache_home, evict_lru
+
+
+# Меняется, когда рендер начинает рисовать иначе: старые файлы перестают совпадать по ключу
+RENDER_VERSION = 1
+
+DEFAULT_MAX_BYTES = 512 * 2**20
+
+
+def render_key(cfg: TreeConfig, fmt: str, width: int, height: int) -> str:
+    # канонический JSON всего, что влияет на байты файла
+    config = asdict(cfg)
+    if config["rng"] == RNG_SEQUENTIAL:
+        del config["rng"]
+    data = {"config": config, "format": fmt, "width": int(width), "height": int(height), "version": RENDER_VERSION}
+    blob = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def default_cache_dir() -> str:
+    return os.path.join(cache_home(), "renders")
+
+
+class RenderCache:
+    # Готовые PNG/SVG/EPS на диске, имя файла — render_key. Несколько процессов могут делить
+    # один каталог: файл появляется только целиком (os.replace), а удалённый соседом читается
+    # как промах. LRU по mtime: попадание обновляет mtime, при переполнении удаляются самые старые.
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def path_for(self, key: str, fmt: str) -> str:
+        # подкаталог по первым двум символам: не тысячи файлов в одном каталоге
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def lookup(self, cfg: TreeConfig, fmt: str, width: int, height: int) -> Optional[str]:
+        path = self.path_for(render_key(cfg, fmt, width, height), fmt)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._count(hit=False)
+            return None
+        self._count(hit=True)
+        return path
+
+    def fetch(self, cfg: TreeConfig, fmt: str, width: int, height: int) -> str:
+        # путь к готовому файлу; при промахе рендерим прямо в кэш
+        path = self.lookup(cfg, fmt, width, height)
+        if path is not None:
+            return path
+
+        from fractal.batch import render_job
+
+        path = self.path_for(render_key(cfg, fmt, width, height), fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        render_job(cfg, path, fmt, width, height)
+        self.evict()
+        return path
+
+    def read(self, cfg: TreeConfig, fmt: str, width: int, height: int) -> bytes:
+        # файл могут вытеснить между fetch и open — тогда рендерим ещё раз
+        for _ in range(3):
+            path = self.fetch(cfg, fmt, width, height)
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                continue
+        raise OSError(f"render cache entry keeps disappearing: {path}")
+
+    def export(self, cfg: TreeConfig, path: str, fmt: str, width: int, height: int) -> bool:
+        # копия из кэша в path (тоже через временный файл); True — было попадание
+        hits = self.hits
+        data = self.read(cfg, fmt, width, height)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return self.hits > hits
+
+    def evict(self) -> None:
+        removed = evict_lru(self.directory, self.max_bytes)
+        with self._lock:
+            self.evictions += removed
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        entries = cache_entries(self.directory)
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+            }
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
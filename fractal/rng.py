@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from typing import Sequence, TypeVar
+
+import numpy as np
+
+from fractal.config import RNG_HASHED, RNG_MODES, RNG_SEQUENTIAL  # noqa: F401  (режимы TreeConfig.rng)
+
+# Номер узла — путь от ствола: ствол 1, дети узла n — 2n (левый) и 2n + 1 (правый).
+# Числа узла: 0 — длина, 1 — левый угол, 2 — правый угол, 3 — цвет листа.
+DRAW_LENGTH = 0
+DRAW_LEFT = 1
+DRAW_RIGHT = 2
+DRAW_LEAF = 3
+_DRAWS_PER_NODE = 4
+
+_MASK = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_MUL1 = 0xBF58476D1CE4E5B9
+_MUL2 = 0x94D049BB133111EB
+
+T = TypeVar("T")
+
+
+# ---------------- по одному числу (turtle) ----------------
+
+def _mix64(z: int) -> int:
+    # финализатор splitmix64
+    z = ((z ^ (z >> 30)) * _MUL1) & _MASK
+    z = ((z ^ (z >> 27)) * _MUL2) & _MASK
+    return z ^ (z >> 31)
+
+
+def _seed_state(seed: int) -> int:
+    return _mix64(seed & _MASK)
+
+
+def hashed_random(seed: int, node: int, draw: int) -> float:
+    # splitmix64 со счётчиком node * 4 + draw: число в [0, 1) из 53 старших бит
+    ctr = node * _DRAWS_PER_NODE + draw
+    z = _mix64((_seed_state(seed) + ctr * _GOLDEN) & _MASK)
+    return (z >> 11) * (1.0 / 9007199254740992.0)
+
+
+class HashedRandom:
+    # uniform()/choice() узла в том же порядке, что FractalTreeRenderer._branch зовёт их у random.Random
+
+    def __init__(self, seed: int, node: int) -> None:
+        self.seed = seed
+        self.node = node
+        self.draw = 0
+
+    def random(self) -> float:
+        value = hashed_random(self.seed, self.node, self.draw)
+        self.draw += 1
+        return value
+
+    def uniform(self, a: float, b: float) -> float:
+        return a + (b - a) * self.random()
+
+    def choice(self, seq: Sequence[T]) -> T:
+        # номер выбора всегда DRAW_LEAF: лист берёт его после трёх uniform()
+        return seq[int(hashed_random(self.seed, self.node, DRAW_LEAF) * len(seq))]
+
+
+# ---------------- массивом (геометрия) ----------------
+
+def _mix64_array(z: np.ndarray) -> np.ndarray:
+    # uint64 в numpy переполняется по модулю 2**64 — как & _MASK выше
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(_MUL1)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(_MUL2)
+    return z ^ (z >> np.uint64(31))
+
+
+def hashed_random_array(seed: int, nodes: np.ndarray, draw: int) -> np.ndarray:
+    ctr = nodes.astype(np.uint64) * np.uint64(_DRAWS_PER_NODE) + np.uint64(draw)
+    z = _mix64_array(np.uint64(_seed_state(seed)) + ctr * np.uint64(_GOLDEN))
+    return (z >> np.uint64(11)).astype(np.float64) * (1.0 / 9007199254740992.0)
+
+
+def hashed_uniform_array(seed: int, nodes: np.ndarray, draw: int, lo: float, hi: float) -> np.ndarray:
+    return lo + (hi - lo) * hashed_random_array(seed, nodes, draw)
+
+
+def hashed_choice_array(seed: int, nodes: np.ndarray, n: int) -> np.ndarray:
+    return np.floor(hashed_random_array(seed, nodes, DRAW_LEAF) * n).astype(np.int64)
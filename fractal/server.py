@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from fractal.batch import FORMATS, config_from_record, render_job
+from fractal.config import MAX_DEPTH, TreeConfig, config_error
+from fractal.render_cache import DEFAULT_MAX_BYTES, RenderCache, render_key
+
+
+# Сторона картинки одного запроса (поля конфига — config_error, глубина до MAX_DEPTH)
+MAX_SIDE = 4096
+DEFAULT_SIZE = 512
+
+# Сколько разных рендеров может ждать пул; сверх — 503, клиент повторит позже
+MAX_PENDING = 32
+
+_HEADER_LIMIT = 16 * 1024
+_READ_TIMEOUT = 10.0
+_LATENCY_WINDOW = 1024   # сколько последних запросов держим для перцентилей
+_RATE_WINDOW = 60.0      # окно для запросов в секунду
+
+_CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "eps": "application/postscript",
+}
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _render_bytes(
+    cfg: TreeConfig, fmt: str, width: int, height: int, cache_dir: Optional[str], cache_bytes: int
+) -> bytes:
+    # выполняется в процессе пула
+    if cache_dir is not None:
+        return RenderCache(cache_dir, cache_bytes).read(cfg, fmt, width, height)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = render_job(cfg, os.path.join(tmp, f"tree.{fmt}"), fmt, width, height)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def parse_query(query: str) -> Tuple[TreeConfig, int, int]:
+    # ?depth=12&palette_name=Neon&width=800 — поля TreeConfig плюс размер картинки
+    record: Dict[str, str] = dict(parse_qsl(query, keep_blank_values=False))
+    try:
+        width = int(record.pop("width", DEFAULT_SIZE))
+        height = int(record.pop("height", DEFAULT_SIZE))
+        cfg = config_from_record(record)
+    except (ValueError, TypeError) as e:
+        raise _HttpError(400, str(e)) from e
+
+    # те же пределы, что в GUI: незнакомый режим молча рисовал бы другое, а shrink около 1
+    # или огромная длина заняли бы процесс пула на минуты в обход max_pending
+    error = config_error(cfg, MAX_DEPTH)
+    if error is not None:
+        raise _HttpError(400, error)
+    if not (1 <= width <= MAX_SIDE and 1 <= height <= MAX_SIDE):
+        raise _HttpError(400, f"width and height must be in 1..{MAX_SIDE}")
+    return cfg, width, height
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.requests = 0
+        self.by_status: Dict[int, int] = {}
+        self.renders = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.cache_hits = 0
+        self.latency: Deque[Tuple[float, float]] = deque(maxlen=_LATENCY_WINDOW)  # (время, мс)
+        self.render_ms: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    def record(self, status: int, ms: float) -> None:
+        self.requests += 1
+        self.by_status[status] = self.by_status.get(status, 0) + 1
+        self.latency.append((time.time(), ms))
+
+    def snapshot(self, pending: int) -> Dict[str, object]:
+        now = time.time()
+        recent = [ms for t, ms in self.latency if now - t <= _RATE_WINDOW]
+        return {
+            "uptime_s": round(now - self.started, 1),
+            "requests": self.requests,
+            "status": {str(k): v for k, v in sorted(self.by_status.items())},
+            "renders": self.renders,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "cache_hits": self.cache_hits,
+            "pending": pending,
+            "requests_per_s": round(len(recent) / _RATE_WINDOW, 3),
+            "latency_ms": _percentiles([ms for _, ms in self.latency]),
+            "render_ms": _percentiles(list(self.render_ms)),
+        }
+
+
+def _percentiles(values: list) -> Dict[str, float]:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+    return {"p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": round(values[-1], 2)}
+
+
+class RenderServer:
+    # HTTP/1.0-подобный сервер: GET /tree.png|svg|eps?<поля TreeConfig>, GET /stats.
+    # Рендер — в пуле процессов; одинаковые запросы, пока первый считается, ждут его же результат.
+    # Разных рендеров в работе не больше max_pending, лишние получают 503.
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_pending: int = MAX_PENDING,
+        cache: Optional[RenderCache] = None,
+    ) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.cache = cache
+        self.stats = _Stats()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, "asyncio.Future[bytes]"] = {}
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        # Процессы пула поднимаются до приёма соединений. Иначе их fork случается посреди
+        # первого запроса, потомки наследуют сокет клиента, и close() не даёт ему EOF.
+        await asyncio.get_running_loop().run_in_executor(self._pool, int)
+        return await asyncio.start_server(self._handle, host, port, limit=_HEADER_LIMIT)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # ---------- рендер ----------
+
+    async def render(self, cfg: TreeConfig, fmt: str, width: int, height: int) -> bytes:
+        key = render_key(cfg, fmt, width, height)
+
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.stats.coalesced += 1
+            # shield: отключившийся клиент не отменяет рендер для остальных
+            return await asyncio.shield(fut)
+
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            # поиск и чтение файла — в потоке: цикл событий не ждёт диск
+            data = await loop.run_in_executor(None, self._read_cached, cfg, fmt, width, height)
+            if data is not None:
+                self.stats.cache_hits += 1
+                return data
+            # пока читали, такой же запрос мог уже запустить рендер
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.stats.coalesced += 1
+                return await asyncio.shield(fut)
+
+        if len(self._inflight) >= self.max_pending:
+            self.stats.rejected += 1
+            raise _HttpError(503, "render queue is full, retry later")
+
+        assert self._pool is not None, "server is not started"
+        cache_dir = self.cache.directory if self.cache is not None else None
+        cache_bytes = self.cache.max_bytes if self.cache is not None else DEFAULT_MAX_BYTES
+        started = time.perf_counter()
+        fut = loop.run_in_executor(self._pool, _render_bytes, cfg, fmt, width, height, cache_dir, cache_bytes)
+        self._inflight[key] = fut
+
+        def done(_: "asyncio.Future[bytes]") -> None:
+            self._inflight.pop(key, None)
+            self.stats.renders += 1
+            self.stats.render_ms.append((time.perf_counter() - started) * 1000.0)
+
+        fut.add_done_callback(done)
+        return await asyncio.shield(fut)
+
+    def _read_cached(self, cfg: TreeConfig, fmt: str, width: int, height: int) -> Optional[bytes]:
+        assert self.cache is not None
+        path = self.cache.lookup(cfg, fmt, width, height)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None  # вытеснили между lookup и open
+
+    def snapshot(self) -> Dict[str, object]:
+        data = self.stats.snapshot(len(self._inflight))
+        data["workers"] = self.workers
+        data["max_pending"] = self.max_pending
+        if self.cache is not None:
+            data["cache"] = self.cache.stats()
+        return data
+
+    # ---------- HTTP ----------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        started = time.perf_counter()
+        status = 500
+        method = ""
+        try:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), _READ_TIMEOUT)
+                method, target = _request_line(head)
+                status, ctype, body = await self._route(method, target)
+            except _HttpError as e:
+                status, ctype, body = e.status, "text/plain; charset=utf-8", f"{e}\n".encode("utf-8")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                status, ctype, body = 400, "text/plain; charset=utf-8", b"malformed request\n"
+            except Exception as e:  # ошибка рендера — ответ клиенту, сервер живёт дальше
+                status, ctype, body = 500, "text/plain; charset=utf-8", f"{type(e).__name__}: {e}\n".encode("utf-8")
+
+            headers = [
+                f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+                f"Content-Type: {ctype}",
+                f"Content-Length: {len(body)}",
+                "Connection: close",
+            ]
+            if status == 503:
+                headers.append("Retry-After: 1")
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1"))
+            if method != "HEAD":
+                writer.write(body)
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.stats.record(status, (time.perf_counter() - started) * 1000.0)
+            writer.close()
+
+    async def _route(self, method: str, target: str) -> Tuple[int, str, bytes]:
+        if method not in ("GET", "HEAD"):
+            raise _HttpError(405, "only GET is supported")
+
+        url = urlsplit(target)
+        if url.path == "/stats":
+            body = json.dumps(self.snapshot(), indent=2).encode("utf-8")
+            return 200, "application/json", body
+
+        name, _, fmt = url.path.lstrip("/").rpartition(".")
+        if name != "tree" or fmt not in FORMATS:
+            raise _HttpError(404, "try /tree.png, /tree.svg, /tree.eps or /stats")
+
+        cfg, width, height = parse_query(url.query)
+        return 200, _CONTENT_TYPES[fmt], await self.render(cfg, fmt, width, height)
+
+
+def _request_line(head: bytes) -> Tuple[str, str]:
+    line = head.split(b"\r\n", 1)[0].decode("latin-1")
+    parts = line.split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise ValueError(f"bad request line: {line!r}")
+    return parts[0].upper(), parts[1]
+
+
+# ---------------- CLI ----------------
+
+async def serve(
+    host: str, port: int, workers: Optional[int], max_pending: int, cache: Optional[RenderCache]
+) -> None:
+    server = RenderServer(workers, max_pending, cache)
+    srv = await server.start(host, port)
+    print(f"serving on http://{host}:{port}/tree.png  ({server.workers} workers)", flush=True)
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        server.close()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (localhost only by default)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="render processes, default: number of cores")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="distinct renders in flight before 503")
+    parser.add_argument("--cache", metavar="DIR", help="render cache directory shared with batch/GUI")
+    parser.add_argument("--cache-mb", type=int, default=None, help="render cache size limit, MB (default 512)")
+
+
+def main(args: argparse.Namespace) -> int:
+    cache = None
+    if args.cache:
+        cache = RenderCache(args.cache, args.cache_mb * 2**20 if args.cache_mb else DEFAULT_MAX_BYTES)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending, cache))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
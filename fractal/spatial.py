@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from fractal.geometry import TreeGeometry, stamp_half_size
+from fractal.lod import LOD_MIN_PX, cull_geometry
+from fractal.view import Viewport
+
+
+# Средняя заполненность ячейки сетки и предел числа ячеек по стороне
+_PER_CELL = 8
+_MAX_CELLS = 1024
+
+# Сегмент, накрывающий больше стольких ячеек, не раскладывается по ним, а проверяется
+# при каждом запросе: таких мало (ствол и первые ветки), а по ячейкам они раздували бы индекс
+_BIG_CELLS = 16
+
+# Сколько LOD-уровней (масштабов) держит ViewIndex
+_LOD_LEVELS = 8
+
+
+@dataclass
+class SegmentGrid:
+    # Равномерная сетка по рамкам сегментов: ячейка (ix, iy) -> номера сегментов
+    # items[starts[c]:starts[c + 1]], c = iy * nx + ix.
+    minx: float
+    miny: float
+    cell: float
+    nx: int
+    ny: int
+    starts: np.ndarray
+    items: np.ndarray
+    big: np.ndarray
+    lo_x: np.ndarray
+    lo_y: np.ndarray
+    hi_x: np.ndarray
+    hi_y: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.lo_x.shape[0])
+
+    def query(self, minx: float, miny: float, maxx: float, maxy: float) -> np.ndarray:
+        # номера сегментов, чья рамка пересекает прямоугольник, по возрастанию (порядок отрисовки)
+        n = len(self)
+        ix0, iy0 = self._cell_of(minx, miny)
+        ix1, iy1 = self._cell_of(maxx, maxy)
+        if ix0 == 0 and iy0 == 0 and ix1 == self.nx - 1 and iy1 == self.ny - 1:
+            candidates = np.arange(n)
+        else:
+            cells = (np.arange(iy0, iy1 + 1)[:, None] * self.nx + np.arange(ix0, ix1 + 1)[None, :]).ravel()
+            lo = self.starts[cells]
+            count = self.starts[cells + 1] - lo
+            total = int(count.sum())
+            # items[lo_i : lo_i + count_i] для всех ячеек разом
+            k = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+            hit = np.zeros(n, dtype=bool)
+            hit[self.items[np.repeat(lo, count) + k]] = True
+            hit[self.big] = True
+            candidates = np.flatnonzero(hit)
+
+        inside = (
+            (self.lo_x[candidates] <= maxx)
+            & (self.hi_x[candidates] >= minx)
+            & (self.lo_y[candidates] <= maxy)
+            & (self.hi_y[candidates] >= miny)
+        )
+        return candidates[inside]
+
+    def _cell_of(self, x: float, y: float) -> Tuple[int, int]:
+        ix = int(min(self.nx - 1, max(0, math.floor((x - self.minx) / self.cell))))
+        iy = int(min(self.ny - 1, max(0, math.floor((y - self.miny) / self.cell))))
+        return ix, iy
+
+
+def build_grid(geom: TreeGeometry) -> SegmentGrid:
+    n = len(geom)
+    lo_x = np.minimum(geom.x0, geom.x1)
+    lo_y = np.minimum(geom.y0, geom.y1)
+    hi_x = np.maximum(geom.x0, geom.x1)
+    hi_y = np.maximum(geom.y0, geom.y1)
+
+    if n:
+        minx, miny = float(lo_x.min()), float(lo_y.min())
+        w = max(1e-9, float(hi_x.max()) - minx)
+        h = max(1e-9, float(hi_y.max()) - miny)
+    else:
+        minx = miny = 0.0
+        w = h = 1.0
+    cell = max(math.sqrt(w * h * _PER_CELL / max(1, n)), w / _MAX_CELLS, h / _MAX_CELLS)
+    nx = min(_MAX_CELLS, int(w / cell) + 1)
+    ny = min(_MAX_CELLS, int(h / cell) + 1)
+
+    ix0 = np.clip(((lo_x - minx) / cell).astype(np.int64), 0, nx - 1)
+    iy0 = np.clip(((lo_y - miny) / cell).astype(np.int64), 0, ny - 1)
+    wx = np.clip(((hi_x - minx) / cell).astype(np.int64), 0, nx - 1) - ix0 + 1
+    wy = np.clip(((hi_y - miny) / cell).astype(np.int64), 0, ny - 1) - iy0 + 1
+    cover = wx * wy
+
+    is_big = cover > _BIG_CELLS
+    small = np.flatnonzero(~is_big)
+    count = cover[small]
+    seg = np.repeat(small, count)
+    k = np.arange(seg.size) - np.repeat(np.cumsum(count) - count, count)
+    cells = (iy0[seg] + k // wx[seg]) * nx + ix0[seg] + k % wx[seg]
+
+    order = np.argsort(cells, kind="stable")
+    starts = np.zeros(nx * ny + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cells, minlength=nx * ny), out=starts[1:])
+
+    return SegmentGrid(
+        minx=minx,
+        miny=miny,
+        cell=cell,
+        nx=nx,
+        ny=ny,
+        starts=starts,
+        items=seg[order],
+        big=np.flatnonzero(is_big),
+        lo_x=lo_x,
+        lo_y=lo_y,
+        hi_x=hi_x,
+        hi_y=hi_y,
+    )
+
+
+def take_segments(geom: TreeGeometry, idx: np.ndarray) -> TreeGeometry:
+    # подмножество сегментов; idx по возрастанию — порядок уровней сохраняется
+    return TreeGeometry(
+        x0=geom.x0[idx],
+        y0=geom.y0[idx],
+        x1=geom.x1[idx],
+        y1=geom.y1[idx],
+        thickness=geom.thickness[idx],
+        color=geom.color[idx],
+        depth=geom.depth[idx],
+        bbox=geom.bbox,
+        draw_mode=geom.draw_mode,
+    )
+
+
+def pen_extent_px(geom: TreeGeometry) -> float:
+    # насколько нарисованный сегмент выходит за свою рамку, в пикселях (перо и квадраты
+    # turtle от масштаба не зависят)
+    if len(geom) == 0:
+        return 0.0
+    th = float(geom.thickness.max())
+    if geom.draw_mode == "square":
+        return float(stamp_half_size(np.array([th]))[0]) * math.sqrt(2.0)
+    return max(1.0, th) / 2.0
+
+
+class ViewIndex:
+    # Видимая часть дерева для вида: LOD под масштаб + выборка по сетке.
+    # LOD-уровни — степени двойки масштаба (округление вниз, т. е. деталей не меньше нужного);
+    # для каждого своя сетка, строятся при первом обращении.
+
+    def __init__(self, geom: TreeGeometry, min_px: float = LOD_MIN_PX) -> None:
+        self.geom = geom
+        self.min_px = min_px
+        self.pad_px = pen_extent_px(geom)
+        self._levels: "OrderedDict[int, Tuple[TreeGeometry, SegmentGrid]]" = OrderedDict()
+        self._full: Optional[int] = None
+
+    def visible(self, view: Viewport) -> TreeGeometry:
+        geom, grid = self._level(view.scale)
+        pad = self.pad_px / view.scale
+        idx = grid.query(view.llx - pad, view.lly - pad, view.urx + pad, view.ury + pad)
+        if idx.size == len(geom):
+            return geom
+        return take_segments(geom, idx)
+
+    def _level(self, scale: float) -> Tuple[TreeGeometry, SegmentGrid]:
+        level = math.floor(math.log2(max(scale, 1e-12)))
+        # с этого масштаба LOD ничего не выбрасывает — дальше одна сетка на исходной геометрии
+        if self._full is not None and level >= self._full:
+            level = self._full
+
+        cached = self._levels.get(level)
+        if cached is not None:
+            self._levels.move_to_end(level)
+            return cached
+
+        lod = cull_geometry(self.geom, 2.0 ** level, self.min_px)
+        if lod.culled == 0:
+            self._full = level if self._full is None else min(self._full, level)
+        cached = (lod.geometry, build_grid(lod.geometry))
+        self._levels[level] = cached
+        if len(self._levels) > _LOD_LEVELS:
+            self._levels.popitem(last=False)
+        return cached
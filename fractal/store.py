@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+from dataclasses import asdict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from fractal.config import RNG_SEQUENTIAL, TreeConfig
+from fractal.geometry import BBox, StopCheck, TreeGeometry, _never, generate_geometry
+from fractal.palette import get_palette
+
+
+# Одна запись на сегмент, без выравнивания: 5 * float32 + 2 * uint8 = 22 байта
+SEGMENT_DTYPE = np.dtype(
+    [
+        ("x0", "<f4"),
+        ("y0", "<f4"),
+        ("x1", "<f4"),
+        ("y1", "<f4"),
+        ("thickness", "<f4"),
+        ("color", "u1"),
+        ("depth", "u1"),
+    ]
+)
+
+# Заголовок файла: magic, версия, размер записи, число сегментов, bbox (float64), draw_mode
+_MAGIC = b"FTREESEG"
+_VERSION = 1
+_HEADER = struct.Struct("<8sIIQ4d8s")
+
+# Мелкие деревья пересчитать быстрее, чем держать на диске
+CACHE_MIN_SEGMENTS = 1 << 15
+
+# Сколько байт держит кэш геометрии по умолчанию (дерево глубины 18 — около 11 МБ)
+CACHE_MAX_BYTES = 512 * 2**20
+
+
+# ---------------- структурированный массив ----------------
+
+def pack_segments(geom: TreeGeometry) -> np.ndarray:
+    records = np.empty(len(geom), dtype=SEGMENT_DTYPE)
+    for name in SEGMENT_DTYPE.names:
+        records[name] = getattr(geom, name)
+    return records
+
+
+def unpack_segments(records: np.ndarray, bbox: BBox, draw_mode: str) -> TreeGeometry:
+    # поля — представления records (у memmap — прямо страницы файла), без копий
+    return TreeGeometry(
+        x0=records["x0"],
+        y0=records["y0"],
+        x1=records["x1"],
+        y1=records["y1"],
+        thickness=records["thickness"],
+        color=records["color"],
+        depth=records["depth"],
+        bbox=bbox,
+        draw_mode=draw_mode,
+    )
+
+
+# ---------------- файл ----------------
+
+def save_geometry(geom: TreeGeometry, path: str) -> None:
+    # временный файл + os.replace: читатель не увидит недописанный файл
+    b = geom.bbox
+    header = _HEADER.pack(
+        _MAGIC, _VERSION, SEGMENT_DTYPE.itemsize, len(geom),
+        b.minx, b.miny, b.maxx, b.maxy, geom.draw_mode.encode("ascii"),
+    )
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(header)
+            pack_segments(geom).tofile(f)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_geometry(path: str, mmap: bool = True) -> TreeGeometry:
+    with open(path, "rb") as f:
+        raw = f.read(_HEADER.size)
+        if len(raw) < _HEADER.size:
+            raise ValueError(f"{path}: truncated header")
+        magic, version, itemsize, count, minx, miny, maxx, maxy, mode = _HEADER.unpack(raw)
+        if magic != _MAGIC or version != _VERSION or itemsize != SEGMENT_DTYPE.itemsize:
+            raise ValueError(f"{path}: not a segment file of version {_VERSION}")
+        if os.fstat(f.fileno()).st_size != _HEADER.size + count * itemsize:
+            raise ValueError(f"{path}: size does not match segment count")
+
+        if count == 0:
+            records = np.empty(0, dtype=SEGMENT_DTYPE)
+        elif mmap:
+            records = np.memmap(path, dtype=SEGMENT_DTYPE, mode="r", offset=_HEADER.size, shape=(count,))
+        else:
+            records = np.fromfile(f, dtype=SEGMENT_DTYPE, count=count)
+
+    draw_mode = mode.rstrip(b"\0").decode("ascii")
+    return unpack_segments(records, BBox(minx, miny, maxx, maxy), draw_mode)
+
+
+# ---------------- кэш ----------------
+
+def geometry_key(cfg: TreeConfig) -> str:
+    # Только то, от чего зависят сегменты. Палитра влияет лишь числом цветов листьев
+    # (rnd.choice), сами цвета и фон подставляются при отрисовке.
+    data = asdict(cfg)
+    del data["palette_name"], data["background"]
+    data["leaf_colors"] = len(get_palette(cfg.palette_name).leaf_colors)
+    if data["rng"] == RNG_SEQUENTIAL:
+        del data["rng"]
+    data["format"] = _VERSION
+    blob = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_home() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "fractal-tree")
+
+
+def default_cache_dir() -> str:
+    return os.path.join(cache_home(), "geometry")
+
+
+def cache_entries(directory: str) -> List[Tuple[float, int, str]]:
+    # (mtime, размер, путь) всех файлов каталога кэша и его подкаталогов;
+    # недописанные *.tmp не считаются
+    entries = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue  # удалил другой процесс
+            entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def evict_lru(directory: str, max_bytes: int) -> int:
+    # Удаляет самые давно использованные (по mtime) файлы, пока кэш больше max_bytes.
+    # Возвращает, сколько файлов удалено этим процессом.
+    entries = cache_entries(directory)
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # уже удалил другой процесс
+        else:
+            removed += 1
+        total -= size
+    return removed
+
+
+class GeometryCache:
+    # Сегменты деревьев на диске, по одному файлу на geometry_key.
+    # Повторное открытие — memmap: страницы читаются ОС по мере обращения.
+    # Размер ограничен max_bytes: LRU по mtime, как у RenderCache (попадание обновляет mtime).
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        min_segments: int = CACHE_MIN_SEGMENTS,
+        max_bytes: int = CACHE_MAX_BYTES,
+    ) -> None:
+        self.directory = directory or default_cache_dir()
+        self.min_segments = min_segments
+        self.max_bytes = max_bytes
+
+    def path_for(self, cfg: TreeConfig) -> str:
+        return os.path.join(self.directory, f"{geometry_key(cfg)}.seg")
+
+    def load(self, cfg: TreeConfig) -> Optional[TreeGeometry]:
+        path = self.path_for(cfg)
+        try:
+            geom = load_geometry(path)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # битый или старый файл — пересчитаем и перезапишем
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # вытеснил другой процесс — memmap остаётся рабочим
+        return geom
+
+    def get(self, cfg: TreeConfig, should_stop: StopCheck = _never, store: bool = True) -> TreeGeometry:
+        # store=False — только читать: промах считается, но на диск не пишется
+        # (live preview при движении ползунков иначе засыпал бы кэш промежуточными деревьями)
+        geom = self.load(cfg)
+        if geom is not None:
+            return geom
+
+        geom = generate_geometry(cfg, should_stop)
+        if store and len(geom) >= self.min_segments:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                save_geometry(geom, self.path_for(cfg))
+                evict_lru(self.directory, self.max_bytes)
+            except OSError:
+                pass  # нет места или прав — работаем без кэша
+        return geom
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from fractal.config import TreeConfig
+from fractal.geometry import TreeGeometry, generate_geometry
+from fractal.lod import LOD_MIN_PX, cull_geometry
+from fractal.palette import get_palette
+from fractal.spatial import build_grid, pen_extent_px, take_segments
+from fractal.store import load_geometry, save_geometry
+from fractal.view import Viewport, fit_viewport
+
+
+# Сторона плитки постера: полоса плиток (ширина x TILE_SIZE RGBA) — всё, что держит
+# главный процесс; процесс-рендерер держит одну плитку
+TILE_SIZE = 1024
+
+# Плитка пирамиды Deep Zoom (DZI, без перекрытия)
+DZI_TILE_SIZE = 256
+
+# Сколько плиток в работе на процесс: больше — лишняя память под готовые, но не записанные
+_TILES_IN_FLIGHT = 2
+
+
+def _sub_view(view: Viewport, x: int, y: int, w: int, h: int) -> Viewport:
+    # прямоугольник пикселей [x, x + w) x [y, y + h) исходного вида, в том же масштабе
+    s = view.scale
+    return Viewport(view.llx + x / s, view.ury - (y + h) / s, view.llx + (x + w) / s, view.ury - y / s, w, h)
+
+
+def _scaled_view(view: Viewport, factor: int) -> Viewport:
+    # тот же мир, уменьшенный в factor раз (уровень пирамиды); левый верхний угол на месте
+    w = max(1, math.ceil(view.width / factor))
+    h = max(1, math.ceil(view.height / factor))
+    s = view.scale / factor
+    return Viewport(view.llx, view.ury - h / s, view.llx + w / s, view.ury, w, h)
+
+
+def _tile_grid(view: Viewport, tile: int) -> List[Tuple[int, int, Viewport]]:
+    # (столбец, строка, вид плитки) построчно сверху вниз
+    tiles = []
+    for row in range(math.ceil(view.height / tile)):
+        for col in range(math.ceil(view.width / tile)):
+            x, y = col * tile, row * tile
+            w, h = min(tile, view.width - x), min(tile, view.height - y)
+            tiles.append((col, row, _sub_view(view, x, y, w, h)))
+    return tiles
+
+
+def _route(geom: TreeGeometry, tiles: List[Tuple[int, int, Viewport]], stroke_scale: float) -> List[np.ndarray]:
+    # Номера сегментов, которые задевают плитку: рамка сегмента, расширенная на перо или
+    # квадраты stamp() (они в пикселях) и пиксель сглаживания. Порядок номеров — исходный,
+    # так что наложение внутри плитки такое же, как при рендере целиком.
+    grid = build_grid(geom)
+    pad_px = pen_extent_px(geom) * stroke_scale + 2.0
+    routed = []
+    for _, _, v in tiles:
+        pad = pad_px / v.scale
+        routed.append(grid.query(v.llx - pad, v.lly - pad, v.urx + pad, v.ury + pad))
+    return routed
+
+
+# ---------------- процесс-рендерер ----------------
+
+# геометрия уровня, открытая через memmap, — одна на процесс и файл
+_OPENED: Dict[str, TreeGeometry] = {}
+
+
+def _open(seg_path: str) -> TreeGeometry:
+    geom = _OPENED.get(seg_path)
+    if geom is None:
+        geom = _OPENED[seg_path] = load_geometry(seg_path)
+    return geom
+
+
+def _render_tile(seg_path: str, idx: np.ndarray, palette_name: str, view: Viewport, stroke_scale: float) -> np.ndarray:
+    from fractal.raster import render_rgba
+
+    sub = take_segments(_open(seg_path), idx)
+    return render_rgba(sub, get_palette(palette_name), view.width, view.height, view=view, stroke_scale=stroke_scale)
+
+
+def _write_tile(
+    seg_path: str, idx: np.ndarray, palette_name: str, view: Viewport, stroke_scale: float, path: str
+) -> str:
+    from fractal.raster import write_png
+
+    write_png(path, _render_tile(seg_path, idx, palette_name, view, stroke_scale))
+    return path
+
+
+def _map_ordered(fn: Callable[..., Any], tasks: Iterable[tuple], workers: int) -> Iterator[Any]:
+    # как pool.map, но в работе не больше workers * _TILES_IN_FLIGHT задач: готовые плитки
+    # не копятся в памяти, пока ждём первую по порядку
+    if workers <= 1:
+        for args in tasks:
+            yield fn(*args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for args in tasks:
+            pending.append(pool.submit(fn, *args))
+            if len(pending) >= workers * _TILES_IN_FLIGHT:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# ---------------- один большой PNG ----------------
+
+def render_poster(
+    cfg: TreeConfig,
+    path: str,
+    width: int,
+    height: int,
+    tile: int = TILE_SIZE,
+    workers: Optional[int] = None,
+    margin: float = 30.0,
+    stroke_scale: float = 1.0,
+    progress: Callable[[str], None] = print,
+) -> None:
+    # Плитки рендерятся в процессах и по полосам сразу уходят в PNG-поток. Каждая плитка
+    # получает только свои сегменты, и картинка совпадает с render_png целиком.
+    from fractal.raster import PngStream
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    geom = generate_geometry(cfg)
+    view = fit_viewport(geom.bbox, width, height, margin=margin)
+    tiles = _tile_grid(view, tile)
+    routed = _route(geom, tiles, stroke_scale)
+    n_cols = math.ceil(width / tile)
+
+    started = time.perf_counter()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with tempfile.TemporaryDirectory() as tmp:
+        seg_path = os.path.join(tmp, "tree.seg")
+        save_geometry(geom, seg_path)
+        del geom  # дальше сегменты читаются из файла через memmap
+
+        tasks = ((seg_path, idx, cfg.palette_name, v, stroke_scale) for (_, _, v), idx in zip(tiles, routed))
+        try:
+            with open(tmp_path, "wb") as f:
+                png = PngStream(f, width, height)
+                band: List[np.ndarray] = []
+                for i, rgba in enumerate(_map_ordered(_render_tile, tasks, workers)):
+                    band.append(rgba)
+                    if len(band) == n_cols:
+                        png.write_rows(np.concatenate(band, axis=1))
+                        band = []
+                        row = (i + 1) // n_cols
+                        progress(f"[{row}/{math.ceil(height / tile)}] tile rows")
+                png.close()
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    progress(f"{width}x{height} in {time.perf_counter() - started:.1f}s ({len(tiles)} tiles, {workers} workers)")
+
+
+# ---------------- пирамида Deep Zoom ----------------
+
+def render_pyramid(
+    cfg: TreeConfig,
+    out_dir: str,
+    width: int,
+    height: int,
+    name: str = "tree",
+    tile: int = DZI_TILE_SIZE,
+    workers: Optional[int] = None,
+    margin: float = 30.0,
+    stroke_scale: float = 1.0,
+    lod_px: float = LOD_MIN_PX,
+    progress: Callable[[str], None] = print,
+) -> str:
+    # Пирамида DZI: out_dir/name.dzi и out_dir/name_files/<уровень>/<столбец>_<строка>.png.
+    # Верхний уровень — полный размер, каждый ниже вдвое меньше. Нижние уровни рендерятся
+    # прямо из геометрии, а не уменьшением плиток: перо и квадраты уменьшаются вместе
+    # с масштабом, а поддеревья мельче lod_px пикселей сворачиваются LOD (0 — без LOD).
+    workers = max(1, workers or os.cpu_count() or 1)
+    geom = generate_geometry(cfg)
+    view = fit_viewport(geom.bbox, width, height, margin=margin)
+    max_level = math.ceil(math.log2(max(width, height, 2)))
+    files = os.path.join(out_dir, f"{name}_files")
+
+    started = time.perf_counter()
+    count = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        tasks: List[tuple] = []
+        for level in range(max_level, -1, -1):
+            factor = 1 << (max_level - level)
+            level_view = _scaled_view(view, factor)
+            level_geom = geom if factor == 1 else cull_geometry(geom, level_view.scale, lod_px).geometry
+            seg_path = os.path.join(tmp, f"level_{level}.seg")
+            save_geometry(level_geom, seg_path)
+
+            level_dir = os.path.join(files, str(level))
+            os.makedirs(level_dir, exist_ok=True)
+            tiles = _tile_grid(level_view, tile)
+            for (col, row, v), idx in zip(tiles, _route(level_geom, tiles, stroke_scale / factor)):
+                path = os.path.join(level_dir, f"{col}_{row}.png")
+                tasks.append((seg_path, idx, cfg.palette_name, v, stroke_scale / factor, path))
+        del geom
+
+        for _ in _map_ordered(_write_tile, tasks, workers):
+            count += 1
+            if count % 100 == 0:
+                progress(f"[{count}/{len(tasks)}] tiles")
+
+    dzi = os.path.join(out_dir, f"{name}.dzi")
+    with open(dzi, "w", encoding="utf-8") as f:
+        f.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="png" Overlap="0" TileSize="{tile}">\n'
+            f'  <Size Width="{width}" Height="{height}"/>\n'
+            "</Image>\n"
+        )
+    progress(f"{max_level + 1} levels, {count} tiles in {time.perf_counter() - started:.1f}s -> {dzi}")
+    return dzi
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("fields", nargs="*", metavar="FIELD=VALUE", help="TreeConfig fields, e.g. depth=16 seed=3")
+    parser.add_argument("-o", "--out", default="poster.png", help="PNG path, or directory with --pyramid")
+    parser.add_argument("--width", type=int, default=8192)
+    parser.add_argument("--height", type=int, default=8192)
+    parser.add_argument("--tile", type=int, default=None, help=f"tile side, default {TILE_SIZE} ({DZI_TILE_SIZE} for --pyramid)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="default: number of cores")
+    parser.add_argument("--pyramid", action="store_true", help="write a Deep Zoom (DZI) tile pyramid instead of one PNG")
+    parser.add_argument(
+        "--lod-px", type=float, default=LOD_MIN_PX,
+        help=f"pyramid levels below full size: LOD threshold, px (default {LOD_MIN_PX:g}, 0 = off)",
+    )
+
+
+def main(args: argparse.Namespace) -> int:
+    from fractal.batch import config_from_fields
+
+    try:
+        cfg = config_from_fields(args.fields)
+    except (ValueError, TypeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    if args.pyramid:
+        render_pyramid(
+            cfg, args.out, args.width, args.height, tile=args.tile or DZI_TILE_SIZE, workers=args.workers, lod_px=args.lod_px
+        )
+    else:
+        render_poster(cfg, args.out, args.width, args.height, tile=args.tile or TILE_SIZE, workers=args.workers)
+    return 0
@@ -1,165 +1,106 @@
 from __future__ import annotations
 
-import math
 import random
-import turtle
-from dataclasses import dataclass
-from typing import Tuple
+from typing import TYPE_CHECKING
 
+from fractal.bounds import bbox_bound, exact_bbox
 from fractal.config import TreeConfig
+from fractal.geometry import BBox, _clamp, generate_geometry
 from fractal.palette import get_palette
+from fractal.profiling import NULL_PROFILER, Profiler
+from fractal.rng import RNG_HASHED, HashedRandom
 
+if TYPE_CHECKING:
+    # turtle тянет tkinter: для bbox и экспорта он не нужен, а в контейнерах без Tk его нет
+    import turtle
 
-def _clamp(x: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, x))
 
-
-@dataclass
-class BBox:
-    minx: float
-    miny: float
-    maxx: float
-    maxy: float
-
-    def expand(self, x: float, y: float) -> None:
-        self.minx = min(self.minx, x)
-        self.miny = min(self.miny, y)
-        self.maxx = max(self.maxx, x)
-        self.maxy = max(self.maxy, y)
-
-    def pad(self, p: float) -> "BBox":
-        return BBox(self.minx - p, self.miny - p, self.maxx + p, self.maxy + p)
-
-    @property
-    def w(self) -> float:
-        return max(1e-9, self.maxx - self.minx)
-
-    @property
-    def h(self) -> float:
-        return max(1e-9, self.maxy - self.miny)
-
-
-def estimate_tree_bbox(cfg: TreeConfig) -> BBox:
-    rnd = random.Random(cfg.seed)
-
-    # старт: (0,0), смотрим вверх (90°)
-    x, y = 0.0, 0.0
-    heading = 90.0
-
-    bbox = BBox(x, y, x, y)
-
-    def jitter_params(length: float) -> Tuple[float, float, float]:
-        jitter_angle = cfg.randomness * 10.0  # градусов
-        jitter_len = cfg.randomness * 0.15    # доля длины
-        actual_len = length * (1.0 + rnd.uniform(-jitter_len, jitter_len))
-        actual_len = max(1.0, actual_len)
-        left = cfg.angle_deg + rnd.uniform(-jitter_angle, jitter_angle)
-        right = cfg.angle_deg + rnd.uniform(-jitter_angle, jitter_angle)
-        return actual_len, left, right
-
-    def branch(depth: int, length: float, thickness: float, x: float, y: float, heading: float) -> Tuple[float, float]:
-        # Для square режима учитываем “размер квадрата” вокруг точки stamp.
-        # Базовый размер shape “square” у turtle = 20px. Мы масштабируем shapesize по thickness.
-        # half_side ≈ 10 * scale
-        scale = max(0.15, thickness / 10.0)
-        half_side = 10.0 * scale if cfg.draw_mode == "square" else 0.0
-
-        # обновим bbox по текущей позиции (с учетом квадрата)
-        bbox.expand(x - half_side, y - half_side)
-        bbox.expand(x + half_side, y + half_side)
-
-        if depth <= 0 or length < 2:
-            # лист: forward/backward в линии или stamp в квадратах.
-            # Для bbox достаточно учесть конечную точку forward.
-            lx = x + math.cos(math.radians(heading)) * max(1.0, length)
-            ly = y + math.sin(math.radians(heading)) * max(1.0, length)
-            bbox.expand(lx - half_side, ly - half_side)
-            bbox.expand(lx + half_side, ly + half_side)
-            return x, y  # возвращаемся назад
-
-        actual_len, left, right = jitter_params(length)
-
-        nx = x + math.cos(math.radians(heading)) * actual_len
-        ny = y + math.sin(math.radians(heading)) * actual_len
-
-        # bbox конечной точки (и квадратов по пути мы здесь не моделируем детально,
-        # но конечная точка + старт обычно достаточно; запас дадим padding’ом в UI)
-        bbox.expand(nx - half_side, ny - half_side)
-        bbox.expand(nx + half_side, ny + half_side)
-
-        next_len = actual_len * cfg.shrink
-        next_th = _clamp(thickness * cfg.thickness_decay, 0.5, 50)
-
-        # левая
-        branch(depth - 1, next_len, next_th, nx, ny, heading + left)
-        # правая
-        branch(depth - 1, next_len, next_th, nx, ny, heading - right)
-
-        return x, y
-
-    branch(cfg.depth, cfg.trunk_length, cfg.thickness, x, y, heading)
-    return bbox
+def estimate_tree_bbox(cfg: TreeConfig, exact: bool = True) -> BBox:
+    # bbox той же геометрии, что рисует renderer (тот же порядок RNG, квадраты и толщина линий).
+    # При randomness == 0 — по формуле, без сегментов. Для случайного дерева exact=False даёт
+    # сразу рамку, заведомо содержащую дерево при любом seed, вместо генерации геометрии.
+    box = exact_bbox(cfg)
+    if box is not None:
+        return box
+    if not exact:
+        return bbox_bound(cfg)
+    return generate_geometry(cfg).bbox
 
 
 class FractalTreeRenderer:
 
-    def __init__(self, t: turtle.Turtle) -> None:
+    def __init__(self, t: turtle.Turtle, profiler: Profiler = NULL_PROFILER) -> None:
         self.t = t
+        # профилирование по фазам; NULL_PROFILER — выключено
+        self.profiler = profiler
+        self.segments = 0
+        self.stamps = 0
 
     def draw(self, cfg: TreeConfig) -> None:
-        palette = get_palette(cfg.palette_name)
+        prof = self.profiler
 
-        try:
-            scr = self.t.getscreen()
-            scr.bgcolor(palette.background)
-        except Exception:
-            pass
+        with prof.phase("setup"):
+            palette = get_palette(cfg.palette_name)
 
-        rnd = random.Random(cfg.seed)
+            try:
+                scr = self.t.getscreen()
+                scr.bgcolor(palette.background)
+            except Exception:
+                pass
 
-        self.t.hideturtle()
-        self.t.speed(0)
+            rnd = random.Random(cfg.seed)
 
-        # стартовая позиция — (0,0), вверх
-        self.t.penup()
-        self.t.goto(0, 0)
-        self.t.setheading(90)
+            self.t.hideturtle()
+            self.t.speed(0)
 
-        if cfg.draw_mode == "square":
-            self.t.shape("square")
-            self.t.penup()  # stamps, без линии
-        else:
-            self.t.pendown()
+            # стартовая позиция — (0,0), вверх
+            self.t.penup()
+            self.t.goto(0, 0)
+            self.t.setheading(90)
 
-        self._branch(
-            depth=cfg.depth,
-            length=cfg.trunk_length,
-            thickness=cfg.thickness,
-            cfg=cfg,
-            rnd=rnd,
-            trunk_color=palette.trunk_color,
-        )
+            if cfg.draw_mode == "square":
+                self.t.shape("square")
+                self.t.penup()  # stamps, без линии
+            else:
+                self.t.pendown()
+
+        self.segments = 0
+        self.stamps = 0
+        with prof.phase("turtle"):
+            self._branch(
+                depth=cfg.depth,
+                length=cfg.trunk_length,
+                thickness=cfg.thickness,
+                cfg=cfg,
+                rnd=rnd,
+                trunk_color=palette.trunk_color,
+            )
+        prof.count("segments", self.segments)
+        if cfg.draw_mode == "square":
+            prof.count("stamps", self.stamps)
 
-    def _stamp_square(self, thickness: float) -> None:
+    def _square_size(self, thickness: float) -> None:
         # turtle square базовый 20x20; масштабируем под толщину
         scale = max(0.15, thickness / 10.0)
         self.t.shapesize(stretch_wid=scale, stretch_len=scale, outline=1)
 
-        # штамп в текущей точке
-        self.t.stamp()
-
     def _forward_with_squares(self, dist: float, thickness: float) -> None:
+        # размер квадрата один на всю ветку — shapesize один раз, дальше только stamp()
         step = max(4.0, thickness * 0.9)
         remaining = dist
+        self._square_size(thickness)
 
         # stamp в начале
-        self._stamp_square(thickness)
+        self.t.stamp()
+        stamps = 1
 
         while remaining > 0:
             d = min(step, remaining)
             self.t.forward(d)
-            self._stamp_square(thickness)
+            self.t.stamp()
+            stamps += 1
             remaining -= d
+        self.stamps += stamps
 
     def _branch(
         self,
@@ -169,8 +110,14 @@ class FractalTreeRenderer:
         cfg: TreeConfig,
         rnd: random.Random,
         trunk_color: str,
+        node: int = 1,
     ) -> None:
         palette = get_palette(cfg.palette_name)
+        self.segments += 1
+
+        # node — путь от ствола (ствол 1, дети 2n и 2n + 1), нужен счётному RNG
+        if cfg.rng == RNG_HASHED:
+            rnd = HashedRandom(cfg.seed, node)
 
         # случайность
         jitter_angle = cfg.randomness * 10.0
@@ -212,12 +159,12 @@ class FractalTreeRenderer:
 
         # левая ветвь
         self.t.left(left)
-        self._branch(depth - 1, next_len, next_th, cfg, rnd, trunk_color)
+        self._branch(depth - 1, next_len, next_th, cfg, rnd, trunk_color, 2 * node)
         self.t.right(left)
 
         # правая ветвь
         self.t.right(right)
-        self._branch(depth - 1, next_len, next_th, cfg, rnd, trunk_color)
+        self._branch(depth - 1, next_len, next_th, cfg, rnd, trunk_color, 2 * node + 1)
         self.t.left(right)
 
         # назад
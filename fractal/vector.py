@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+from typing import IO, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from fractal.config import TreeConfig
+from fractal.geometry import (
+    STAMP_FILL,
+    STREAM_CHUNK,
+    TreeGeometry,
+    TreeInstances,
+    color_table,
+    generate_geometry,
+    instance_tree,
+    iter_segments,
+    max_segments,
+    stamp_centers,
+    stamp_half_size,
+    stream_bbox,
+)
+from fractal.palette import Palette, get_palette
+from fractal.raster import parse_color
+from fractal.view import Viewport, fit_viewport, local_viewport
+
+
+# Сколько сегментов/квадратов форматируем и пишем за раз
+_WRITE_CHUNK = 8192
+
+# Дерево больше стольких сегментов пишется потоком (iter_segments), не собираясь в памяти
+STREAM_SEGMENTS = 1 << 20
+
+
+def _stroke_groups(geom: TreeGeometry, stroke_scale: float) -> Iterator[Tuple[np.ndarray, int, float]]:
+    # Сегменты с одинаковыми (цвет, ширина линии) — в одну группу; толстые (ствол) раньше.
+    width = np.round(np.maximum(1.0, geom.thickness.astype(np.float64)) * stroke_scale, 3)
+    order = np.lexsort((geom.color, -width))
+    w_sorted = width[order]
+    c_sorted = geom.color[order]
+    bounds = np.flatnonzero((np.diff(w_sorted) != 0) | (np.diff(c_sorted) != 0)) + 1
+    for idx in np.split(order, bounds):
+        yield idx, int(geom.color[idx[0]]), float(width[idx[0]])
+
+
+def _level_groups(geom: TreeGeometry) -> Iterator[Tuple[np.ndarray, int]]:
+    # Для квадратов важен порядок наложения: уровни по порядку, внутри уровня — по цвету.
+    order = np.lexsort((geom.color, geom.depth))
+    key = geom.depth[order].astype(np.int64) * 256 + geom.color[order]
+    for idx in np.split(order, np.flatnonzero(np.diff(key)) + 1):
+        yield idx, int(geom.color[idx[0]])
+
+
+def _stamps_by_segment(geom: TreeGeometry) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    seg, sx, sy = stamp_centers(geom)
+    # stamp_centers идёт по сегментам подряд: начало блока каждого сегмента
+    starts = np.searchsorted(seg, np.arange(len(geom) + 1))
+    return seg, sx, sy, starts
+
+
+def _fmt(values: np.ndarray) -> List[str]:
+    return ["%.2f" % v for v in values.tolist()]
+
+
+# ---------------- SVG ----------------
+
+def write_svg(
+    geom: TreeGeometry,
+    palette: Palette,
+    out: IO[str],
+    width: int = 1024,
+    height: int = 1024,
+    margin: float = 30.0,
+    stroke_scale: float = 1.0,
+) -> None:
+    view = fit_viewport(geom.bbox, width, height, margin=margin)
+    colors = color_table(palette)
+
+    _svg_header(palette, out, width, height)
+    if geom.draw_mode == "square":
+        _svg_squares(geom, colors, view, out, stroke_scale)
+    else:
+        _svg_lines(geom, colors, view, out, stroke_scale)
+    out.write("</svg>\n")
+
+
+def _svg_header(palette: Palette, out: IO[str], width: int, height: int) -> None:
+    out.write(
+        f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+        f'width="{width}" height="{height}" viewBox="0 0 {width} {height}">\n'
+    )
+    out.write(f'<rect width="100%" height="100%" fill="{palette.background}"/>\n')
+
+
+def _svg_lines(
+    geom: TreeGeometry,
+    colors: List[str],
+    view: Viewport,
+    out: IO[str],
+    stroke_scale: float,
+    prefix: str = "",
+) -> None:
+    px0, py0 = view.to_pixels(geom.x0.astype(np.float64), geom.y0.astype(np.float64))
+    px1, py1 = view.to_pixels(geom.x1.astype(np.float64), geom.y1.astype(np.float64))
+
+    out.write('<g fill="none" stroke-linecap="round">\n')
+    for idx, color_idx, w in _stroke_groups(geom, stroke_scale):
+        out.write(f'<path stroke="{colors[color_idx]}" stroke-width="{w:g}" d="')
+        for start in range(0, idx.size, _WRITE_CHUNK):
+            part = idx[start:start + _WRITE_CHUNK]
+            a, b, c, d = _fmt(px0[part]), _fmt(py0[part]), _fmt(px1[part]), _fmt(py1[part])
+            out.write("".join(f"M{a[i]} {b[i]}L{c[i]} {d[i]}" for i in range(part.size)))
+        out.write('"/>\n')
+    out.write("</g>\n")
+
+
+def _svg_squares(
+    geom: TreeGeometry,
+    colors: List[str],
+    view: Viewport,
+    out: IO[str],
+    stroke_scale: float,
+    prefix: str = "",
+) -> None:
+    seg, sx, sy, starts = _stamps_by_segment(geom)
+    px, py = view.to_pixels(sx, sy)
+    # курс ветки; в SVG ось y вниз, поэтому угол с минусом
+    angle = -np.degrees(np.arctan2(geom.y1 - geom.y0, geom.x1 - geom.x0))
+
+    # один общий квадрат на каждый встречающийся размер
+    half = np.round(stamp_half_size(geom.thickness) * stroke_scale, 3)
+    sizes = {h: i for i, h in enumerate(np.unique(half).tolist())}
+    out.write("<defs>\n")
+    for h, i in sizes.items():
+        out.write(f'<rect id="{prefix}s{i}" x="{-h:g}" y="{-h:g}" width="{2 * h:g}" height="{2 * h:g}"/>\n')
+    out.write("</defs>\n")
+
+    for idx, color_idx in _level_groups(geom):
+        out.write(f'<g fill="{STAMP_FILL}" stroke="{colors[color_idx]}" stroke-width="1">\n')
+        for start in range(0, idx.size, _WRITE_CHUNK):
+            lines = []
+            for i in idx[start:start + _WRITE_CHUNK].tolist():
+                ref = sizes[float(half[i])]
+                rot = "%.2f" % angle[i]
+                for k in range(starts[i], starts[i + 1]):
+                    lines.append(
+                        f'<use xlink:href="#{prefix}s{ref}" transform="translate({px[k]:.2f} {py[k]:.2f}) rotate({rot})"/>\n'
+                    )
+            out.write("".join(lines))
+        out.write("</g>\n")
+
+
+def write_svg_instanced(
+    inst: TreeInstances,
+    palette: Palette,
+    out: IO[str],
+    width: int = 1024,
+    height: int = 1024,
+    margin: float = 30.0,
+    stroke_scale: float = 1.0,
+) -> None:
+    # Детерминированное дерево: каноническое поддерево пишется в <defs> один раз на каждый
+    # встречающийся набор цветов листьев, экземпляры — <use> с translate/rotate.
+    view = fit_viewport(inst.bbox, width, height, margin=margin)
+    colors = color_table(palette)
+    local = local_viewport(view.scale)
+
+    _svg_header(palette, out, width, height)
+
+    write_part = _svg_squares if inst.base.draw_mode == "square" else _svg_lines
+    patterns, which = np.unique(inst.leaf_colors, axis=0, return_inverse=True)
+    n_leaves = inst.leaf_colors.shape[1]
+
+    out.write("<defs>\n")
+    for p, pattern in enumerate(patterns):
+        base = inst.base
+        color = base.color.copy()
+        color[color.size - n_leaves:] = pattern
+        part = TreeGeometry(
+            base.x0, base.y0, base.x1, base.y1, base.thickness, color, base.depth, base.bbox, base.draw_mode
+        )
+        out.write(f'<g id="p{p}">\n')
+        write_part(part, colors, local, out, stroke_scale, prefix=f"p{p}")
+        out.write("</g>\n")
+    out.write("</defs>\n")
+
+    if inst.top is not None:
+        write_part(inst.top, colors, view, out, stroke_scale, prefix="top")
+
+    px, py = view.to_pixels(inst.x, inst.y)
+    refs = which.ravel().tolist()
+    for start in range(0, px.size, _WRITE_CHUNK):
+        out.write("".join(
+            f'<use xlink:href="#p{refs[i]}" transform="translate({px[i]:.2f} {py[i]:.2f}) rotate({-inst.heading[i]:.2f})"/>\n'
+            for i in range(start, min(px.size, start + _WRITE_CHUNK))
+        ))
+
+    out.write("</svg>\n")
+
+
+# ---------------- EPS ----------------
+
+_EPS_PROCS = """/L { moveto lineto } bind def
+/SQ { gsave 4 -2 roll translate exch rotate
+      dup neg dup 2 index 2 mul dup 4 copy
+      gsave 0 setgray rectfill grestore rectstroke pop grestore } bind def
+"""
+
+
+def _ps_rgb(color: str) -> str:
+    return " ".join("%.4f" % (v / 255.0) for v in parse_color(color))
+
+
+def write_eps(
+    geom: TreeGeometry,
+    palette: Palette,
+    out: IO[str],
+    width: int = 1024,
+    height: int = 1024,
+    margin: float = 30.0,
+    stroke_scale: float = 1.0,
+) -> None:
+    view = fit_viewport(geom.bbox, width, height, margin=margin)
+    colors = color_table(palette)
+
+    _eps_header(palette, out, width, height)
+    _eps_part(geom, colors, view, out, stroke_scale)
+    out.write("showpage\n%%EOF\n")
+
+
+def _eps_header(palette: Palette, out: IO[str], width: int, height: int) -> None:
+    out.write("%!PS-Adobe-3.0 EPSF-3.0\n")
+    out.write(f"%%BoundingBox: 0 0 {width} {height}\n")
+    out.write("%%EndComments\n")
+    out.write(_EPS_PROCS)
+    out.write(f"{_ps_rgb(palette.background)} setrgbcolor 0 0 {width} {height} rectfill\n")
+
+
+def _eps_part(
+    geom: TreeGeometry,
+    colors: List[str],
+    view: Viewport,
+    out: IO[str],
+    stroke_scale: float,
+) -> None:
+    height = view.height
+    if geom.draw_mode == "square":
+        seg, sx, sy, starts = _stamps_by_segment(geom)
+        px, py = view.to_pixels(sx, sy)
+        py = height - py
+        angle = np.degrees(np.arctan2(geom.y1 - geom.y0, geom.x1 - geom.x0))
+        half = stamp_half_size(geom.thickness) * stroke_scale
+
+        out.write("1 setlinewidth\n")
+        for idx, color_idx in _level_groups(geom):
+            out.write(f"{_ps_rgb(colors[color_idx])} setrgbcolor\n")
+            for start in range(0, idx.size, _WRITE_CHUNK):
+                lines = []
+                for i in idx[start:start + _WRITE_CHUNK].tolist():
+                    tail = "%.2f %.2f SQ\n" % (angle[i], half[i])
+                    for k in range(starts[i], starts[i + 1]):
+                        lines.append("%.2f %.2f %s" % (px[k], py[k], tail))
+                out.write("".join(lines))
+    else:
+        px0, py0 = view.to_pixels(geom.x0.astype(np.float64), geom.y0.astype(np.float64))
+        px1, py1 = view.to_pixels(geom.x1.astype(np.float64), geom.y1.astype(np.float64))
+        py0 = height - py0
+        py1 = height - py1
+
+        out.write("1 setlinecap 1 setlinejoin\n")
+        for idx, color_idx, w in _stroke_groups(geom, stroke_scale):
+            out.write(f"{_ps_rgb(colors[color_idx])} setrgbcolor {w:g} setlinewidth\n")
+            # stroke на каждую порцию: у старых интерпретаторов ограничен размер пути
+            for start in range(0, idx.size, _WRITE_CHUNK):
+                part = idx[start:start + _WRITE_CHUNK]
+                a, b, c, d = _fmt(px0[part]), _fmt(py0[part]), _fmt(px1[part]), _fmt(py1[part])
+                out.write("newpath\n")
+                out.write("".join(f"{c[i]} {d[i]} {a[i]} {b[i]} L\n" for i in range(part.size)))
+                out.write("stroke\n")
+
+
+# ---------------- потоком ----------------
+
+def write_stream(
+    cfg: TreeConfig,
+    out: IO[str],
+    fmt: str = "svg",
+    width: int = 1024,
+    height: int = 1024,
+    margin: float = 30.0,
+    stroke_scale: float = 1.0,
+    chunk: int = STREAM_CHUNK,
+) -> None:
+    # Дерево любой глубины: bbox даёт stream_bbox() (для случайного дерева — отдельный проход
+    # iter_segments()), второй проход пишет порции в порядке рисования turtle. В памяти — одна
+    # порция, а не всё дерево.
+    palette = get_palette(cfg.palette_name)
+    colors = color_table(palette)
+    view = fit_viewport(stream_bbox(cfg, chunk), width, height, margin=margin)
+
+    if fmt == "eps":
+        _eps_header(palette, out, width, height)
+        for part in iter_segments(cfg, chunk):
+            _eps_part(part, colors, view, out, stroke_scale)
+        out.write("showpage\n%%EOF\n")
+        return
+
+    _svg_header(palette, out, width, height)
+    write_part = _svg_squares if cfg.draw_mode == "square" else _svg_lines
+    for i, part in enumerate(iter_segments(cfg, chunk)):
+        write_part(part, colors, view, out, stroke_scale, prefix=f"c{i}")
+    out.write("</svg>\n")
+
+
+def export_vector(
+    cfg: TreeConfig,
+    path: str,
+    width: int = 1024,
+    height: int = 1024,
+    margin: float = 30.0,
+    stroke_scale: float = 1.0,
+    fmt: Optional[str] = None,
+    instanced: bool = False,
+) -> None:
+    palette = get_palette(cfg.palette_name)
+    if fmt is None:
+        fmt = "eps" if path.lower().endswith((".eps", ".ps")) else "svg"
+
+    # <use> — только по запросу: до глубины ~16 файл с экземплярами больше обычного (шаблон
+    # на каждый набор цветов листьев), меньше — лишь у очень глубоких деревьев. У квадратов
+    # шаблон поддерева со всеми stamp() тяжелее, чем выигрыш от <use>.
+    use_instances = instanced and fmt == "svg" and cfg.draw_mode == "line"
+    inst = instance_tree(cfg) if use_instances else None
+    with open(path, "w", encoding="utf-8") as f:
+        if inst is not None:
+            write_svg_instanced(inst, palette, f, width, height, margin, stroke_scale)
+            return
+        if max_segments(cfg) > STREAM_SEGMENTS:
+            write_stream(cfg, f, fmt, width, height, margin, stroke_scale)
+            return
+        writer = write_eps if fmt == "eps" else write_svg
+        writer(generate_geometry(cfg), palette, f, width, height, margin, stroke_scale)
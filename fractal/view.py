@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from fractal.geometry import BBox
+
+
+@dataclass(frozen=True)
+class Viewport:
+    # Мировой прямоугольник (y вверх), растянутый на width x height пикселей (y вниз).
+    llx: float
+    lly: float
+    urx: float
+    ury: float
+    width: int
+    height: int
+
+    @property
+    def scale(self) -> float:
+        return self.width / max(1e-9, self.urx - self.llx)
+
+    def to_pixels(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        s = self.scale
+        return (x - self.llx) * s, (self.ury - y) * s
+
+    def to_world(self, px: float, py: float) -> Tuple[float, float]:
+        s = self.scale
+        return self.llx + px / s, self.ury - py / s
+
+
+def local_viewport(scale: float) -> Viewport:
+    # Масштаб без сдвига: (x, y) -> (x * scale, -y * scale). Для фрагментов в локальных
+    # координатах (SVG <symbol>), которые потом ставятся на место через transform.
+    return Viewport(0.0, -1.0 / scale, 1.0 / scale, 0.0, 1, 1)
+
+
+def fit_viewport(bbox: BBox, width: int, height: int, margin: float = 24.0) -> Viewport:
+    width = max(1, int(width))
+    height = max(1, int(height))
+    canvas_aspect = width / height
+
+    # bbox с запасом
+    padded = bbox.pad(margin)
+
+    # приводим bbox к аспекту холста: расширяем по нужной оси, чтобы не обрезало
+    bb_aspect = padded.w / padded.h
+    cx = (padded.minx + padded.maxx) / 2.0
+    cy = (padded.miny + padded.maxy) / 2.0
+
+    if bb_aspect > canvas_aspect:
+        # bbox “шире”, расширяем по высоте
+        half_h = padded.w / canvas_aspect / 2.0
+        llx, urx = padded.minx, padded.maxx
+        lly, ury = cy - half_h, cy + half_h
+    else:
+        # bbox “выше”, расширяем по ширине
+        half_w = padded.h * canvas_aspect / 2.0
+        lly, ury = padded.miny, padded.maxy
+        llx, urx = cx - half_w, cx + half_w
+
+    return Viewport(llx, lly, urx, ury, width, height)
+
+
+def zoom_viewport(view: Viewport, px: float, py: float, factor: float) -> Viewport:
+    # масштаб в factor раз; мировая точка под пикселем (px, py) остаётся на месте
+    wx, wy = view.to_world(px, py)
+    s = view.scale * factor
+    llx = wx - px / s
+    ury = wy + py / s
+    return Viewport(llx, ury - view.height / s, llx + view.width / s, ury, view.width, view.height)
+
+
+def pan_viewport(view: Viewport, dx: float, dy: float) -> Viewport:
+    # картинка сдвинута на (dx, dy) пикселей — мир сдвигается в обратную сторону
+    s = view.scale
+    return Viewport(
+        view.llx - dx / s, view.lly + dy / s, view.urx - dx / s, view.ury + dy / s, view.width, view.height
+    )
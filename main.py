@@ -1,7 +1,68 @@
-from ui.app import FractalTreeApp
+import argparse
+import importlib
+import sys
+from typing import List, Optional
 
-def main() -> None:
-    app = FractalTreeApp()
+
+# Подкоманда -> (модуль с add_arguments/main, справка). Модуль импортируется только для
+# выбранной подкоманды: запуск GUI не тянет numpy, asyncio и пулы процессов.
+COMMANDS = {
+    "batch": ("fractal.batch", "render TreeConfig records to files"),
+    "bench": ("fractal.bench", "time generation and every renderer"),
+    "serve": ("fractal.server", "serve PNG/SVG renders over HTTP on localhost"),
+    "animate": ("fractal.animation", "export growth animation frames as PNG"),
+    "poster": ("fractal.tiles", "tiled render of a very large PNG or a Deep Zoom pyramid"),
+}
+
+# глобальные опции со значением: их значение — не имя подкоманды
+_VALUE_OPTIONS = ("--profile-log", "--lod-px")
+
+
+def _command_of(argv: List[str]) -> Optional[str]:
+    # первый позиционный аргумент (как его увидит argparse) или None
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg in _VALUE_OPTIONS:
+            skip = True
+        elif not arg.startswith("-"):
+            return arg if arg in COMMANDS else None
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Fractal tree")
+    parser.add_argument("--profile-log", metavar="PATH", help="append a JSON line with phase timings per Draw")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the on-disk geometry and render caches")
+    parser.add_argument(
+        "--lod-px", type=float, default=1.0, metavar="PX",
+        help="initial canvas LOD threshold: subtrees smaller than PX pixels become one segment (0 = off)",
+    )
+    sub = parser.add_subparsers(dest="command")
+
+    command = _command_of(argv)
+    module = None
+    for name, (module_name, help_text) in COMMANDS.items():
+        sub_parser = sub.add_parser(name, help=help_text)
+        if name == command:
+            module = importlib.import_module(module_name)
+            module.add_arguments(sub_parser)
+
+    args = parser.parse_args(argv)
+
+    if module is not None:
+        sys.exit(module.main(args))
+
+    # GUI импортируем только здесь: подкоманды работают без Tk
+    from fractal.render_cache import RenderCache
+    from fractal.store import GeometryCache
+    from ui.app import FractalTreeApp
+
+    caches = {} if args.no_cache else {"geometry_cache": GeometryCache(), "render_cache": RenderCache()}
+    app = FractalTreeApp(profile_log=args.profile_log, lod_px=args.lod_px, **caches)
     app.run()
 
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from fractal.batch import MAX_BATCH_DEPTH, load_jobs
+from fractal.config import TreeConfig
+
+
+def _jsonl(tmp_path, *records) -> str:
+    path = tmp_path / "jobs.jsonl"
+    path.write_text("\n".join(r if isinstance(r, str) else json.dumps(r) for r in records) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_bad_records_are_reported_with_line_numbers(tmp_path):
+    path = _jsonl(
+        tmp_path,
+        {"name": "ok", "depth": 8, "seed": 3},
+        {"depth": 40},
+        "# комментарий",
+        {"draw_mode": "foo"},
+        {"shrink": 0.999},
+        {"palette_name": "Nope"},
+        {"depth": 8.5},
+        "{not json",
+        {"name": "also-ok", "depth": "9.0", "randomness": "0.5"},
+    )
+    errors = []
+    jobs = load_jobs(path, errors)
+
+    assert jobs == [("ok", TreeConfig(depth=8, seed=3)), ("also-ok", TreeConfig(depth=9, randomness=0.5))]
+    lines = [int(e.split(":")[1]) for e in errors]
+    assert lines == [2, 4, 5, 6, 7, 8]
+    assert f"depth must be in 0..{MAX_BATCH_DEPTH}" in errors[0]
+    assert "draw_mode must be one of" in errors[1]
+    assert "shrink must be in" in errors[2]
+
+
+def test_csv_rows_are_validated(tmp_path):
+    path = tmp_path / "jobs.csv"
+    path.write_text("name,depth,thickness\na,6,3\nb,6,-5\n", encoding="utf-8")
+    errors = []
+    jobs = load_jobs(str(path), errors)
+    assert [name for name, _ in jobs] == ["a"]
+    assert len(errors) == 1 and errors[0].startswith(f"{path}:3: thickness must be in")
+
+
+def test_first_bad_record_raises_without_error_list(tmp_path):
+    with pytest.raises(ValueError, match=r"jobs.jsonl:1: rng must be one of"):
+        load_jobs(_jsonl(tmp_path, {"rng": "mt"}))
@@ -0,0 +1,69 @@
+from dataclasses import replace
+
+import pytest
+
+from fractal.bounds import bbox_bound, exact_bbox
+from fractal.config import RNG_HASHED, TreeConfig
+from fractal.geometry import generate_geometry
+from fractal.tree import estimate_tree_bbox
+
+
+def _close(a, b, tol=1e-3):
+    return all(abs(x - y) <= tol * max(1.0, abs(y)) for x, y in zip(
+        (a.minx, a.miny, a.maxx, a.maxy), (b.minx, b.miny, b.maxx, b.maxy)
+    ))
+
+
+def _contains(outer, inner, tol=1e-6):
+    return (
+        outer.minx <= inner.minx + tol and outer.miny <= inner.miny + tol
+        and outer.maxx >= inner.maxx - tol and outer.maxy >= inner.maxy - tol
+    )
+
+
+@pytest.mark.parametrize("draw_mode", ["line", "square"])
+@pytest.mark.parametrize(
+    "cfg",
+    [
+        TreeConfig(depth=9),
+        TreeConfig(depth=11, angle_deg=47.0, shrink=0.8, thickness=14.0),
+        TreeConfig(depth=10, angle_deg=95.0, shrink=0.9, trunk_length=80.0),
+        TreeConfig(depth=7, angle_deg=5.0, thickness=40.0, thickness_decay=0.95),
+    ],
+)
+def test_exact_bbox_matches_segments(cfg, draw_mode):
+    cfg = replace(cfg, draw_mode=draw_mode)
+    box = exact_bbox(cfg)
+    assert box is not None
+    assert _close(box, generate_geometry(cfg).bbox)
+    assert estimate_tree_bbox(cfg) == box
+
+
+def test_exact_bbox_is_only_for_deterministic_trees():
+    assert exact_bbox(TreeConfig(depth=8, randomness=0.3)) is None
+    # ветки короче 2 — листья раньше depth, но при randomness == 0 на одном уровне для всех
+    cfg = TreeConfig(depth=14, trunk_length=40, shrink=0.7)
+    assert _close(exact_bbox(cfg), generate_geometry(cfg).bbox)
+
+
+@pytest.mark.parametrize("draw_mode", ["line", "square"])
+@pytest.mark.parametrize("rng", ["sequential", RNG_HASHED])
+@pytest.mark.parametrize(
+    "base",
+    [
+        TreeConfig(depth=9, randomness=0.9, angle_deg=30.0, shrink=0.78),
+        TreeConfig(depth=12, randomness=0.8, trunk_length=40, shrink=0.7),  # листья на разной глубине
+    ],
+)
+def test_bbox_bound_contains_every_seed(base, draw_mode, rng):
+    cfg = replace(base, draw_mode=draw_mode, rng=rng)
+    bound = bbox_bound(cfg)
+    assert estimate_tree_bbox(cfg, exact=False) == bound
+    for seed in range(25):
+        box = generate_geometry(replace(cfg, seed=seed)).bbox
+        assert _contains(bound, box), (seed, bound, box)
+
+
+def test_bbox_bound_is_exact_without_randomness():
+    cfg = TreeConfig(depth=10, angle_deg=33.0)
+    assert bbox_bound(cfg) == exact_bbox(cfg)
@@ -0,0 +1,138 @@
+import math
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from fractal.config import RNG_HASHED, TreeConfig
+from fractal.geometry import _uniform_height, color_table, generate_geometry
+from fractal.palette import get_palette
+from fractal.parallel import generate_geometry_parallel
+from fractal.tree import FractalTreeRenderer
+
+
+class _RecordingTurtle:
+    # Минимальный turtle для FractalTreeRenderer в режиме line: пишет отрезки, которые
+    # прошло перо вперёд. Ветка — forward, её дети, backward, поэтому глубина сегмента —
+    # число ещё не возвращённых forward.
+    def __init__(self) -> None:
+        self.x = self.y = 0.0
+        self.heading = 0.0
+        self.color = ""
+        self.width = 1.0
+        self.open = 0
+        self.segments = []
+
+    def forward(self, d: float) -> None:
+        rad = math.radians(self.heading)
+        x1, y1 = self.x + d * math.cos(rad), self.y + d * math.sin(rad)
+        self.segments.append((self.open, self.x, self.y, x1, y1, self.width, self.color))
+        self.open += 1
+        self.x, self.y = x1, y1
+
+    def backward(self, d: float) -> None:
+        rad = math.radians(self.heading)
+        self.x, self.y = self.x - d * math.cos(rad), self.y - d * math.sin(rad)
+        self.open -= 1
+
+    def left(self, a: float) -> None:
+        self.heading += a
+
+    def right(self, a: float) -> None:
+        self.heading -= a
+
+    def setheading(self, a: float) -> None:
+        self.heading = a
+
+    def goto(self, x: float, y: float) -> None:
+        self.x, self.y = x, y
+
+    def pencolor(self, color: str) -> None:
+        self.color = color
+
+    def pensize(self, width: float) -> None:
+        self.width = width
+
+    def getscreen(self):
+        raise RuntimeError("no screen")
+
+    def hideturtle(self) -> None:
+        pass
+
+    def speed(self, _: int) -> None:
+        pass
+
+    def penup(self) -> None:
+        pass
+
+    def pendown(self) -> None:
+        pass
+
+
+def _turtle_segments(cfg: TreeConfig):
+    t = _RecordingTurtle()
+    FractalTreeRenderer(t).draw(cfg)
+    table = color_table(get_palette(cfg.palette_name))
+    # прямой обход -> по уровням, внутри уровня слева направо (как TreeGeometry)
+    rows = sorted(t.segments, key=lambda s: s[0])
+    cols = list(zip(*rows))
+    return (
+        np.array(cols[0]),
+        np.array(cols[1:5]),
+        np.array(cols[5]),
+        np.array([table.index(c) for c in cols[6]]),
+    )
+
+
+CONFIGS = [
+    TreeConfig(depth=8),                                                     # randomness 0: экземпляры поддеревьев
+    TreeConfig(depth=8, randomness=0.6, seed=3, palette_name="Neon"),       # полное дерево по уровням
+    TreeConfig(depth=12, trunk_length=40, shrink=0.7, randomness=0.8, seed=11),  # листья на разной глубине
+    TreeConfig(depth=8, randomness=0.5, seed=5, rng=RNG_HASHED),            # счётный RNG
+]
+
+
+@pytest.mark.parametrize("cfg", CONFIGS)
+def test_generate_geometry_matches_turtle_traversal(cfg):
+    depth, coords, width, color = _turtle_segments(cfg)
+    geom = generate_geometry(cfg)
+
+    assert len(geom) == depth.size
+    np.testing.assert_array_equal(geom.depth, depth)
+    np.testing.assert_array_equal(geom.color, color)
+    # в геометрии толщина до max(1, ...): его применяют рендеры, как turtle в pensize
+    np.testing.assert_allclose(np.maximum(1.0, geom.thickness), width, rtol=1e-6)
+    got = np.stack([geom.x0, geom.y0, geom.x1, geom.y1])
+    np.testing.assert_allclose(got, coords, rtol=1e-5, atol=1e-3)
+
+
+def test_configs_cover_generation_paths():
+    # без этого набор выше мог бы незаметно перестать проверять часть путей generate_geometry
+    assert _uniform_height(CONFIGS[0]) is not None and CONFIGS[0].randomness == 0
+    assert _uniform_height(CONFIGS[1]) is not None and CONFIGS[1].randomness > 0
+    assert _uniform_height(CONFIGS[2]) is None
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_hashed_parallel_matches_serial(workers):
+    cfg = TreeConfig(depth=10, randomness=0.7, seed=42, rng=RNG_HASHED)
+    serial = generate_geometry(cfg)
+    parallel = generate_geometry_parallel(cfg, workers=workers, split_depth=3)
+    for name in ("x0", "y0", "x1", "y1", "thickness", "color", "depth"):
+        np.testing.assert_array_equal(getattr(parallel, name), getattr(serial, name), err_msg=name)
+    assert parallel.bbox == serial.bbox
+
+
+def test_hashed_subtree_does_not_depend_on_siblings():
+    # у счётного RNG числа ветки — функция (seed, путь): другая глубина дерева не меняет
+    # общие верхние уровни
+    cfg = TreeConfig(depth=9, randomness=0.7, seed=8, rng=RNG_HASHED)
+    deep = generate_geometry(cfg)
+    shallow = generate_geometry(replace(cfg, depth=6))
+    top = deep.depth < 6
+    np.testing.assert_array_equal(deep.x1[top], shallow.x1[shallow.depth < 6])
+
+
+def test_sequential_parallel_is_rejected():
+    with pytest.raises(ValueError):
+        generate_geometry_parallel(TreeConfig(depth=6), workers=1)
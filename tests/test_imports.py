@@ -0,0 +1,60 @@
+import json
+import subprocess
+import sys
+
+from conftest import ROOT
+from fractal import bench
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, timeout=300)
+
+
+def test_headless_imports_fit_budget():
+    # то же, что `main.py bench --imports`: каждый модуль в новом процессе
+    proc = _run("main.py", "bench", "--imports")
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    assert len(proc.stdout.splitlines()) == len(bench.IMPORT_BUDGET_MS)
+
+
+def test_headless_modules_do_not_load_tk():
+    for module in bench.IMPORT_BUDGET_MS:
+        _, gui = bench.measure_import(module, repeat=1)
+        assert gui == [], f"{module} loads {gui}"
+
+
+def test_cli_help_is_import_light():
+    # разбор аргументов (и запуск GUI до импорта ui.app) не тянет подкоманды
+    code = (
+        "import json, runpy, sys\n"
+        "sys.argv = ['main.py', '--help']\n"
+        "try:\n"
+        "    runpy.run_path('main.py', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "heavy = ('numpy', 'asyncio', 'concurrent.futures', 'tkinter', 'fractal.batch')\n"
+        "print(json.dumps([m for m in heavy if m in sys.modules]))\n"
+    )
+    proc = _run("-c", code)
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout.splitlines()[-1]) == []
+
+
+def test_subcommand_imports_only_its_module():
+    code = (
+        "import json, sys\n"
+        "import main\n"
+        "try:\n"
+        "    main.main(['batch', '--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(json.dumps([m for m in ('fractal.server', 'fractal.tiles', 'numpy') if m in sys.modules]))\n"
+    )
+    proc = _run("-c", code)
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout.splitlines()[-1]) == []
+
+
+def test_package_exposes_api_lazily():
+    proc = _run("-c", "import sys, fractal; fractal.TreeConfig; print('numpy' in sys.modules)")
+    assert proc.stdout.strip() == "False"
@@ -0,0 +1,25 @@
+import pytest
+
+from fractal.config import TreeConfig
+from fractal.geometry import generate_geometry
+from fractal.lod import LOD_MIN_PX, cull_geometry
+from fractal.view import fit_viewport
+
+
+@pytest.mark.parametrize("randomness", [0.0, 0.4])
+def test_fitted_view_at_default_threshold_skips_cull(randomness):
+    geom = generate_geometry(TreeConfig(depth=14, randomness=randomness, seed=2))
+    view = fit_viewport(geom.bbox, 1000, 800, margin=30.0)
+    res = cull_geometry(geom, view.scale, LOD_MIN_PX)
+    assert res.geometry is geom and res.culled == res.replaced == 0
+
+
+@pytest.mark.parametrize("draw_mode", ["line", "square"])
+def test_zoomed_out_view_is_culled(draw_mode):
+    geom = generate_geometry(TreeConfig(depth=12, draw_mode=draw_mode, randomness=0.4, seed=5))
+    view = fit_viewport(geom.bbox, 200, 160, margin=10.0)
+    res = cull_geometry(geom, view.scale, 4.0)
+    assert res.culled > 0 and res.replaced > 0
+    # каждое заменённое поддерево даёт один сегмент вместо своих
+    assert len(res.geometry) == len(geom) - res.culled + res.replaced
+    assert res.geometry.bbox == geom.bbox
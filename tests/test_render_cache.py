@@ -0,0 +1,60 @@
+import os
+
+from fractal.config import TreeConfig
+from fractal.render_cache import RenderCache, render_key
+
+
+def _cfg(seed: int) -> TreeConfig:
+    return TreeConfig(depth=6, randomness=0.5, seed=seed)
+
+
+def test_fetch_renders_once(tmp_path):
+    cache = RenderCache(str(tmp_path))
+    path = cache.fetch(_cfg(0), "png", 48, 48)
+    mtime = os.path.getmtime(path)
+    os.utime(path, (mtime - 100, mtime - 100))
+
+    assert cache.fetch(_cfg(0), "png", 48, 48) == path
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert os.path.getmtime(path) > mtime - 100  # попадание обновляет mtime
+
+
+def test_key_covers_size_and_format():
+    keys = {
+        render_key(_cfg(0), "png", 48, 48),
+        render_key(_cfg(0), "png", 48, 64),
+        render_key(_cfg(0), "svg", 48, 48),
+        render_key(_cfg(1), "png", 48, 48),
+    }
+    assert len(keys) == 4
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = RenderCache(str(tmp_path))
+    a, b, c = (cache.fetch(_cfg(seed), "png", 64, 64) for seed in range(3))
+    for i, path in enumerate((a, b, c)):
+        os.utime(path, (1000 + i, 1000 + i))
+    assert cache.lookup(_cfg(0), "png", 64, 64) == a  # a снова самый свежий, давнее всех — b
+
+    cache.max_bytes = os.path.getsize(a) + os.path.getsize(c)
+    cache.evict()
+    assert os.path.exists(a) and os.path.exists(c) and not os.path.exists(b)
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 2
+    assert stats["bytes"] <= cache.max_bytes
+
+
+def test_read_rerenders_evicted_entry(tmp_path):
+    cache = RenderCache(str(tmp_path))
+    data = cache.read(_cfg(0), "svg", 64, 64)
+    os.remove(cache.fetch(_cfg(0), "svg", 64, 64))
+    assert cache.read(_cfg(0), "svg", 64, 64) == data
+
+
+def test_export_reports_hit(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    out = str(tmp_path / "tree.png")
+    assert cache.export(_cfg(0), out, "png", 48, 48) is False
+    assert cache.export(_cfg(0), out, "png", 48, 48) is True
+    with open(out, "rb") as f:
+        assert f.read(8) == b"\x89PNG\r\n\x1a\n"
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from fractal.config import TreeConfig
+from fractal.server import MAX_DEPTH, MAX_SIDE, RenderServer, _HttpError, parse_query
+
+
+def test_parse_query_fields_and_size():
+    cfg, width, height = parse_query("depth=7&palette_name=Neon&randomness=0.25&rng=hashed&width=300&height=200")
+    assert cfg == TreeConfig(depth=7, palette_name="Neon", randomness=0.25, rng="hashed")
+    assert (width, height) == (300, 200)
+
+
+def test_parse_query_defaults():
+    cfg, width, height = parse_query("")
+    assert cfg == TreeConfig()
+    assert width == height == 512
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "depth=ten",
+        "depth=7.5",
+        "randomness=lots",
+        "width=wide",
+        "colour=red",                        # нет такого поля
+        "draw_mode=circle",
+        "rng=mersenne",
+        "palette_name=Nope",
+        f"depth={MAX_DEPTH + 1}",
+        "shrink=5",
+        "shrink=-1",
+        "shrink=0.999&depth=18",             # минуты в процессе пула
+        "thickness=-5",
+        "randomness=50",
+        "trunk_length=1e300",
+        "angle_deg=-10",
+        "angle_deg=nan",
+        "thickness_decay=inf",
+        "depth=-1",
+        "width=0",
+        f"height={MAX_SIDE + 1}",
+    ],
+)
+def test_parse_query_rejects_with_400(query):
+    with pytest.raises(_HttpError) as info:
+        parse_query(query)
+    assert info.value.status == 400
+
+
+async def _get(port: int, target: str, method: str = "GET") -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data
+
+
+def test_http_status_codes():
+    async def run():
+        server = RenderServer(workers=1)
+        srv = await server.start("127.0.0.1", 0)
+        port = srv.sockets[0].getsockname()[1]
+        try:
+            bad = await _get(port, "/tree.png?draw_mode=circle")
+            missing = await _get(port, "/forest.png")
+            method = await _get(port, "/tree.png", "POST")
+            ok = await _get(port, "/tree.svg?depth=4&width=64&height=64")
+        finally:
+            srv.close()
+            await srv.wait_closed()
+            server.close()
+        return bad, missing, method, ok
+
+    bad, missing, method, ok = asyncio.run(run())
+    assert bad.startswith(b"HTTP/1.1 400 ") and b"draw_mode must be one of" in bad
+    assert missing.startswith(b"HTTP/1.1 404 ")
+    assert method.startswith(b"HTTP/1.1 405 ")
+    assert ok.startswith(b"HTTP/1.1 200 ") and b"<svg" in ok
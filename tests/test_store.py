@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pytest
+
+from fractal.config import TreeConfig
+from fractal.geometry import generate_geometry
+from fractal.store import _HEADER, GeometryCache, load_geometry, save_geometry
+
+
+FIELDS = ("x0", "y0", "x1", "y1", "thickness", "color", "depth")
+
+
+def _assert_same(a, b):
+    assert len(a) == len(b)
+    for name in FIELDS:
+        np.testing.assert_array_equal(getattr(a, name), getattr(b, name), err_msg=name)
+    assert a.bbox == b.bbox
+    assert a.draw_mode == b.draw_mode
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+@pytest.mark.parametrize("draw_mode", ["line", "square"])
+def test_round_trip(tmp_path, mmap, draw_mode):
+    geom = generate_geometry(TreeConfig(depth=9, randomness=0.4, seed=2, draw_mode=draw_mode))
+    path = str(tmp_path / "tree.seg")
+    save_geometry(geom, path)
+    _assert_same(load_geometry(path, mmap=mmap), geom)
+    assert os.listdir(tmp_path) == ["tree.seg"]  # временный файл не остаётся
+
+
+def test_round_trip_empty(tmp_path):
+    geom = generate_geometry(TreeConfig(depth=3))
+    empty = type(geom)(*(getattr(geom, n)[:0] for n in FIELDS), bbox=geom.bbox, draw_mode="line")
+    path = str(tmp_path / "empty.seg")
+    save_geometry(empty, path)
+    assert len(load_geometry(path)) == 0
+
+
+def _saved(tmp_path) -> str:
+    path = str(tmp_path / "tree.seg")
+    save_geometry(generate_geometry(TreeConfig(depth=6)), path)
+    return path
+
+
+def test_rejects_truncated_header(tmp_path):
+    path = _saved(tmp_path)
+    with open(path, "r+b") as f:
+        f.truncate(_HEADER.size - 1)
+    with pytest.raises(ValueError, match="truncated header"):
+        load_geometry(path)
+
+
+def test_rejects_truncated_records(tmp_path):
+    path = _saved(tmp_path)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 1)
+    with pytest.raises(ValueError, match="size does not match"):
+        load_geometry(path)
+
+
+def test_rejects_trailing_bytes(tmp_path):
+    path = _saved(tmp_path)
+    with open(path, "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(ValueError, match="size does not match"):
+        load_geometry(path)
+
+
+@pytest.mark.parametrize("offset, patch", [(0, b"NOTASEG!"), (8, b"\x63\0\0\0"), (12, b"\x10\0\0\0")])
+def test_rejects_foreign_header(tmp_path, offset, patch):
+    # чужой magic, версия или размер записи
+    path = _saved(tmp_path)
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(patch)
+    with pytest.raises(ValueError, match="not a segment file"):
+        load_geometry(path)
+
+
+def test_cache_regenerates_corrupt_entry(tmp_path):
+    cfg = TreeConfig(depth=8)
+    cache = GeometryCache(str(tmp_path), min_segments=0)
+    geom = cache.get(cfg)
+    path = cache.path_for(cfg)
+    with open(path, "r+b") as f:
+        f.truncate(100)
+    assert cache.load(cfg) is None
+    _assert_same(cache.get(cfg), geom)
+    _assert_same(load_geometry(path), geom)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = GeometryCache(str(tmp_path), min_segments=0)
+    cfgs = [TreeConfig(depth=8, seed=s, randomness=0.2) for s in range(3)]
+    for cfg in cfgs[:2]:
+        cache.get(cfg)
+    a, b = (cache.path_for(c) for c in cfgs[:2])
+    os.utime(a, (1000, 1000))
+    os.utime(b, (2000, 2000))
+    cache.load(cfgs[0])  # попадание обновляет mtime: теперь давнее всех — b
+
+    cache.max_bytes = os.path.getsize(a) + os.path.getsize(b)
+    cache.get(cfgs[2])
+    assert os.path.exists(a) and os.path.exists(cache.path_for(cfgs[2]))
+    assert not os.path.exists(b)
+
+
+def test_cache_read_only_get_does_not_store(tmp_path):
+    cache = GeometryCache(str(tmp_path), min_segments=0)
+    cache.get(TreeConfig(depth=6), store=False)
+    assert not os.path.exists(cache.path_for(TreeConfig(depth=6)))
@@ -0,0 +1,84 @@
+import math
+import os
+import struct
+import zlib
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from fractal.config import TreeConfig
+from fractal.geometry import generate_geometry
+from fractal.palette import get_palette
+from fractal.raster import render_rgba
+from fractal.tiles import _scaled_view, render_poster, render_pyramid
+from fractal.view import fit_viewport
+
+
+def _read_png(path: str) -> np.ndarray:
+    # только то, что пишет fractal.raster: RGBA 8 бит, фильтр 0 у каждой строки
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, idat = 8, []
+    while pos < len(data):
+        (length,), tag = struct.unpack(">I", data[pos:pos + 4]), data[pos + 4:pos + 8]
+        body = data[pos + 8:pos + 8 + length]
+        if tag == b"IHDR":
+            width, height = struct.unpack(">II", body[:8])
+        elif tag == b"IDAT":
+            idat.append(body)
+        pos += 12 + length
+    raw = np.frombuffer(zlib.decompress(b"".join(idat)), dtype=np.uint8).reshape(height, width * 4 + 1)
+    assert not raw[:, 0].any()
+    return raw[:, 1:].reshape(height, width, 4)
+
+
+CFG = TreeConfig(depth=9, randomness=0.4, seed=6, thickness=12.0)
+
+
+@pytest.mark.parametrize("draw_mode", ["line", "square"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_poster_matches_single_render(tmp_path, draw_mode, workers):
+    cfg = replace(CFG, draw_mode=draw_mode)
+    width, height = 230, 170  # не кратно плитке: крайние плитки неполные
+    path = str(tmp_path / "poster.png")
+    render_poster(cfg, path, width, height, tile=64, workers=workers, progress=lambda _: None)
+
+    expected = render_rgba(generate_geometry(cfg), get_palette(cfg.palette_name), width, height)
+    np.testing.assert_array_equal(_read_png(path), expected)
+    assert os.listdir(tmp_path) == ["poster.png"]
+
+
+def _stitch(level_dir: str, tile: int) -> np.ndarray:
+    tiles = {}
+    for name in os.listdir(level_dir):
+        col, row = (int(v) for v in name[:-4].split("_"))
+        tiles[col, row] = _read_png(os.path.join(level_dir, name))
+    cols = max(c for c, _ in tiles) + 1
+    rows = max(r for _, r in tiles) + 1
+    return np.concatenate(
+        [np.concatenate([tiles[c, r] for c in range(cols)], axis=1) for r in range(rows)], axis=0
+    )
+
+
+def test_pyramid_levels_match_single_render(tmp_path):
+    width, height, tile = 300, 200, 128
+    dzi = render_pyramid(CFG, str(tmp_path), width, height, tile=tile, workers=1, lod_px=0, progress=lambda _: None)
+    assert os.path.basename(dzi) == "tree.dzi"
+    with open(dzi, encoding="utf-8") as f:
+        assert f'<Size Width="{width}" Height="{height}"/>' in f.read()
+
+    geom = generate_geometry(CFG)
+    palette = get_palette(CFG.palette_name)
+    view = fit_viewport(geom.bbox, width, height, margin=30.0)
+    max_level = math.ceil(math.log2(max(width, height)))
+    levels = sorted(int(d) for d in os.listdir(tmp_path / "tree_files"))
+    assert levels == list(range(max_level + 1))
+
+    for level in (max_level, max_level - 1, max_level - 2):
+        factor = 1 << (max_level - level)
+        v = _scaled_view(view, factor)
+        expected = render_rgba(geom, palette, v.width, v.height, view=v, stroke_scale=1.0 / factor)
+        got = _stitch(str(tmp_path / "tree_files" / str(level)), tile)
+        np.testing.assert_array_equal(got, expected, err_msg=f"level {level}")
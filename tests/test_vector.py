@@ -0,0 +1,57 @@
+import io
+import re
+
+import pytest
+
+from fractal.config import TreeConfig
+from fractal.geometry import generate_geometry, instance_tree
+from fractal.palette import get_palette
+from fractal.vector import write_svg, write_svg_instanced
+
+
+def _svgs(cfg: TreeConfig, width: int = 400, height: int = 300):
+    palette = get_palette(cfg.palette_name)
+    plain, inst = io.StringIO(), io.StringIO()
+    write_svg(generate_geometry(cfg), palette, plain, width, height)
+    write_svg_instanced(instance_tree(cfg), palette, inst, width, height)
+    return plain.getvalue(), inst.getvalue()
+
+
+def _trunk_root(plain: str):
+    # первый путь — ствол (самая толстая линия)
+    return re.search(r'<path [^>]*d="M([-\d.]+) ([-\d.]+)', plain).groups()
+
+
+@pytest.mark.parametrize("draw_mode", ["line", "square"])
+@pytest.mark.parametrize("depth", [1, 2, 3])
+def test_instanced_svg_without_top_uses_same_view(depth, draw_mode):
+    # дерево не выше экземпляра: весь рисунок — один <use>, его translate — корень ствола
+    cfg = TreeConfig(depth=depth, draw_mode=draw_mode, thickness=14.0)
+    plain, inst = _svgs(cfg)
+    assert plain.splitlines()[0] == inst.splitlines()[0]  # размер и viewBox
+    uses = re.findall(r'<use xlink:href="#p\d+" transform="translate\(([-\d.]+) ([-\d.]+)\)', inst)
+    assert len(uses) == 1
+    if draw_mode == "line":
+        assert uses[0] == _trunk_root(plain)
+    else:
+        # у квадратов первый stamp() стоит в корне ствола
+        first = re.search(r'<use xlink:href="#s\d+" transform="translate\(([-\d.]+) ([-\d.]+)\)', plain).groups()
+        assert uses[0] == first
+
+
+@pytest.mark.parametrize("cfg", [TreeConfig(depth=6), TreeConfig(depth=9, angle_deg=40.0, shrink=0.8)])
+def test_instanced_svg_with_top_matches_plain_paths(cfg):
+    plain, inst = _svgs(cfg)
+    assert plain.splitlines()[0] == inst.splitlines()[0]
+    # верх пишется после <defs> теми же путями, что и у обычного SVG
+    top = inst.split("</defs>\n", 1)[1]
+    top_paths = re.findall(r"<path [^>]*/>", top)
+    assert top_paths and all(p in plain for p in top_paths)
+
+
+@pytest.mark.parametrize("draw_mode", ["line", "square"])
+def test_instance_bbox_matches_geometry(draw_mode):
+    for depth in (0, 2, 5, 10):
+        cfg = TreeConfig(depth=depth, draw_mode=draw_mode)
+        a, b = instance_tree(cfg).bbox, generate_geometry(cfg).bbox
+        assert (a.minx, a.miny, a.maxx, a.maxy) == pytest.approx((b.minx, b.miny, b.maxx, b.maxy), abs=1e-9)
@@ -1 +1 @@
-__all__ = ["app"]
\ No newline at end of file
+__all__ = ["app", "worker", "player"]
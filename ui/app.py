@@ -3,14 +3,53 @@ from __future__ import annotations
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import turtle
+from typing import Optional
 
-from fractal.config import TreeConfig
-from fractal.tree import FractalTreeRenderer, estimate_tree_bbox
+import numpy as np
+
+from fractal.animation import DEFAULT_DURATION, REVEAL_DEPTH, FrameStats, plan_growth
+from fractal.canvas_renderer import CanvasTreeRenderer
+from fractal.config import TreeConfig, config_error
+from fractal.geometry import TreeGeometry, level_thickness, restyle_geometry
+from fractal.lod import LOD_MIN_PX, cull_geometry
+from fractal.spatial import ViewIndex
+from fractal.tree import FractalTreeRenderer
 from fractal.palette import list_palette_names, get_palette
+from fractal.profiling import NULL_PROFILER, DrawProfile, ProfileCallback, Profiler, log_profile, make_profiler
+from fractal.render_cache import RenderCache
+from fractal.store import GeometryCache
+from fractal.vector import export_vector
+from fractal.view import Viewport, fit_viewport, pan_viewport, zoom_viewport
+from ui.player import GrowthPlayer
+from ui.worker import GeometryWorker
+
+
+# live preview: пауза после последнего изменения и размер порции рисования
+PREVIEW_DELAY_MS = 120
+PREVIEW_CHUNK = 3000
+
+# pan/zoom: во сколько раз один щелчок колеса меняет масштаб и пауза перед перерисовкой вида
+ZOOM_STEP = 1.25
+VIEW_DELAY_MS = 60
 
 
 class FractalTreeApp:
-    def __init__(self) -> None:
+    PERF_TAG = "perf"
+
+    def __init__(
+        self,
+        on_profile: Optional[ProfileCallback] = None,
+        profile_log: Optional[str] = None,
+        geometry_cache: Optional[GeometryCache] = None,
+        render_cache: Optional[RenderCache] = None,
+        lod_px: float = LOD_MIN_PX,
+    ) -> None:
+        # профилирование Draw: колбэк получает DrawProfile, лог — JSON-строка на отрисовку
+        self.on_profile = on_profile
+        self.profile_log = log_profile(profile_log) if profile_log else None
+        # SVG/EPS того же конфига и размера отдаются из кэша, а не рисуются заново
+        self.render_cache = render_cache
+
         self.root = tk.Tk()
         self.root.title("Fractal Tree — turtle")
         self.root.geometry("980x640")
@@ -35,18 +74,43 @@ class FractalTreeApp:
         self.t = turtle.RawTurtle(self.screen)
 
         self.renderer = FractalTreeRenderer(self.t)
+        self.canvas_renderer = CanvasTreeRenderer(self.canvas)
+        # геометрия считается в фоне, окно не подвисает на больших depth
+        self.worker = GeometryWorker(self.root, cache=geometry_cache)
+        # анимация роста: геометрия считается один раз, кадры только дорисовывают
+        self.player = GrowthPlayer(self.root, self.canvas_renderer)
+
+        # номер текущей отрисовки: всё, что запущено с другим номером, — устарело
+        self._render_gen = 0
+        self._preview_after = None
+
+        # pan/zoom: последняя нарисованная геометрия целиком, её вид и индекс по сегментам
+        self._shown_cfg: Optional[TreeConfig] = None
+        self._shown_geom: Optional[TreeGeometry] = None
+        # нарисована ли она целиком canvas_renderer (тогда стиль меняется через теги, см. _restyle)
+        self._shown_on_canvas = False
+        self._view: Optional[Viewport] = None
+        self._view_index: Optional[ViewIndex] = None
+        self._view_after = None
+        self._drag: Optional[tuple] = None
+        self._dragged = False
 
         self._build_controls()
         self._apply_theme()
+        self._watch_config_vars()
 
         pal = get_palette(self.palette_var.get())
         self.screen.bgcolor(pal.background)
 
         self.root.bind("<Return>", lambda e: self.on_draw())
         self.root.bind("<Escape>", lambda e: self.on_clear())
+        self._bind_view_controls()
 
     def run(self) -> None:
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.worker.close()
 
     # ---------------- UI ----------------
 
@@ -71,6 +135,12 @@ class FractalTreeApp:
         # NEW: режим рисования
         self.draw_mode_var = tk.StringVar(value="line")  # "line" | "square"
 
+        # чем рисовать: turtle или напрямую на canvas
+        self.backend_var = tk.StringVar(value="turtle")  # "turtle" | "canvas"
+
+        # порог LOD на canvas, px: поддерево мельче сворачивается в один сегмент (0 — выключен)
+        self.lod_var = tk.DoubleVar(value=lod_px)
+
         row = 1
         row = self._add_spin(self.controls, "Depth", self.depth_var, 1, 16, row)
         row = self._add_scale(self.controls, "Angle", self.angle_var, 5, 60, row, step=1)
@@ -99,6 +169,46 @@ class FractalTreeApp:
         ttk.Radiobutton(rb, text="Squares", value="square", variable=self.draw_mode_var).grid(row=0, column=1)
         row += 1
 
+        ttk.Label(self.controls, text="Renderer").grid(row=row, column=0, sticky="w")
+        row += 1
+        rb = ttk.Frame(self.controls)
+        rb.grid(row=row, column=0, sticky="w", pady=(2, 10))
+
+        ttk.Radiobutton(rb, text="Turtle", value="turtle", variable=self.backend_var).grid(row=0, column=0, padx=(0, 10))
+        ttk.Radiobutton(rb, text="Canvas", value="canvas", variable=self.backend_var).grid(row=0, column=1)
+        row += 1
+
+        row = self._add_scale(self.controls, "LOD (px)", self.lod_var, 0.0, 8.0, row, step=0.5)
+        self.lod_var.trace_add("write", lambda *_: self._on_lod_change())
+
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.controls,
+            text="Show timings",
+            variable=self.profile_var,
+            command=lambda: self.canvas.delete(self.PERF_TAG),
+        ).grid(row=row, column=0, sticky="w", pady=(0, 4))
+        row += 1
+
+        self.live_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.controls,
+            text="Live preview",
+            variable=self.live_var,
+            command=self._schedule_preview,
+        ).grid(row=row, column=0, sticky="w", pady=(0, 10))
+        row += 1
+
+        self.reveal_var = tk.StringVar(value=REVEAL_DEPTH)  # "depth" | "length"
+        ttk.Label(self.controls, text="Grow by").grid(row=row, column=0, sticky="w")
+        row += 1
+        rb = ttk.Frame(self.controls)
+        rb.grid(row=row, column=0, sticky="w", pady=(2, 10))
+
+        ttk.Radiobutton(rb, text="Depth", value="depth", variable=self.reveal_var).grid(row=0, column=0, padx=(0, 10))
+        ttk.Radiobutton(rb, text="Path length", value="length", variable=self.reveal_var).grid(row=0, column=1)
+        row += 1
+
         ttk.Label(self.controls, text="Palette").grid(row=row, column=0, sticky="w")
         row += 1
         self.palette_combo = ttk.Combobox(
@@ -121,7 +231,10 @@ class FractalTreeApp:
         ttk.Button(btns, text="Clear", command=self.on_clear).grid(row=0, column=1, sticky="ew", padx=(6, 0))
 
         row += 1
-        ttk.Button(self.controls, text="Save PostScript", command=self.on_save_ps).grid(
+        ttk.Button(self.controls, text="Grow", command=self.on_grow).grid(row=row, column=0, sticky="ew", pady=(10, 0))
+
+        row += 1
+        ttk.Button(self.controls, text="Save SVG / EPS", command=self.on_save_ps).grid(
             row=row, column=0, sticky="ew", pady=(10, 0)
         )
 
@@ -136,6 +249,21 @@ class FractalTreeApp:
         for i in range(row + 1):
             self.controls.rowconfigure(i, pad=2)
 
+    def _watch_config_vars(self) -> None:
+        for var in (
+            self.depth_var,
+            self.angle_var,
+            self.length_var,
+            self.shrink_var,
+            self.thickness_var,
+            self.th_decay_var,
+            self.random_var,
+            self.seed_var,
+            self.palette_var,
+            self.draw_mode_var,
+        ):
+            var.trace_add("write", lambda *_: self._schedule_preview())
+
     def _apply_theme(self) -> None:
         style = ttk.Style()
         try:
@@ -214,84 +342,402 @@ class FractalTreeApp:
             draw_mode=str(self.draw_mode_var.get()),
         )
 
-    def _fit_world_to_bbox(self, bbox, margin_px: float = 24.0) -> None:
+    def _fit_world_to_bbox(self, bbox, margin_px: float = 24.0) -> Viewport:
 
         # обновим геометрию окна, чтобы winfo_width/height были актуальными
         self.root.update_idletasks()
 
         cw = max(1, int(self.canvas.winfo_width()))
         ch = max(1, int(self.canvas.winfo_height()))
-        canvas_aspect = cw / ch
-
-        # bbox с запасом
-        padded = bbox.pad(margin_px)
-
-        # приводим bbox к аспекту canvas: расширяем по нужной оси, чтобы не обрезало
-        bb_aspect = padded.w / padded.h
-        cx = (padded.minx + padded.maxx) / 2.0
-        cy = (padded.miny + padded.maxy) / 2.0
-
-        if bb_aspect > canvas_aspect:
-            # bbox “шире”, расширяем по высоте
-            new_h = padded.w / canvas_aspect
-            half_h = new_h / 2.0
-            llx, urx = padded.minx, padded.maxx
-            lly, ury = cy - half_h, cy + half_h
-        else:
-            # bbox “выше”, расширяем по ширине
-            new_w = padded.h * canvas_aspect
-            half_w = new_w / 2.0
-            lly, ury = padded.miny, padded.maxy
-            llx, urx = cx - half_w, cx + half_w
 
-        self.screen.setworldcoordinates(llx, lly, urx, ury)
+        view = fit_viewport(bbox, cw, ch, margin=margin_px)
+        self.screen.setworldcoordinates(view.llx, view.lly, view.urx, view.ury)
+        return view
 
     # ---------------- actions ----------------
 
+    @staticmethod
+    def _config_error(cfg: TreeConfig):
+        # пределы общие с batch и сервером (fractal.config.FIELD_LIMITS)
+        error = config_error(cfg)
+        return ("Invalid config", error) if error is not None else None
+
     def on_draw(self) -> None:
-        cfg = self._make_config()
+        self._render_gen += 1  # прерываем live preview, если он ещё рисуется
+        self._cancel_view()
+        self.player.stop()
+        prof = make_profiler(self._profiling())
+
+        with prof.phase("config"):
+            cfg = self._make_config()
+            error = self._config_error(cfg)
+        if error:
+            messagebox.showerror(*error)
+            return
+        if self.backend_var.get() == "canvas" and self._restyle(cfg, prof):
+            # Draw всегда показывает дерево целиком, как и полная отрисовка: вид после
+            # pan/zoom сбрасываем и сразу перерисовываем, без задержки VIEW_DELAY_MS
+            view = self._fit_world_to_bbox(self._shown_geom.bbox, margin_px=30.0)
+            if view != self._view:
+                self._view = view
+                self._draw_view()
+            return
+
+        gen = self._render_gen
+        self.worker.submit(
+            gen,
+            cfg,
+            lambda geom: self._on_geometry(gen, cfg, geom, live=False, prof=prof),
+            lambda e: messagebox.showerror("Draw error", str(e)),
+        )
 
-        if cfg.depth < 0 or cfg.depth > 18:
-            messagebox.showerror("Invalid depth", "Depth должен быть в пределах 0..18")
+    def _on_geometry(
+        self,
+        gen: int,
+        cfg: TreeConfig,
+        geom: TreeGeometry,
+        live: bool,
+        prof: Profiler = NULL_PROFILER,
+    ) -> None:
+        # вызывается в главном потоке, когда фоновая генерация закончилась
+        if gen != self._render_gen:
+            return
+        prof.add_time("geometry", self.worker.last_seconds)
+
+        with prof.phase("fit"):
+            pal = get_palette(cfg.palette_name)
+            self.screen.bgcolor(pal.background)
+
+            # bbox берём из той же геометрии, что рисуется => дерево всегда влезает и центрируется
+            view = self._fit_world_to_bbox(geom.bbox, margin_px=30.0)
+
+        # для pan/zoom; индекс по сегментам строится при первом движении
+        self._shown_cfg, self._shown_geom, self._view = cfg, geom, view
+        # preview рисуется порциями — готов он только в конце _preview_step
+        self._shown_on_canvas = not live and self.backend_var.get() == "canvas"
+        self._view_index = None
+
+        with prof.phase("clear"):
+            self.t.clear()
+            self.canvas_renderer.clear()
+            self.canvas.delete(self.PERF_TAG)
+
+        if live or self.backend_var.get() == "canvas":
+            with prof.phase("lod"):
+                # то, что мельче пикселя при этом масштабе, всё равно не видно
+                lod = cull_geometry(geom, view.scale, self._lod_px())
+            prof.count("culled", lod.culled)
+            geom = lod.geometry
+
+        if live:
+            # preview всегда рисуется на canvas: turtle нельзя прервать посередине
+            steps = self.canvas_renderer.draw_iter(geom, pal, view, chunk=PREVIEW_CHUNK)
+            self._preview_step(gen, steps)
             return
-        if not (0.3 <= cfg.shrink <= 0.95):
-            messagebox.showerror("Invalid shrink", "Shrink должен быть в пределах 0.3..0.95")
+
+        if self.backend_var.get() == "canvas":
+            with prof.phase("canvas"):
+                items = self.canvas_renderer.draw(geom, pal, view)
+            prof.count("segments", len(geom))
+            if geom.draw_mode == "square":
+                prof.count("stamps", items)
+        else:
+            # Два обхода дерева: геометрия (bbox, pan/zoom) уже посчитана в фоне, а turtle
+            # проходит дерево ещё раз своими forward/stamp — ради этого backend и выбирают.
+            # Один обход — только у canvas, который рисует готовые сегменты.
+            self.t.penup()
+            self.t.home()
+            self.t.pendown()
+            self.renderer.profiler = prof
+            try:
+                self.renderer.draw(cfg)
+            finally:
+                self.renderer.profiler = NULL_PROFILER
+        with prof.phase("update"):
+            self.screen.update()
+
+        if prof.enabled:
+            self._report_profile(cfg, prof.profile)
+
+    def on_grow(self) -> None:
+        # Анимация роста: одна генерация, потом кадры по времени появления сегментов
+        self._render_gen += 1
+        self._cancel_view()
+        self.player.stop()
+
+        cfg = self._make_config()
+        error = self._config_error(cfg)
+        if error:
+            messagebox.showerror(*error)
             return
 
+        gen = self._render_gen
+        self.worker.submit(
+            gen,
+            cfg,
+            lambda geom: self._on_growth_geometry(gen, cfg, geom),
+            lambda e: messagebox.showerror("Draw error", str(e)),
+        )
+
+    def _on_growth_geometry(self, gen: int, cfg: TreeConfig, geom: TreeGeometry) -> None:
+        if gen != self._render_gen:
+            return
         pal = get_palette(cfg.palette_name)
         self.screen.bgcolor(pal.background)
-
-        # NEW: считаем bbox и подгоняем worldcoordinates => дерево всегда влезает и центрируется
-        bbox = estimate_tree_bbox(cfg)
-        self._fit_world_to_bbox(bbox, margin_px=30.0)
+        view = self._fit_world_to_bbox(geom.bbox, margin_px=30.0)
+        self._shown_cfg, self._shown_geom, self._view = cfg, geom, view
+        self._shown_on_canvas = True
+        self._view_index = None
 
         self.t.clear()
-        self.t.penup()
-        self.t.home()
-        self.t.pendown()
-
-        self.renderer.draw(cfg)
-        self.screen.update()
+        self.canvas_renderer.clear()
+        self.canvas.delete(self.PERF_TAG)
+
+        plan = plan_growth(geom, DEFAULT_DURATION, self.reveal_var.get())
+        self.player.play(plan, pal, view, on_done=lambda stats: self._on_growth_done(gen, cfg, stats))
+
+    def _on_growth_done(self, gen: int, cfg: TreeConfig, stats: FrameStats) -> None:
+        if gen == self._render_gen and self._profiling():
+            self._report_profile(cfg, stats.to_profile())
+
+    # ---------------- profiling ----------------
+
+    def _profiling(self) -> bool:
+        return bool(self.profile_var.get() or self.on_profile or self.profile_log)
+
+    def _report_profile(self, cfg: TreeConfig, profile: DrawProfile) -> None:
+        profile.counts["items"] = len(self.canvas.find_all())
+        profile.info.update(backend=self.backend_var.get(), draw_mode=cfg.draw_mode, depth=cfg.depth)
+
+        if self.profile_var.get():
+            self.canvas.create_text(
+                self.canvas.canvasx(8),
+                self.canvas.canvasy(8),
+                text=profile.summary(),
+                anchor="nw",
+                font=("Courier", 10),
+                fill="#e6e6e6",
+                tags=self.PERF_TAG,
+            )
+        if self.profile_log:
+            self.profile_log(profile)
+        if self.on_profile:
+            self.on_profile(profile)
 
     def on_clear(self) -> None:
+        self._render_gen += 1
+        self.worker.cancel()
+        self._cancel_view()
+        self.player.stop()
+        self._shown_geom = None
+        self._view_index = None
         self.t.clear()
+        self.canvas_renderer.clear()
+        self.canvas.delete(self.PERF_TAG)
         self.screen.update()
 
+    # ---------------- pan / zoom ----------------
+
+    def _bind_view_controls(self) -> None:
+        # перетаскивание — сдвиг, колесо — масштаб вокруг курсора, двойной щелчок — всё дерево
+        self.canvas.bind("<ButtonPress-1>", self._on_pan_start)
+        self.canvas.bind("<B1-Motion>", self._on_pan_move)
+        self.canvas.bind("<ButtonRelease-1>", self._on_pan_end)
+        self.canvas.bind("<MouseWheel>", lambda e: self._zoom_at(e.x, e.y, ZOOM_STEP if e.delta > 0 else 1 / ZOOM_STEP))
+        self.canvas.bind("<Button-4>", lambda e: self._zoom_at(e.x, e.y, ZOOM_STEP))
+        self.canvas.bind("<Button-5>", lambda e: self._zoom_at(e.x, e.y, 1 / ZOOM_STEP))
+        self.canvas.bind("<Double-Button-1>", lambda e: self._reset_view())
+
+    def _on_pan_start(self, event) -> None:
+        self._drag = (event.x, event.y)
+        self._dragged = False
+
+    def _on_pan_end(self, event) -> None:
+        self._drag = None
+        if self._dragged:
+            self._schedule_view()
+
+    def _on_pan_move(self, event) -> None:
+        if self._drag is None or self._view is None or self._shown_geom is None:
+            return
+        dx, dy = event.x - self._drag[0], event.y - self._drag[1]
+        self._drag = (event.x, event.y)
+        self._dragged = True
+        # уже нарисованное двигаем сразу, открывшиеся края дорисует перерисовка вида
+        self.canvas.move("all", dx, dy)
+        self._view = pan_viewport(self._view, dx, dy)
+        self._schedule_view()
+
+    def _zoom_at(self, px: int, py: int, factor: float) -> None:
+        if self._view is None or self._shown_geom is None:
+            return
+        self.canvas.scale("all", self.canvas.canvasx(px), self.canvas.canvasy(py), factor, factor)
+        self._view = zoom_viewport(self._view, px, py, factor)
+        self._schedule_view()
+
+    def _reset_view(self) -> None:
+        if self._shown_geom is None:
+            return
+        self._view = self._fit_world_to_bbox(self._shown_geom.bbox, margin_px=30.0)
+        self._schedule_view()
+
+    def _lod_px(self) -> float:
+        try:
+            return max(0.0, float(self.lod_var.get()))
+        except (tk.TclError, ValueError):
+            return LOD_MIN_PX
+
+    def _on_lod_change(self) -> None:
+        # другой порог — другие LOD-уровни; нарисованное на canvas перерисовываем по виду
+        self._view_index = None
+        if self._shown_geom is not None and self._shown_on_canvas and self._view is not None:
+            self._schedule_view()
+
+    def _schedule_view(self) -> None:
+        self._cancel_view()
+        self.player.stop()
+        self._view_after = self.root.after(VIEW_DELAY_MS, self._draw_view)
+
+    def _cancel_view(self) -> None:
+        if self._view_after is not None:
+            self.root.after_cancel(self._view_after)
+            self._view_after = None
+
+    def _draw_view(self) -> None:
+        # Перерисовка после pan/zoom: только сегменты в видимом прямоугольнике, с LOD под
+        # текущий масштаб; всегда на canvas и порциями, как live preview.
+        self._view_after = None
+        if self._shown_geom is None or self._view is None or self._shown_cfg is None:
+            return
+        if self._view_index is None:
+            self._view_index = ViewIndex(self._shown_geom, self._lod_px())
+
+        self._render_gen += 1
+        gen = self._render_gen
+        geom = self._view_index.visible(self._view)
+        pal = get_palette(self._shown_cfg.palette_name)
+
+        self.t.clear()
+        self.canvas_renderer.clear()
+        self.canvas.delete(self.PERF_TAG)
+        self._shown_on_canvas = False
+        steps = self.canvas_renderer.draw_iter(geom, pal, self._view, chunk=PREVIEW_CHUNK)
+        self._preview_step(gen, steps)
+
+    # ---------------- live preview ----------------
+
+    def _schedule_preview(self) -> None:
+        # debounce: перерисовываем, когда ползунок на PREVIEW_DELAY_MS остановился
+        if self._preview_after is not None:
+            self.root.after_cancel(self._preview_after)
+            self._preview_after = None
+        if not self.live_var.get():
+            return
+        self._preview_after = self.root.after(PREVIEW_DELAY_MS, self._start_preview)
+
+    def _start_preview(self) -> None:
+        self._preview_after = None
+        self._render_gen += 1
+        self._cancel_view()
+        self.player.stop()
+        gen = self._render_gen
+
+        try:
+            cfg = self._make_config()
+        except (tk.TclError, ValueError):
+            return  # в Spinbox сейчас не число
+        if self._config_error(cfg):
+            return
+        if self._restyle(cfg):
+            return
+
+        # новый submit отменяет генерацию для предыдущего положения ползунка; промежуточные
+        # деревья в кэш на диске не пишем
+        self.worker.submit(gen, cfg, lambda geom: self._on_geometry(gen, cfg, geom, live=True), store=False)
+
+    def _preview_step(self, gen: int, steps) -> None:
+        if gen != self._render_gen:
+            steps.close()  # параметры поменялись — бросаем эту отрисовку
+            return
+        try:
+            next(steps)
+        except StopIteration:
+            self._shown_on_canvas = True
+            return
+        self.root.after(1, lambda: self._preview_step(gen, steps))
+
     def _on_palette_change(self) -> None:
+        try:
+            if self._restyle(self._make_config()):
+                return
+        except (tk.TclError, ValueError):
+            pass  # в Spinbox сейчас не число — меняем хотя бы фон
         pal = get_palette(self.palette_var.get())
         self.screen.bgcolor(pal.background)
         self.screen.update()
 
+    def _restyle(self, cfg: TreeConfig, prof: Profiler = NULL_PROFILER) -> bool:
+        # Поменялся только стиль (палитра; у линий — толщина): перекрашиваем элементы,
+        # уже стоящие на canvas, по тегам — без генерации и отрисовки заново.
+        # False — нужна полная отрисовка (поменялась геометрия, рисовал turtle, идёт анимация).
+        old, geom = self._shown_cfg, self._shown_geom
+        if old is None or geom is None or not self._shown_on_canvas or self.player.playing:
+            return False
+        restyled = restyle_geometry(geom, old, cfg)
+        if restyled is None:
+            return False
+
+        widths = None
+        if restyled is not geom:
+            old_th = level_thickness(old, geom.max_depth)
+            widths = level_thickness(cfg, geom.max_depth).astype(np.float32)  # как thickness в геометрии
+            # LOD сворачивает поддеревья и по толщине пера: другие решения — другие сегменты
+            thin = max(1.0, self._lod_px())
+            if not np.array_equal(np.maximum(1.0, old_th) <= thin, np.maximum(1.0, widths) <= thin):
+                return False
+
+        # генерация для прежнего положения ползунков больше не нужна; отложенная
+        # перерисовка pan/zoom остаётся — она возьмёт новый стиль из _shown_cfg/_shown_geom
+        self._render_gen += 1
+        self.worker.cancel()
+        with prof.phase("restyle"):
+            pal = get_palette(cfg.palette_name)
+            self.screen.bgcolor(pal.background)
+            self.canvas_renderer.restyle(pal, widths)
+            self.screen.update()
+        prof.count("segments", len(restyled))
+
+        self._shown_cfg = cfg
+        if restyled is not geom:
+            self._shown_geom = restyled
+            self._view_index = None
+        if prof.enabled:
+            self._report_profile(cfg, prof.profile)
+        return True
+
     def on_save_ps(self) -> None:
         path = filedialog.asksaveasfilename(
-            defaultextension=".ps",
-            filetypes=[("PostScript", "*.ps")],
-            title="Save as PostScript",
+            defaultextension=".svg",
+            filetypes=[("SVG", "*.svg"), ("EPS", "*.eps"), ("PostScript (canvas)", "*.ps")],
+            title="Save as SVG / EPS / PostScript",
         )
         if not path:
             return
         try:
-            self.canvas.postscript(file=path, colormode="color")
-            messagebox.showinfo("Saved", f"Saved:\n{path}\n\nМожно открыть в Preview и экспортировать в PNG.")
+            if path.lower().endswith(".ps"):
+                self.canvas.postscript(file=path, colormode="color")
+                messagebox.showinfo("Saved", f"Saved:\n{path}\n\nМожно открыть в Preview и экспортировать в PNG.")
+                return
+            # вектор пишется из геометрии потоком, без обхода canvas
+            self.root.update_idletasks()
+            cfg = self._make_config()
+            width = max(1, int(self.canvas.winfo_width()))
+            height = max(1, int(self.canvas.winfo_height()))
+            if self.render_cache is not None:
+                fmt = "eps" if path.lower().endswith(".eps") else "svg"
+                self.render_cache.export(cfg, path, fmt, width, height)
+            else:
+                export_vector(cfg, path, width=width, height=height)
+            messagebox.showinfo("Saved", f"Saved:\n{path}")
         except Exception as e:
             messagebox.showerror("Save error", str(e))
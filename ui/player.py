@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Callable, Optional
+
+from fractal.animation import DEFAULT_FPS, FrameStats, GrowthPlan
+from fractal.canvas_renderer import CanvasTreeRenderer
+from fractal.palette import Palette
+from fractal.view import Viewport
+
+if TYPE_CHECKING:
+    import tkinter as tk
+
+
+class GrowthPlayer:
+    # Проигрывает GrowthPlan на canvas. Кадр k положен на момент k / fps от старта; на нём
+    # дорисовываются только сегменты, появившиеся с прошлого показанного кадра. Если рисование
+    # не успевает, промежуточные кадры пропускаются (их сегменты уходят в следующий кадр),
+    # так что длительность анимации не растягивается.
+
+    def __init__(self, root: tk.Misc, renderer: CanvasTreeRenderer, fps: float = DEFAULT_FPS) -> None:
+        self.root = root
+        self.renderer = renderer
+        self.fps = fps
+
+        self._after = None
+        self._plan: Optional[GrowthPlan] = None
+        self._palette: Optional[Palette] = None
+        self._view: Optional[Viewport] = None
+        self._on_done: Optional[Callable[[FrameStats], None]] = None
+        self._ends = None
+        self._frame = -1
+        self._drawn = 0
+        self._started = 0.0
+        self.stats = FrameStats(fps)
+
+    @property
+    def playing(self) -> bool:
+        return self._plan is not None
+
+    def play(
+        self,
+        plan: GrowthPlan,
+        palette: Palette,
+        view: Viewport,
+        on_done: Optional[Callable[[FrameStats], None]] = None,
+    ) -> None:
+        self.stop()
+        self._plan = plan
+        self._palette = palette
+        self._view = view
+        self._on_done = on_done
+        self._ends = plan.frame_ends(self.fps).tolist()
+        self._frame = -1
+        self._drawn = 0
+        self.stats = FrameStats(self.fps)
+        self._started = time.perf_counter()
+        self._tick()
+
+    def stop(self) -> None:
+        if self._after is not None:
+            self.root.after_cancel(self._after)
+            self._after = None
+        self._plan = None
+
+    def _tick(self) -> None:
+        self._after = None
+        plan = self._plan
+        if plan is None:
+            return
+
+        last = len(self._ends) - 1
+        frame = min(last, int((time.perf_counter() - self._started) * self.fps))
+        if frame > self._frame:
+            self.stats.dropped += frame - self._frame - 1
+            hi = self._ends[frame]
+            t0 = time.perf_counter()
+            if hi > self._drawn:
+                self.renderer.draw(plan.segments(self._drawn, hi), self._palette, self._view)
+                self.renderer.canvas.update_idletasks()
+            self.stats.add((time.perf_counter() - t0) * 1000.0, hi - self._drawn)
+            self._drawn = hi
+            self._frame = frame
+
+        if self._frame >= last:
+            self.stats.wall_s = time.perf_counter() - self._started
+            self._plan = None
+            if self._on_done is not None:
+                self._on_done(self.stats)
+            return
+
+        # до начала следующего кадра
+        wait = (self._frame + 1) / self.fps - (time.perf_counter() - self._started)
+        self._after = self.root.after(max(1, int(wait * 1000)), self._tick)
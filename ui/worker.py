@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Optional
+
+from fractal.config import TreeConfig
+from fractal.geometry import GenerationCancelled, TreeGeometry, generate_geometry
+from fractal.store import GeometryCache
+
+if TYPE_CHECKING:
+    import tkinter as tk
+
+
+@dataclass
+class _Request:
+    gen: int
+    cfg: TreeConfig
+    on_done: Callable[[TreeGeometry], None]
+    on_error: Optional[Callable[[Exception], None]] = None
+    store: bool = True
+    cancelled: threading.Event = field(default_factory=threading.Event)
+
+
+class GeometryWorker:
+    # Геометрия считается в фоновом потоке; результат забирает главный поток опросом
+    # через root.after, так что Tk вызывается только из главного потока.
+    # Новый submit() отменяет предыдущий запрос: и ещё не начатый, и уже идущий.
+    # С cache большие деревья берутся с диска, если уже считались; store=False в submit()
+    # (live preview) только читает кэш и не пишет в него.
+
+    def __init__(self, root: tk.Misc, poll_ms: int = 15, cache: Optional[GeometryCache] = None) -> None:
+        self.root = root
+        self.poll_ms = poll_ms
+        self.cache = cache
+
+        self._lock = threading.Condition()
+        self._next: Optional[_Request] = None
+        self._current: Optional[_Request] = None
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._poll_after = None
+        self._closed = False
+        # сколько секунд считалась геометрия, отданная последней в on_done
+        self.last_seconds = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="geometry-worker", daemon=True)
+        self._thread.start()
+
+    # ---------- главный поток ----------
+
+    def submit(
+        self,
+        gen: int,
+        cfg: TreeConfig,
+        on_done: Callable[[TreeGeometry], None],
+        on_error: Optional[Callable[[Exception], None]] = None,
+        store: bool = True,
+    ) -> None:
+        req = _Request(gen, cfg, on_done, on_error, store)
+        with self._lock:
+            self._cancel_locked()
+            self._current = req
+            self._next = req
+            self._lock.notify()
+        self._ensure_polling()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancel_locked()
+            self._current = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._cancel_locked()
+            self._closed = True
+            self._lock.notify()
+        if self._poll_after is not None:
+            self.root.after_cancel(self._poll_after)
+            self._poll_after = None
+
+    def _cancel_locked(self) -> None:
+        if self._current is not None:
+            self._current.cancelled.set()
+        self._next = None
+
+    def _ensure_polling(self) -> None:
+        if self._poll_after is None:
+            self._poll_after = self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self) -> None:
+        self._poll_after = None
+        while True:
+            try:
+                req, geom, error, seconds = self._results.get_nowait()
+            except queue.Empty:
+                break
+            # устаревший или отменённый результат просто выбрасываем
+            if req.cancelled.is_set() or req is not self._current:
+                continue
+            self._current = None
+            if error is not None:
+                if req.on_error is not None:
+                    req.on_error(error)
+            else:
+                self.last_seconds = seconds
+                req.on_done(geom)
+
+        if self._current is not None:
+            self._ensure_polling()
+
+    # ---------- фоновый поток ----------
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while self._next is None and not self._closed:
+                    self._lock.wait()
+                if self._closed:
+                    return
+                req = self._next
+                self._next = None
+
+            started = time.perf_counter()
+            try:
+                if self.cache is not None:
+                    geom = self.cache.get(req.cfg, should_stop=req.cancelled.is_set, store=req.store)
+                else:
+                    geom = generate_geometry(req.cfg, should_stop=req.cancelled.is_set)
+            except GenerationCancelled:
+                continue
+            except Exception as e:  # отдадим ошибку в главный поток
+                self._results.put((req, None, e, 0.0))
+                continue
+            self._results.put((req, geom, None, time.perf_counter() - started))